@@ -0,0 +1 @@
+"""Benchmarks for the Brewathon Telegram Bot (run as `python -m benchmarks.<name>`)."""
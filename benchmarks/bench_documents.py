@@ -0,0 +1,58 @@
+"""
+Send many large lists at once through send_large_text_or_file and verify
+every uploaded document matches its source text.
+
+Usage: python -m benchmarks.bench_documents [requests] [lines]
+Runs without MongoDB or Telegram (the bot is faked).
+"""
+import asyncio
+import hashlib
+import sys
+import time
+from types import SimpleNamespace
+
+from src.bot.helpers import send_large_text_or_file
+
+
+class RecordingBot:
+    """Fake bot that reads uploads the way an HTTP upload would."""
+
+    def __init__(self):
+        self.documents = {}
+
+    async def send_document(self, chat_id, document, filename=None, caption=None):
+        await asyncio.sleep(0)  # let other requests interleave
+        self.documents[chat_id] = (filename, document.read())
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.documents[chat_id] = (None, text.encode("utf-8"))
+
+
+async def main(requests=50, lines=2000):
+    bot = RecordingBot()
+    context = SimpleNamespace(bot=bot)
+    texts = {
+        chat_id: "".join(f"Team {chat_id}-{i}: TXN{i:08d}\n" for i in range(lines))
+        for chat_id in range(requests)
+    }
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        send_large_text_or_file(context, chat_id, text, "transactions_list.txt")
+        for chat_id, text in texts.items()
+    ))
+    elapsed = time.perf_counter() - start
+
+    corrupted = [
+        chat_id for chat_id, text in texts.items()
+        if hashlib.sha256(bot.documents[chat_id][1]).digest() != hashlib.sha256(text.encode("utf-8")).digest()
+    ]
+    names = {name for name, _ in bot.documents.values()}
+    print(f"{requests} documents of {lines} lines in {elapsed * 1000:.1f} ms")
+    print(f"corrupted: {len(corrupted)}, distinct filenames: {len(names)}")
+    return 1 if corrupted or len(names) != requests else 0
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(asyncio.run(main(*args)))
@@ -0,0 +1,83 @@
+"""
+Concurrent /find lookups on the sync driver (executor threads) vs the
+async driver (MONGO_DRIVER=async, awaited on the event loop).
+
+Usage: python -m benchmarks.bench_drivers [documents] [lookups] [concurrency]
+Needs a mongod at BENCH_MONGO_URI (default mongodb://localhost:27017).
+
+Each driver runs twice:
+- "direct": run_query with no scheduler pool, so only the driver limits
+  concurrency (the sync driver uses the default executor's threads).
+- "pool": inside the "lookup" scheduler pool, as /find does. Its
+  LOOKUP_CONCURRENCY semaphore caps both drivers alike, so the async driver
+  only pulls ahead once that limit is raised above the thread count.
+"""
+import asyncio
+import sys
+import time
+
+from benchmarks.seed import COLLECTION_NAME, DATABASE_NAME, MONGO_URI, get_collection, seed
+from src.bot.scheduler import CommandScheduler
+from src.config import Config
+from src.db.queries import ensure_indexes, find_team_by_name
+from src.db.runner import close_database, open_database, run_query
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def drive(pool, names, concurrency):
+    """
+    Look up every name with at most `concurrency` requests in flight,
+    inside `pool` or, if it is None, directly.
+    """
+    gate = asyncio.Semaphore(concurrency)
+    misses = 0
+
+    async def lookup(name):
+        nonlocal misses
+        async with gate:
+            start = time.perf_counter()
+            args = (find_team_by_name, MONGO_URI, DATABASE_NAME, COLLECTION_NAME, name)
+            if pool is not None:
+                team = await pool.run(run_query, *args)
+            else:
+                team = await run_query(*args)
+            if team is None:
+                misses += 1
+            return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(lookup(name) for name in names))
+    return latencies, time.perf_counter() - start, misses
+
+
+async def main(documents=100000, lookups=5000, concurrency=200):
+    collection = get_collection()
+    print(f"Seeding {documents} documents...")
+    seed(collection, documents)
+    ensure_indexes(MONGO_URI, DATABASE_NAME, COLLECTION_NAME)
+    sample = [doc["teamName"].upper()
+              for doc in collection.aggregate([{"$sample": {"size": lookups}}])]
+
+    print(f"{lookups} lookups, {concurrency} concurrent, lookup pool of {Config.LOOKUP_CONCURRENCY}")
+    print(f"{'driver':<8} {'via':<7} {'p50 ms':>8} {'p99 ms':>8} {'lookups/s':>10} {'misses':>7}")
+    for driver in ("sync", "async"):
+        Config.MONGO_DRIVER = driver
+        await open_database(MONGO_URI)
+        scheduler = CommandScheduler({"lookup": Config.LOOKUP_CONCURRENCY})
+        for via, pool in (("direct", None), ("pool", scheduler.pool("lookup"))):
+            # Warm-up round so every run starts with open connections
+            await drive(pool, sample[:concurrency], concurrency)
+            latencies, seconds, misses = await drive(pool, sample, concurrency)
+            print(f"{driver:<8} {via:<7} {percentile(latencies, 50):>8.1f} "
+                  f"{percentile(latencies, 99):>8.1f} {len(sample) / seconds:>10.0f} {misses:>7}")
+        scheduler.shutdown()
+        await close_database()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:4]]
+    asyncio.run(main(*args))
@@ -0,0 +1,69 @@
+"""
+Compare /registrations export formats: file size and build time, for the
+full document and for a projected subset of fields.
+
+Usage: python -m benchmarks.bench_export [documents] [repeats]
+Needs a mongod at BENCH_MONGO_URI (default mongodb://localhost:27017).
+Parquet and XLSX are skipped when pyarrow / openpyxl are not installed.
+"""
+import os
+import sys
+import time
+
+from benchmarks.seed import COLLECTION_NAME, DATABASE_NAME, MONGO_URI, get_collection, seed
+from src.db.export import (
+    EXPORT_FORMATS, ExportOptions, export_collection, format_available, new_export_buffer
+)
+from src.db.queries import export_mongo_collection_to_csv
+
+PROJECTION = ("teamName", "member1Name")
+
+
+def measure(build, repeats):
+    """Best-of-`repeats` seconds and the output size in bytes."""
+    best = None
+    size = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = build()
+        elapsed = time.perf_counter() - start
+        output.seek(0, os.SEEK_END)
+        size = output.tell()
+        output.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+def pandas_export():
+    buffer = new_export_buffer()
+    export_mongo_collection_to_csv(MONGO_URI, DATABASE_NAME, COLLECTION_NAME, buffer)
+    return buffer
+
+
+def main(documents=100000, repeats=3):
+    print(f"Seeding {documents} documents...")
+    seed(get_collection(), documents)
+
+    cases = [("pandas csv (baseline)", pandas_export)]
+    for fields in ((), PROJECTION):
+        for fmt in EXPORT_FORMATS:
+            label = f"{fmt} {','.join(fields) or 'all fields'}"
+            if not format_available(fmt):
+                print(f"skipping {label}: {EXPORT_FORMATS[fmt][1]} not installed")
+                continue
+            options = ExportOptions(fmt, fields)
+            cases.append((label, lambda options=options: export_collection(
+                MONGO_URI, DATABASE_NAME, COLLECTION_NAME, options)))
+
+    base_size = None
+    print(f"{'export':<34} {'seconds':>8} {'size KiB':>10} {'vs baseline':>12}")
+    for label, build in cases:
+        seconds, size = measure(build, repeats)
+        if base_size is None:
+            base_size = size
+        print(f"{label:<34} {seconds:>8.2f} {size / 1024:>10.0f} {size / base_size:>11.0%}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,65 @@
+"""
+Compare /find lookups: anchored case-insensitive regex vs collation index.
+
+Usage: python -m benchmarks.bench_find_index [documents] [lookups]
+Needs a mongod at BENCH_MONGO_URI (default mongodb://localhost:27017).
+"""
+import re
+import sys
+import time
+
+from benchmarks.seed import get_collection, seed
+from src.db.queries import TEAM_NAME_COLLATION, TEAM_NAME_INDEX
+
+
+def winning_stage(plan):
+    """Flatten the winning plan into e.g. 'FETCH > IXSCAN'."""
+    stages = []
+    while plan:
+        stages.append(plan.get("stage", "?"))
+        plan = plan.get("inputStage")
+    return " > ".join(stages)
+
+
+def explain(cursor):
+    """Winning plan and documents examined for a cursor."""
+    info = cursor.explain()
+    planner = info["queryPlanner"]
+    stats = info.get("executionStats", {})
+    return winning_stage(planner["winningPlan"]), stats.get("totalDocsExamined"), stats.get("totalKeysExamined")
+
+
+def time_lookups(lookup, names):
+    """Mean milliseconds per lookup."""
+    start = time.perf_counter()
+    for name in names:
+        lookup(name)
+    return (time.perf_counter() - start) * 1000 / len(names)
+
+
+def main(documents=200000, lookups=500):
+    collection = get_collection()
+    print(f"Seeding {documents} documents...")
+    seed(collection, documents)
+    collection.create_index([("teamName", 1)], name=TEAM_NAME_INDEX, collation=TEAM_NAME_COLLATION)
+
+    sample = [doc["teamName"].upper() for doc in collection.aggregate([{"$sample": {"size": lookups}}])]
+    probe = sample[0]
+
+    def regex_query(name):
+        return {"teamName": {"$regex": f"^{re.escape(name)}$", "$options": "i"}}
+
+    regex_plan = explain(collection.find(regex_query(probe)).limit(1))
+    index_plan = explain(collection.find({"teamName": probe}).collation(TEAM_NAME_COLLATION).limit(1))
+
+    regex_ms = time_lookups(lambda n: collection.find_one(regex_query(n)), sample)
+    index_ms = time_lookups(lambda n: collection.find_one({"teamName": n}, collation=TEAM_NAME_COLLATION), sample)
+
+    print(f"{'query':<10} {'plan':<24} {'docs':>8} {'keys':>8} {'ms/lookup':>10}")
+    print(f"{'regex':<10} {regex_plan[0]:<24} {regex_plan[1]!s:>8} {regex_plan[2]!s:>8} {regex_ms:>10.3f}")
+    print(f"{'collation':<10} {index_plan[0]:<24} {index_plan[1]!s:>8} {index_plan[2]!s:>8} {index_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
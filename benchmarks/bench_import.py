@@ -0,0 +1,65 @@
+"""
+Bulk import throughput: 100k generated registration rows upserted by team
+name, for ordered and unordered bulk_write at several batch sizes.
+
+Usage: python -m benchmarks.bench_import [rows] [batch sizes, e.g. 500,1000,5000]
+Needs a mongod at BENCH_MONGO_URI (default mongodb://localhost:27017).
+Half of the rows update teams seeded beforehand, half insert new ones.
+"""
+import csv
+import io
+import random
+import sys
+import time
+
+from benchmarks.seed import (
+    COLLECTION_NAME, DATABASE_NAME, MONGO_URI, get_collection, make_registration, seed
+)
+from src.db.importer import REGISTRATION_FIELDS, import_registrations
+from src.db.queries import ensure_indexes
+
+
+def make_csv(rows, existing):
+    """CSV bytes: the first `existing` rows rename members of seeded teams."""
+    rng = random.Random(99)
+    seeded = random.Random(42)  # same sequence as seed(), to hit existing names
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=REGISTRATION_FIELDS)
+    writer.writeheader()
+    for i in range(rows):
+        if i < existing:
+            doc = make_registration(seeded, i)
+            doc["member1Name"] = f"Corrected {i}"
+        else:
+            doc = make_registration(rng, i)
+            doc["teamName"] = f"Imported {doc['teamName']}"
+        writer.writerow(doc)
+    return output.getvalue().encode("utf-8")
+
+
+def main(rows=100000, batch_sizes=(500, 1000, 5000)):
+    collection = get_collection()
+    data = make_csv(rows, rows // 2)
+    print(f"{rows} rows, {len(data) / 1024 / 1024:.1f} MiB CSV")
+    print(f"{'mode':<10} {'batch':>6} {'seconds':>8} {'rows/s':>9} {'new':>7} {'updated':>8} {'errors':>7}")
+
+    for ordered in (True, False):
+        for batch_size in batch_sizes:
+            seed(collection, rows // 2)
+            ensure_indexes(MONGO_URI, DATABASE_NAME, COLLECTION_NAME)
+
+            start = time.perf_counter()
+            result = import_registrations(
+                MONGO_URI, DATABASE_NAME, COLLECTION_NAME, io.BytesIO(data), "csv",
+                ordered=ordered, batch_size=batch_size
+            )
+            seconds = time.perf_counter() - start
+            mode = "ordered" if ordered else "unordered"
+            print(f"{mode:<10} {batch_size:>6} {seconds:>8.2f} {rows / seconds:>9.0f} "
+                  f"{result.upserted:>7} {result.modified:>8} {len(result.errors):>7}")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    sizes = tuple(int(n) for n in sys.argv[2].split(",")) if len(sys.argv) > 2 else (500, 1000, 5000)
+    main(rows, sizes)
@@ -0,0 +1,259 @@
+"""
+End-to-end load test: generated Telegram updates are POSTed to the FastAPI
+`/webhook` while the Bot API is faked in-process and MongoDB holds seeded
+registrations.
+
+Usage:
+    python -m benchmarks.bench_load --documents 10000 --rate 200 --duration 20
+    python -m benchmarks.bench_load --save-baseline ci   # write baselines/ci.json
+    python -m benchmarks.bench_load --compare ci         # exit 1 on regression
+
+Needs a mongod at BENCH_MONGO_URI (default mongodb://localhost:27017), or
+`--mongomock` to use the mongomock package in-process (sync driver only;
+collation and change streams are not emulated).
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from benchmarks.fake_bot_api import FakeBotAPI, FakeBotRequest
+from benchmarks.seed import COLLECTION_NAME, DATABASE_NAME, MONGO_URI, get_collection, seed
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+# Allowed slowdown before --compare fails
+REGRESSION_TOLERANCE = 0.25
+
+# (label, weight, message text factory)
+COMMAND_MIX = (
+    ("find", 50, lambda names, rng: f"/find {rng.choice(names)}"),
+    ("stats", 25, lambda names, rng: "/stats"),
+    ("transactions", 15, lambda names, rng: "/transactions"),
+    ("start", 9, lambda names, rng: "/start"),
+    ("registrations", 1, lambda names, rng: "/registrations"),
+)
+
+
+def make_update(update_id, chat_id, text):
+    """Minimal private-chat message update as Telegram would POST it."""
+    entities = []
+    if text.startswith("/"):
+        entities.append({"type": "bot_command", "offset": 0, "length": len(text.split(" ")[0])})
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}"},
+            "text": text,
+            "entities": entities,
+        },
+    }
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+async def run(args):
+    if args.mongomock:
+        import mongomock
+        from src.db import queries
+        queries._client = mongomock.MongoClient()
+        collection = queries._client.get_database(DATABASE_NAME).get_collection(COLLECTION_NAME)
+    else:
+        collection = get_collection()
+
+    print(f"Seeding {args.documents} registrations...")
+    seed(collection, args.documents)
+    names = [doc["teamName"] for doc in collection.find({}, {"teamName": 1}).limit(5000)]
+
+    from src.app import setup_application, start_services, stop_services
+    from src.config import Config
+    from src.webhook import create_app
+
+    Config.RATE_LIMIT_ENABLED = args.rate_limit
+    if args.mongomock:
+        Config.MONGO_DRIVER = "sync"
+    api = FakeBotAPI(latency=args.api_latency)
+    application = setup_application(
+        "123456:BENCH", MONGO_URI, DATABASE_NAME, COLLECTION_NAME, request=FakeBotRequest(api)
+    )
+
+    sent_at = {}
+    latencies = defaultdict(list)
+    labels = {}
+
+    deferred = {}  # update_id -> background task of a detached pool
+
+    def finish(update_id):
+        started = sent_at.pop(update_id, None)
+        if started is not None:
+            latencies[labels.pop(update_id)].append((time.perf_counter() - started) * 1000)
+
+    async def record_done(update, context):
+        task = deferred.pop(update.update_id, None)
+        if task is not None:
+            task.add_done_callback(lambda _: finish(update.update_id))
+        else:
+            finish(update.update_id)
+
+    # Runs after the command handlers of each update have returned; exports
+    # only hand off to their pool by then, so they are timed to completion
+    # through the task the pool starts for them
+    def track(pool):
+        defer = pool.defer
+
+        def tracked(func, update, *args, **kwargs):
+            task = defer(func, update, *args, **kwargs)
+            if task is not None:
+                deferred[update.update_id] = task
+            return task
+        pool.defer = tracked
+
+    for pool in application.bot_data["scheduler"].pools.values():
+        if pool.detached:
+            track(pool)
+    application.add_handler(TypeHandler(Update, record_done), group=99)
+
+    await application.initialize()
+    await application.start()
+    await start_services(application)
+    await asyncio.sleep(1)  # let background indexes/caches warm up
+
+    webhook_app = create_app(lambda: application)
+    transport = httpx.ASGITransport(app=webhook_app)
+    rng = random.Random(1)
+    population = [label for label, weight, _ in COMMAND_MIX for _ in range(weight)]
+    factories = {label: factory for label, _, factory in COMMAND_MIX}
+
+    statuses = defaultdict(int)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        interval = 1 / args.rate
+        total = int(args.rate * args.duration)
+        started = time.perf_counter()
+        posts = []
+        for update_id in range(1, total + 1):
+            label = rng.choice(population)
+            body = make_update(update_id, rng.randint(1, args.chats), factories[label](names, rng))
+            labels[update_id] = label
+            sent_at[update_id] = time.perf_counter()
+            posts.append(asyncio.create_task(client.post("/webhook", json=body)))
+            delay = started + update_id * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        for update_id, response in enumerate(await asyncio.gather(*posts), start=1):
+            statuses[response.status_code] += 1
+            if response.status_code != 200:
+                # Shed updates never reach a handler
+                sent_at.pop(update_id, None)
+                labels.pop(update_id, None)
+
+        deadline = time.perf_counter() + args.drain_timeout
+        while sent_at and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+
+    await stop_services(application)
+    await application.stop()
+    await application.shutdown()
+
+    completed = sum(len(samples) for samples in latencies.values())
+    results = {
+        "documents": args.documents,
+        "rate": args.rate,
+        "throughput": completed / elapsed,
+        "completed": completed,
+        "unfinished": len(sent_at),
+        "http_status": dict(statuses),
+        "peak_rss_mb": peak_rss_mb(),
+        "commands": {
+            label: {
+                "count": len(samples),
+                "p50_ms": percentile(samples, 50),
+                "p99_ms": percentile(samples, 99),
+            }
+            for label, samples in sorted(latencies.items())
+        },
+        "bot_api": api.summary(),
+    }
+    return results
+
+
+def print_results(results):
+    print(f"throughput: {results['throughput']:.1f} updates/s "
+          f"({results['completed']} done, {results['unfinished']} unfinished)")
+    print(f"webhook responses: {results['http_status']}")
+    print(f"peak RSS: {results['peak_rss_mb']:.1f} MB")
+    print(f"{'command':<14} {'count':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for label, stats in results["commands"].items():
+        print(f"{label:<14} {stats['count']:>7} {stats['p50_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+
+def compare(results, baseline):
+    """List regressions of `results` against `baseline` beyond the tolerance."""
+    problems = []
+    limit = 1 + REGRESSION_TOLERANCE
+    if results["throughput"] * limit < baseline["throughput"]:
+        problems.append(f"throughput {results['throughput']:.1f} < baseline {baseline['throughput']:.1f}")
+    for label, stats in results["commands"].items():
+        base = baseline["commands"].get(label)
+        if base and stats["p99_ms"] > base["p99_ms"] * limit:
+            problems.append(f"{label} p99 {stats['p99_ms']:.1f}ms > baseline {base['p99_ms']:.1f}ms")
+    if results["peak_rss_mb"] > baseline["peak_rss_mb"] * limit:
+        problems.append(f"peak RSS {results['peak_rss_mb']:.1f}MB > baseline {baseline['peak_rss_mb']:.1f}MB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook load test with fake Telegram and seeded Mongo")
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--rate", type=float, default=100, help="updates per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of traffic")
+    parser.add_argument("--chats", type=int, default=500, help="distinct simulated users")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="fake Bot API latency (s)")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the outbound rate limiter on")
+    parser.add_argument("--drain-timeout", type=float, default=30)
+    parser.add_argument("--mongomock", action="store_true")
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_results(results)
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"Baseline saved to {path}")
+
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        problems = compare(results, baseline)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        if problems:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
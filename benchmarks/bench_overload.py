@@ -0,0 +1,42 @@
+"""
+Webhook admission under overload: drive the bench_load harness well past
+what the handlers can finish, with a small admission limit, and report how
+many updates were shed with 503 and the latency of the admitted ones.
+
+Usage: python -m benchmarks.bench_overload [rate] [duration]
+Needs a mongod at BENCH_MONGO_URI (default mongodb://localhost:27017).
+Before admission control every update got a 200 here and piled up as
+tasks; now the excess gets 503 + Retry-After and admitted latency stays
+bounded.
+"""
+import argparse
+import asyncio
+import sys
+
+from benchmarks.bench_load import print_results, run
+from src.config import Config
+
+CONCURRENT_UPDATES = 16
+UPDATE_QUEUE_MAXSIZE = 32
+
+
+def main(rate=2000.0, duration=5.0):
+    Config.CONCURRENT_UPDATES = CONCURRENT_UPDATES
+    Config.UPDATE_QUEUE_MAXSIZE = UPDATE_QUEUE_MAXSIZE
+    Config.WEBHOOK_SHED_POLICY = "reject"
+    args = argparse.Namespace(
+        documents=10000, rate=rate, duration=duration, chats=500,
+        # A slow Bot API keeps handlers busy so admission fills up
+        api_latency=0.2, rate_limit=False, drain_timeout=30, mongomock=False
+    )
+    results = asyncio.run(run(args))
+    print(f"admission limit: {CONCURRENT_UPDATES} processing + {UPDATE_QUEUE_MAXSIZE} waiting")
+    print_results(results)
+    shed = results["http_status"].get(503, 0)
+    total = sum(results["http_status"].values())
+    print(f"shed with 503: {shed} of {total} ({shed / total:.0%})")
+
+
+if __name__ == "__main__":
+    values = [float(a) for a in sys.argv[1:3]]
+    main(*values)
@@ -0,0 +1,88 @@
+"""
+/find latency while /registrations exports are running: one shared
+executor vs per-command-class pools.
+
+Usage: python -m benchmarks.bench_scheduler [exports] [lookups]
+Runs without MongoDB; queries are simulated with blocking sleeps.
+"""
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.bot.scheduler import CommandScheduler
+from src.db.runner import run_query
+
+EXPORT_SECONDS = 1.0
+LOOKUP_SECONDS = 0.005
+LOOKUP_INTERVAL = 0.01
+
+
+def fake_export():
+    time.sleep(EXPORT_SECONDS)
+
+
+def fake_lookup():
+    time.sleep(LOOKUP_SECONDS)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def drive(run_export, run_lookup, exports, lookups):
+    """Start `exports` exports, then issue lookups at a steady rate."""
+    export_tasks = [asyncio.create_task(run_export()) for _ in range(exports)]
+    await asyncio.sleep(0.05)
+
+    async def timed_lookup():
+        start = time.perf_counter()
+        await run_lookup()
+        return (time.perf_counter() - start) * 1000
+
+    lookup_tasks = []
+    for _ in range(lookups):
+        lookup_tasks.append(asyncio.create_task(timed_lookup()))
+        await asyncio.sleep(LOOKUP_INTERVAL)
+    latencies = await asyncio.gather(*lookup_tasks)
+    await asyncio.gather(*export_tasks)
+    return latencies
+
+
+async def main(exports=8, lookups=200):
+    loop = asyncio.get_running_loop()
+
+    # Default executor sized like a small container (min(32, cpus + 4))
+    shared = ThreadPoolExecutor(max_workers=5)
+    loop.set_default_executor(shared)
+    baseline = await drive(
+        lambda: run_query(fake_export), lambda: run_query(fake_lookup), 0, lookups
+    )
+    contended = await drive(
+        lambda: run_query(fake_export), lambda: run_query(fake_lookup), exports, lookups
+    )
+
+    scheduler = CommandScheduler({"export": 2, "lookup": 32})
+    export_pool = scheduler.pool("export")
+    lookup_pool = scheduler.pool("lookup")
+    scheduled = await drive(
+        lambda: export_pool.run(run_query, fake_export),
+        lambda: lookup_pool.run(run_query, fake_lookup),
+        exports, lookups
+    )
+    scheduler.shutdown()
+
+    print(f"{'setup':<28} {'find p50 ms':>12} {'find p99 ms':>12}")
+    for label, samples in (
+        ("no exports", baseline),
+        (f"shared pool, {exports} exports", contended),
+        (f"scheduler, {exports} exports", scheduled),
+    ):
+        print(f"{label:<28} {percentile(samples, 50):>12.1f} {percentile(samples, 99):>12.1f}")
+    print(f"export pool queue wait total: {export_pool.wait_seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    asyncio.run(main(*args))
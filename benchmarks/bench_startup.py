@@ -0,0 +1,66 @@
+"""
+Import-time profile of the bot entry point, from `python -X importtime`.
+
+Usage: python -m benchmarks.bench_startup [module] [top]
+Each run uses a fresh interpreter; the report lists total import time and
+the slowest top-level packages by cumulative time, so a heavy dependency
+creeping back onto the startup path is easy to spot.
+"""
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+RUNS = 5
+
+
+def import_profile(module):
+    """Return {module name: cumulative microseconds} for one cold import."""
+    env = dict(os.environ)
+    env.setdefault("TELEGRAM_BOT_TOKEN", "0:bench")
+    env.setdefault("CONNECTION_STRING", "mongodb://localhost:27017")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented; top-level packages are what we rank
+        timings.setdefault(name.strip(), int(cumulative))
+        if name.strip() == module:
+            break
+    return timings
+
+
+def main(module="bot", top=15):
+    totals = []
+    packages = defaultdict(list)
+    for _ in range(RUNS):
+        timings = import_profile(module)
+        totals.append(timings.get(module, 0) / 1000)
+        for name, micros in timings.items():
+            if "." not in name:
+                packages[name].append(micros / 1000)
+
+    totals.sort()
+    print(f"import {module}: median {totals[len(totals) // 2]:.1f}ms "
+          f"(min {totals[0]:.1f}ms, max {totals[-1]:.1f}ms, {RUNS} runs)")
+
+    ranked = sorted(
+        ((sorted(v)[len(v) // 2], name) for name, v in packages.items() if name != module),
+        reverse=True
+    )
+    print(f"{'package':<24} {'cumulative ms':>14}")
+    for millis, name in ranked[:top]:
+        print(f"{name:<24} {millis:>14.1f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(args[0] if args else "bot", int(args[1]) if len(args) > 1 else 15)
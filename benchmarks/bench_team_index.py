@@ -0,0 +1,68 @@
+"""
+Build and query the in-memory team name index over synthetic names.
+
+Usage: python -m benchmarks.bench_team_index [names] [queries]
+Runs without MongoDB.
+"""
+import random
+import sys
+import time
+
+from benchmarks.seed import make_registration
+from src.db.team_index import TeamNameIndex
+
+
+def typo(rng, text):
+    """Apply one random substitution, deletion or transposition."""
+    if len(text) < 3:
+        return text
+    i = rng.randrange(1, len(text) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return text[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + text[i + 1:]
+    if kind == 1:
+        return text[:i] + text[i + 1:]
+    return text[:i - 1] + text[i] + text[i - 1] + text[i + 1:]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main(names=100000, queries=2000):
+    rng = random.Random(7)
+    docs = [(i, make_registration(rng, i)["teamName"]) for i in range(names)]
+
+    index = TeamNameIndex(loader=None)
+    start = time.perf_counter()
+    index.load(docs)
+    print(f"Built index over {len(index)} names in {time.perf_counter() - start:.2f}s")
+
+    picks = [rng.choice(docs)[1] for _ in range(queries)]
+    workloads = {
+        "exact": [name.upper() for name in picks],
+        "prefix": [name.split(" ")[0][:4] for name in picks],
+        "typo": [typo(rng, name) for name in picks],
+    }
+
+    print(f"{'query':<8} {'p50 ms':>8} {'p99 ms':>8} {'hit@5':>6}")
+    for label, items in workloads.items():
+        timings = []
+        hits = 0
+        for query, expected in zip(items, picks):
+            t0 = time.perf_counter()
+            results = index.search(query, limit=5)
+            timings.append((time.perf_counter() - t0) * 1000)
+            hits += any(name == expected for _, name, _ in results)
+        print(f"{label:<8} {percentile(timings, 50):>8.3f} {percentile(timings, 99):>8.3f} {hits / len(items):>6.0%}")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.add(("new", i), f"Fresh Team {i}")
+    print(f"Incremental insert: {(time.perf_counter() - start) * 1000 / 1000:.3f} ms/name")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,165 @@
+"""
+Webhook throughput as the number of uvicorn workers grows.
+
+For each worker count the real entry point (`uvicorn bot:app --workers N`)
+is started against a fake Bot API server and seeded MongoDB, a fixed batch
+of updates is POSTed over HTTP, and throughput is measured from the replies
+the fake API receives. The setWebhook column counts registrations per run:
+workers claim the registration through the shared state backend, so it
+should stay at 1 unless a claim expired or a registration failed.
+
+Usage: python -m benchmarks.bench_workers --workers 1,2,4 --updates 3000
+
+Needs a mongod at BENCH_MONGO_URI (default mongodb://localhost:27017).
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_load import COMMAND_MIX, make_update
+from benchmarks.seed import COLLECTION_NAME, DATABASE_NAME, MONGO_URI, get_collection, seed
+
+# Seconds without new Bot API calls after which a run counts as drained
+IDLE_SECONDS = 1.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(client, url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def api_stats(client, api_url):
+    return (await client.get(f"{api_url}/stats")).json()
+
+
+async def run_workers(workers, args, names, state_path):
+    api_port, bot_port = free_port(), free_port()
+    api_url = f"http://127.0.0.1:{api_port}"
+    bot_url = f"http://127.0.0.1:{bot_port}"
+    env = dict(
+        os.environ,
+        TELEGRAM_BOT_TOKEN="123456:BENCH",
+        WEB_CONCURRENCY=str(workers),
+        WEBHOOK_URL=bot_url,
+        TELEGRAM_API_URL=api_url,
+        CONNECTION_STRING=MONGO_URI,
+        DATABASE_NAME=DATABASE_NAME,
+        COLLECTION_NAME=COLLECTION_NAME,
+        RATE_LIMIT_ENABLED="false",
+        STATE_BACKEND=args.backend,
+        STATE_SQLITE_PATH=state_path,
+    )
+    api = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_bot_api", "--port", str(api_port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    bot = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bot:app", "--host", "127.0.0.1",
+         "--port", str(bot_port), "--workers", str(workers), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            await wait_ready(client, f"{api_url}/stats")
+            await wait_ready(client, f"{bot_url}/")
+            await asyncio.sleep(args.warmup)
+            before = (await api_stats(client, api_url))["calls"]
+
+            rng = random.Random(1)
+            population = [label for label, weight, _ in COMMAND_MIX for _ in range(weight)
+                          if label != "registrations"]
+            factories = {label: factory for label, _, factory in COMMAND_MIX}
+            bodies = [
+                make_update(i, rng.randint(1, args.chats), factories[rng.choice(population)](names, rng))
+                for i in range(1, args.updates + 1)
+            ]
+
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def post(body):
+                async with semaphore:
+                    return (await client.post(f"{bot_url}/webhook", json=body)).status_code
+
+            started = time.perf_counter()
+            statuses = await asyncio.gather(*(post(body) for body in bodies))
+
+            # Drained once the fake API has been idle for IDLE_SECONDS
+            calls, last_change = before, time.perf_counter()
+            while time.perf_counter() - last_change < IDLE_SECONDS:
+                await asyncio.sleep(0.1)
+                current = (await api_stats(client, api_url))["calls"]
+                if current != calls:
+                    calls, last_change = current, time.perf_counter()
+            elapsed = last_change - started
+            summary = await api_stats(client, api_url)
+    finally:
+        bot.terminate()
+        api.terminate()
+        bot.wait()
+        api.wait()
+
+    return {
+        "workers": workers,
+        "throughput": args.updates / elapsed,
+        "replies": calls - before,
+        "accepted": sum(1 for status in statuses if status == 200),
+        "set_webhook": summary["per_method"].get("setWebhook", 0),
+    }
+
+
+async def main_async(args):
+    print(f"Seeding {args.documents} registrations...")
+    collection = get_collection()
+    seed(collection, args.documents)
+    names = [doc["teamName"] for doc in collection.find({}, {"teamName": 1}).limit(5000)]
+
+    print(f"{'workers':>7} {'updates/s':>10} {'speedup':>8} {'replies':>8} {'accepted':>9} {'setWebhook':>11}")
+    baseline = None
+    for workers in args.workers:
+        # Fresh shared state so every run has to claim the webhook again
+        with tempfile.TemporaryDirectory(dir="/dev/shm" if os.path.isdir("/dev/shm") else None) as tmp:
+            result = await run_workers(workers, args, names, os.path.join(tmp, "state.sqlite3"))
+        baseline = baseline or result["throughput"]
+        print(f"{workers:>7} {result['throughput']:>10.1f} {result['throughput'] / baseline:>7.2f}x "
+              f"{result['replies']:>8} {result['accepted']:>9} {result['set_webhook']:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput scaling with uvicorn worker count")
+    parser.add_argument("--workers", type=lambda v: [int(n) for n in v.split(",")], default=[1, 2, 4])
+    parser.add_argument("--updates", type=int, default=3000)
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100, help="parallel webhook POSTs")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds to let workers warm up")
+    parser.add_argument("--backend", default="sqlite", choices=("sqlite", "redis"),
+                        help="shared state backend (several workers need one)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Fake Telegram Bot API for local testing of outbound traffic.
+
+Use it in-process with `ApplicationBuilder().request(FakeBotRequest(api))`,
+or serve it and point the bot at it with TELEGRAM_API_URL:
+
+    python -m benchmarks.fake_bot_api --port 8081 --flood-limit 5
+
+With a flood limit, more than that many calls per chat within one second
+get a 429 with `retry_after`, like the real API.
+"""
+import argparse
+import asyncio
+import email
+import itertools
+import json
+import time
+from collections import defaultdict, deque
+from urllib.parse import parse_qs
+
+from telegram.request import BaseRequest
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+
+class FakeBotAPI:
+    """Bot API method responses plus optional per-chat flood control."""
+
+    def __init__(self, flood_limit=None, retry_after=1, latency=0.0):
+        self.flood_limit = flood_limit
+        self.retry_after = retry_after
+        self.latency = latency
+        self.calls = []
+        self.flooded = 0
+        self.webhook_url = ""
+        self._message_ids = itertools.count(1)
+        self._recent = defaultdict(deque)
+
+    def handle(self, method, params):
+        """Return `(status, payload)` for one API call."""
+        chat_id = params.get("chat_id")
+        now = time.monotonic()
+        self.calls.append((now, method, chat_id))
+
+        if self.flood_limit and chat_id is not None:
+            recent = self._recent[chat_id]
+            while recent and now - recent[0] > 1.0:
+                recent.popleft()
+            if len(recent) >= self.flood_limit:
+                self.flooded += 1
+                return 429, {
+                    "ok": False, "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after}
+                }
+            recent.append(now)
+
+        return 200, {"ok": True, "result": self._result(method, params)}
+
+    def _message(self, params, **extra):
+        chat_id = params.get("chat_id", 0)
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "group" if int(chat_id) < 0 else "private"},
+            "from": BOT_USER,
+        }
+        message.update(extra)
+        return message
+
+    def _result(self, method, params):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getWebhookInfo":
+            return {"url": self.webhook_url, "has_custom_certificate": False, "pending_update_count": 0}
+        if method == "setWebhook":
+            self.webhook_url = str(params.get("url", ""))
+        if method == "deleteWebhook":
+            self.webhook_url = ""
+        if method in ("sendMessage", "editMessageText"):
+            return self._message(params, text=str(params.get("text", "")))
+        if method == "sendDocument":
+            file_id = f"file-{next(self._message_ids)}"
+            return self._message(params, document={"file_id": file_id, "file_unique_id": file_id})
+        return True
+
+    def summary(self):
+        """Calls per method and flood-control rejections."""
+        per_method = defaultdict(int)
+        for _, method, _ in self.calls:
+            per_method[method] += 1
+        return {"calls": len(self.calls), "flooded": self.flooded, "per_method": dict(per_method)}
+
+
+class FakeBotRequest(BaseRequest):
+    """In-process transport that answers from a FakeBotAPI."""
+
+    def __init__(self, api):
+        self.api = api
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        if self.api.latency:
+            await asyncio.sleep(self.api.latency)
+        params = request_data.parameters if request_data is not None else {}
+        status, payload = self.api.handle(url.rsplit("/", 1)[-1], params)
+        return status, json.dumps(payload).encode("utf-8")
+
+
+def parse_form(content_type, body):
+    """Decode urlencoded, multipart or JSON request bodies into a dict."""
+    if content_type.startswith("application/json"):
+        return json.loads(body or b"{}")
+    if content_type.startswith("multipart/form-data"):
+        message = email.message_from_bytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body
+        )
+        params = {}
+        for part in message.get_payload():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename() is None:
+                params[name] = part.get_payload(decode=True).decode("utf-8")
+        return _coerce(params)
+    return _coerce({key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()})
+
+
+def _coerce(params):
+    """Form values are JSON-encoded when they are not plain strings."""
+    decoded = {}
+    for key, value in params.items():
+        try:
+            decoded[key] = json.loads(value)
+        except (TypeError, ValueError):
+            decoded[key] = value
+    return decoded
+
+
+def create_app(api):
+    """FastAPI app serving `/bot<token>/<method>` from `api`."""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    app = FastAPI(title="Fake Bot API")
+
+    @app.post("/bot{token}/{method}")
+    async def call(token: str, method: str, request: Request):
+        params = parse_form(request.headers.get("content-type", ""), await request.body())
+        status, payload = api.handle(method, params)
+        return JSONResponse(payload, status_code=status)
+
+    @app.get("/stats")
+    async def stats():
+        return api.summary()
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--flood-limit", type=int, default=None)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+    uvicorn.run(create_app(FakeBotAPI(args.flood_limit, args.retry_after)), host="127.0.0.1", port=args.port)
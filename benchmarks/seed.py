@@ -0,0 +1,48 @@
+"""Seed a scratch collection with synthetic registration documents."""
+import os
+import random
+import string
+
+from pymongo import MongoClient
+
+MONGO_URI = os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017")
+DATABASE_NAME = os.getenv("BENCH_DATABASE_NAME", "brewathon_bench")
+COLLECTION_NAME = os.getenv("BENCH_COLLECTION_NAME", "registrations")
+
+
+def random_word(rng, length):
+    """Lowercase pseudo-word of the given length."""
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def make_registration(rng, index):
+    """Synthetic document with the registration shape."""
+    doc = {
+        "teamName": f"{random_word(rng, rng.randint(4, 10)).title()} {index}",
+        "transactionId": f"TXN{rng.randrange(10**11):011d}",
+    }
+    for n in range(1, rng.randint(1, 4) + 1):
+        doc[f"member{n}Name"] = f"{random_word(rng, 6).title()} {random_word(rng, 8).title()}"
+    return doc
+
+
+def get_collection(uri=MONGO_URI, database_name=DATABASE_NAME, collection_name=COLLECTION_NAME):
+    """Scratch collection used by the benchmarks."""
+    return MongoClient(uri).get_database(database_name).get_collection(collection_name)
+
+
+def seed(collection, count, batch_size=10000, seed_value=42):
+    """Replace the collection contents with `count` synthetic registrations."""
+    rng = random.Random(seed_value)
+    collection.drop()
+    for start in range(0, count, batch_size):
+        batch = [make_registration(rng, i) for i in range(start, min(start + batch_size, count))]
+        collection.insert_many(batch, ordered=False)
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    seed(get_collection(), total)
+    print(f"Seeded {total} registrations into {DATABASE_NAME}.{COLLECTION_NAME}")
@@ -1,17 +1,20 @@
 """Main bot application entry point."""
 import asyncio
 import logging
-import uvicorn
 from contextlib import asynccontextmanager
 
 from src.config import Config
-from src.app import setup_application, setup_webhook
+from src.app import setup_application, setup_webhook, start_services, stop_services
+from src.db.runner import open_database, close_database
+from src.logs import parse_sample_rates, setup_logging
 from src.webhook import create_app
 
-# Logging setup
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO
+# Logging setup: records are queued and written by a listener thread
+setup_logging(
+    level=Config.LOG_LEVEL,
+    fmt=Config.LOG_FORMAT,
+    queue_size=Config.LOG_QUEUE_SIZE,
+    sample_rates=parse_sample_rates(Config.LOG_SAMPLE_RATES)
 )
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
@@ -19,11 +22,16 @@ logger = logging.getLogger(__name__)
 
 # Global telegram application
 telegram_app = None
+webhook_task = None
+warmup_task = None
 
 
 async def setup_bot():
     """Initialize and set up the bot."""
-    global telegram_app
+    global telegram_app, webhook_task
+    
+    # Also checked here: `uvicorn bot:app --workers N` does not go through main()
+    Config.validate()
     
     # Set up Telegram application
     telegram_app = setup_application(
@@ -36,24 +44,55 @@ async def setup_bot():
     # Initialize the application
     await telegram_app.initialize()
     await telegram_app.start()
+    await start_services(telegram_app)
     
-    # Set up webhook
-    await setup_webhook(telegram_app.bot, Config.WEBHOOK_URL)
+    # Register the webhook in the background so uvicorn starts accepting
+    # traffic right away; an existing registration keeps delivering updates.
+    webhook_task = asyncio.create_task(
+        register_webhook(telegram_app.bot, telegram_app.bot_data["backend"])
+    )
     
     logger.info("Bot initialized and started successfully")
     return telegram_app
 
 
+async def warm_database():
+    """Open MongoDB connections without holding up startup."""
+    if not await open_database(Config.CONNECTION_STRING):
+        logger.warning("MongoDB warm-up failed; connecting on first request")
+
+
+async def register_webhook(bot, backend):
+    """Set the webhook without failing startup on a transient error."""
+    try:
+        await setup_webhook(bot, Config.WEBHOOK_URL, backend)
+    except Exception as e:
+        logger.error(f"Webhook registration failed: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app):
     """Lifespan context manager for FastAPI."""
-    # Startup
+    global warmup_task
+    # Startup: warm MongoDB in the background while uvicorn starts serving;
+    # the first queries connect on demand if it has not finished
+    warmup_task = asyncio.create_task(warm_database())
     await setup_bot()
     yield
-    # Shutdown
+    # Shutdown: drain in-flight updates, then services, then the client
+    for task in (webhook_task, warmup_task):
+        if task and not task.done():
+            task.cancel()
     if telegram_app:
         await telegram_app.stop()
+        await stop_services(telegram_app)
         await telegram_app.shutdown()
+    await close_database()
+
+
+# Module-level app so uvicorn can import "bot:app" in every worker process;
+# each worker runs the lifespan and gets its own Application
+app = create_app(lambda: telegram_app, lifespan)
 
 
 def main():
@@ -64,13 +103,13 @@ def main():
     except ValueError as e:
         logger.error(f"Configuration error: {e}")
         exit(1)
-    
-    # Create FastAPI app with lifespan
-    fastapi_app = create_app(lambda: telegram_app, lifespan)
-    
-    # Run FastAPI app with Uvicorn
-    logger.info(f"Starting FastAPI server on port {Config.PORT}")
-    uvicorn.run(fastapi_app, host="0.0.0.0", port=Config.PORT)
+
+    # Run FastAPI app with Uvicorn (imported here, only the CLI entry needs it)
+    import uvicorn
+
+    logger.info(f"Starting FastAPI server on port {Config.PORT} with {Config.WORKERS} worker(s)")
+    # log_config=None: uvicorn's own loggers propagate to the queued root handler
+    uvicorn.run("bot:app", host="0.0.0.0", port=Config.PORT, workers=Config.WORKERS, log_config=None)
 
 
 if __name__ == "__main__":
@@ -1,20 +1,221 @@
 """Application setup and initialization."""
+import asyncio
 import logging
+import os
 from functools import partial
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
+from telegram.ext import (
+    ApplicationBuilder, CommandHandler, MessageHandler,
+    CallbackQueryHandler, filters
+)
 
+from src.backend import create_backend
+from src.bot.admission import AdmittedUpdateProcessor, UpdateAdmission
+from src.config import Config
 from src.bot.handlers import (
-    start, send_stats, send_csv, find_command,
-    send_transactions, handle_text
+    start, send_stats, check_stats, send_csv, find_command,
+    find_choice, send_transactions, transactions_page, import_command, send_analytics,
+    handle_text
 )
+from src.bot.conversation import ConversationStore, FilePersistence, MongoPersistence
+from src.bot.ratelimit import TokenBucketRateLimiter
+from src.bot.request import TimedRequest
+from src.bot.exports import ExportCoordinator, build_registrations_export
+from src.bot.scheduler import CommandScheduler
+from src.db.analytics import AnalyticsRefresher, load_analytics, materialize_analytics
+from src.db.cache import StatsCache
+from src.db.changes import ChangeFeed, SharedChangeMarker, collection_version
+from src.db.counters import StatsCounter
+from src.db.queries import get_stats, get_member_counts, get_team_names, ensure_indexes
+from src.db.team_index import TeamNameIndex
+from src.db.runner import run_query
+from src.logs import logged, queue_stats
+from src.metrics import REGISTRY, instrumented
 
 logger = logging.getLogger(__name__)
 
+# Seconds one worker's webhook registration blocks the others
+WEBHOOK_CLAIM_TTL = 300
+
+UPDATE_QUEUE_DEPTH = REGISTRY.gauge(
+    "bot_update_queue_depth", "Admitted updates waiting for a processing slot.")
+UPDATES_IN_FLIGHT = REGISTRY.gauge(
+    "bot_updates_in_flight", "Admitted updates not yet finished by their handlers.")
+CACHE_REQUESTS = REGISTRY.gauge(
+    "bot_cache_requests", "Cache lookups since start by cache and result.", ["cache", "result"])
+POOL_SLOTS = REGISTRY.gauge(
+    "bot_pool_slots", "Scheduler pool handlers by state (active, waiting).", ["pool", "state"])
+POOL_REJECTED = REGISTRY.counter(
+    "bot_pool_rejected_total", "Handlers turned away because a pool's backlog was full.", ["pool"])
+POOL_WAIT = REGISTRY.counter(
+    "bot_pool_wait_seconds_total", "Total time handlers queued for a scheduler pool slot.", ["pool"])
+RATE_LIMITER = REGISTRY.gauge(
+    "bot_rate_limiter", "Outbound rate limiter counters and state.", ["metric"])
+LOG_QUEUE = REGISTRY.gauge(
+    "bot_log_records", "Log records waiting in the log queue, and dropped because it was full.",
+    ["state"])
+
 
 def setup_application(bot_token: str, connection_string: str, 
-                     database_name: str, collection_name: str):
-    """Set up the Telegram application with handlers."""
-    application = ApplicationBuilder().token(bot_token).build()
+                     database_name: str, collection_name: str, request=None):
+    """
+    Set up the Telegram application with handlers.
+    `request` optionally replaces the Bot API transport (e.g. a fake API in
+    the benchmarks).
+    """
+    # The webhook admits at most CONCURRENT_UPDATES + UPDATE_QUEUE_MAXSIZE
+    # unfinished updates; the processor frees a slot when handlers finish
+    admission = UpdateAdmission(Config.CONCURRENT_UPDATES + Config.UPDATE_QUEUE_MAXSIZE)
+    update_processor = AdmittedUpdateProcessor(Config.CONCURRENT_UPDATES, admission)
+    builder = (
+        ApplicationBuilder()
+        .token(bot_token)
+        .concurrent_updates(update_processor)
+        .update_queue(asyncio.Queue(maxsize=admission.limit))
+    )
+
+    # Caches, locks and rate-limit buckets shared with other workers
+    backend = create_backend(
+        Config.STATE_BACKEND,
+        sqlite_path=Config.STATE_SQLITE_PATH,
+        redis_url=Config.STATE_REDIS_URL
+    )
+
+    rate_limiter = None
+    if Config.RATE_LIMIT_ENABLED:
+        rate_limiter = TokenBucketRateLimiter(
+            global_rate=Config.RATE_LIMIT_GLOBAL,
+            chat_rate=Config.RATE_LIMIT_PER_CHAT,
+            chat_burst=Config.RATE_LIMIT_CHAT_BURST,
+            group_rate=Config.RATE_LIMIT_PER_GROUP / 60,
+            max_retries=Config.RATE_LIMIT_MAX_RETRIES,
+            backend=backend
+        )
+        builder = builder.rate_limiter(rate_limiter)
+
+    # Point the bot at another Bot API server (local server or a fake for tests)
+    if Config.TELEGRAM_API_URL:
+        builder = (
+            builder
+            .base_url(f"{Config.TELEGRAM_API_URL}/bot")
+            .base_file_url(f"{Config.TELEGRAM_API_URL}/file/bot")
+        )
+
+    # Bot API calls are timed as the "telegram" stage of the current command
+    builder = builder.request(TimedRequest(request))
+    if request is not None:
+        builder = builder.get_updates_request(request)
+
+    application = builder.build()
+
+    # Shared services, reachable from handlers through context.bot_data
+    application.bot_data["db"] = (connection_string, database_name, collection_name)
+    application.bot_data["admission"] = admission
+    application.bot_data["backend"] = backend
+    application.bot_data["rate_limiter"] = rate_limiter
+
+    # Heavy exports and quick lookups get separate concurrency limits and
+    # thread pools so exports cannot starve /find; exports queue in the
+    # background instead of holding concurrent update slots
+    scheduler = CommandScheduler(
+        {"export": Config.EXPORT_CONCURRENCY, "lookup": Config.LOOKUP_CONCURRENCY},
+        backlogs={"export": Config.EXPORT_BACKLOG}
+    )
+    application.bot_data["scheduler"] = scheduler
+
+    stats_cache = StatsCache(
+        partial(run_query, get_stats, connection_string, database_name, collection_name),
+        ttl=Config.STATS_CACHE_TTL,
+        backend=backend
+    )
+    application.bot_data["stats_cache"] = stats_cache
+
+    # Live analytics are cached like stats; materialized ones are re-read
+    # after each scheduled refresh (in every worker: with a shared backend
+    # the cached copy lives there)
+    analytics_cache = StatsCache(
+        partial(run_query, load_analytics, connection_string, database_name, collection_name,
+                Config.ANALYTICS_MATERIALIZE),
+        ttl=Config.STATS_CACHE_TTL,
+        backend=backend,
+        key="analytics"
+    )
+    application.bot_data["analytics_cache"] = analytics_cache
+    if Config.ANALYTICS_MATERIALIZE:
+        application.bot_data["analytics_refresher"] = AnalyticsRefresher(
+            partial(run_query, materialize_analytics, connection_string, database_name, collection_name),
+            interval=Config.ANALYTICS_REFRESH_INTERVAL,
+            backend=backend,
+            on_refresh=analytics_cache.invalidate
+        )
+
+    # Multi-step menu flows; state is written behind so restarts keep it
+    persistence = None
+    if Config.CONVERSATION_PERSISTENCE == "mongo":
+        persistence = MongoPersistence(connection_string, database_name, collection_name)
+    elif Config.CONVERSATION_PERSISTENCE == "file":
+        persistence = FilePersistence(Config.CONVERSATION_FILE)
+    application.bot_data["conversations"] = ConversationStore(
+        ttl=Config.CONVERSATION_TTL,
+        max_chats=Config.CONVERSATION_MAX_CHATS,
+        persistence=persistence,
+        flush_interval=Config.CONVERSATION_FLUSH_INTERVAL,
+        backend=backend
+    )
+
+    team_index = None
+    if Config.TEAM_INDEX_ENABLED:
+        # Without a change feed the index is kept fresh by periodic rebuilds
+        refresh_interval = Config.TEAM_INDEX_REFRESH_INTERVAL
+        if Config.CHANGE_FEED_MODE in ("change_stream", "poll"):
+            refresh_interval = 0
+        team_index = TeamNameIndex(
+            partial(run_query, get_team_names, connection_string, database_name, collection_name),
+            refresh_interval=refresh_interval
+        )
+        application.bot_data["team_index"] = team_index
+
+    if Config.CHANGE_FEED_MODE in ("change_stream", "poll"):
+        change_feed = ChangeFeed(
+            connection_string, database_name, collection_name,
+            mode=Config.CHANGE_FEED_MODE,
+            poll_interval=Config.CHANGE_FEED_POLL_INTERVAL
+        )
+        change_feed.subscribe(stats_cache.invalidate)
+        if not Config.ANALYTICS_MATERIALIZE:
+            change_feed.subscribe(analytics_cache.invalidate)
+        if team_index is not None:
+            change_feed.subscribe(team_index.apply)
+        application.bot_data["change_feed"] = change_feed
+
+        # Export cache key shared by all workers; sees updates too
+        change_marker = SharedChangeMarker(backend, f"changes:{database_name}.{collection_name}")
+        change_feed.subscribe(change_marker.apply)
+        application.bot_data["change_marker"] = change_marker
+
+        if Config.STATS_INCREMENTAL:
+            stats_counter = StatsCounter(
+                partial(run_query, get_member_counts, connection_string, database_name, collection_name),
+                reconcile_interval=Config.STATS_RECONCILE_INTERVAL,
+                max_teams=Config.STATS_MAX_TEAMS
+            )
+            change_feed.subscribe(stats_counter.apply)
+            application.bot_data["stats_counter"] = stats_counter
+    elif Config.STATS_INCREMENTAL:
+        logger.warning("STATS_INCREMENTAL needs CHANGE_FEED_MODE, using cached aggregation instead")
+
+    async def registrations_version():
+        return await collection_version(
+            application.bot_data.get("change_marker"),
+            connection_string, database_name, collection_name
+        )
+
+    application.bot_data["export_coordinator"] = ExportCoordinator(
+        partial(build_registrations_export, connection_string, database_name, collection_name),
+        registrations_version,
+        ttl=Config.EXPORT_CACHE_TTL,
+        pool=scheduler.pool("export"),
+        backend=backend
+    )
 
     # Create partial functions with database credentials
     stats_handler = partial(send_stats, 
@@ -27,16 +228,41 @@ def setup_application(bot_token: str, connection_string: str,
                          database_name=database_name,
                          collection_name=collection_name)
     
+    stats_check_handler = partial(check_stats,
+                                 connection_string=connection_string,
+                                 database_name=database_name,
+                                 collection_name=collection_name)
+
     find_handler = partial(find_command,
                           connection_string=connection_string,
                           database_name=database_name,
                           collection_name=collection_name)
+
+    find_choice_handler = partial(find_choice,
+                                 connection_string=connection_string,
+                                 database_name=database_name,
+                                 collection_name=collection_name)
     
     transactions_handler = partial(send_transactions,
                                   connection_string=connection_string,
                                   database_name=database_name,
                                   collection_name=collection_name)
     
+    transactions_page_handler = partial(transactions_page,
+                                       connection_string=connection_string,
+                                       database_name=database_name,
+                                       collection_name=collection_name)
+
+    analytics_handler = partial(send_analytics,
+                               connection_string=connection_string,
+                               database_name=database_name,
+                               collection_name=collection_name)
+
+    import_handler = partial(import_command,
+                            connection_string=connection_string,
+                            database_name=database_name,
+                            collection_name=collection_name)
+
     text_handler = partial(handle_text,
                           connection_string=connection_string,
                           database_name=database_name,
@@ -45,18 +271,174 @@ def setup_application(bot_token: str, connection_string: str,
     # Add command handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("stats", stats_handler))
+    application.add_handler(CommandHandler("statscheck", stats_check_handler))
     application.add_handler(CommandHandler("find", find_handler))
     application.add_handler(CommandHandler("registrations", csv_handler))
     application.add_handler(CommandHandler("transactions", transactions_handler))
+    application.add_handler(CommandHandler("analytics", analytics_handler))
+    application.add_handler(CommandHandler("import", import_handler))
+    application.add_handler(MessageHandler(
+        filters.Document.ALL & filters.CaptionRegex(r"^/import\b"), import_handler
+    ))
+
+    # Add callback handlers for inline keyboards
+    application.add_handler(CallbackQueryHandler(find_choice_handler, pattern=r"^find:"))
+    application.add_handler(CallbackQueryHandler(transactions_page_handler, pattern=r"^tx:"))
 
     # Add message handler for menu buttons
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, text_handler))
 
+    instrument_handlers(application)
+    REGISTRY.set_collector("application", partial(collect_metrics, application))
+
     return application
 
 
-async def setup_webhook(bot, webhook_url: str):
-    """Set up webhook for the bot."""
+def handler_label(handler):
+    """Metrics label for a registered handler."""
+    if isinstance(handler, CommandHandler):
+        return sorted(handler.commands)[0]
+    if isinstance(handler, CallbackQueryHandler) and handler.pattern is not None:
+        # Kept apart from the command of the same name, e.g. "cb_find" vs "find"
+        return f"cb_{handler.pattern.pattern.strip('^:')}"
+    # Other message handlers are labelled by their callback, e.g. "import"
+    callback = getattr(handler.callback, "func", handler.callback)
+    name = getattr(callback, "__name__", "text")
+    return "text" if name == "handle_text" else name.removesuffix("_command")
+
+
+def instrument_handlers(application):
+    """Wrap every registered handler callback with latency/error metrics and its log context."""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            label = handler_label(handler)
+            handler.callback = logged(label)(instrumented(label)(handler.callback))
+
+
+def collect_metrics(application):
+    """Refresh gauges from live application services (called per scrape)."""
+    bot_data = application.bot_data
+    admission = bot_data.get("admission")
+    if admission is not None:
+        UPDATES_IN_FLIGHT.set(admission.in_flight)
+        UPDATE_QUEUE_DEPTH.set(application.update_processor.pending)
+
+    for key, cache in (("stats", bot_data.get("stats_cache")),
+                       ("analytics", bot_data.get("analytics_cache")),
+                       ("export", bot_data.get("export_coordinator"))):
+        if cache is not None:
+            CACHE_REQUESTS.set(cache.hits, cache=key, result="hit")
+            CACHE_REQUESTS.set(cache.misses, cache=key, result="miss")
+
+    scheduler = bot_data.get("scheduler")
+    if scheduler is not None:
+        for name, pool in scheduler.pools.items():
+            POOL_SLOTS.set(pool.active, pool=name, state="active")
+            POOL_SLOTS.set(pool.waiting, pool=name, state="waiting")
+            POOL_WAIT.set(pool.wait_seconds, pool=name)
+            POOL_REJECTED.set(pool.rejected, pool=name)
+
+    rate_limiter = bot_data.get("rate_limiter")
+    if rate_limiter is not None:
+        for metric, value in rate_limiter.snapshot().items():
+            RATE_LIMITER.set(value, metric=metric)
+
+    for state, value in queue_stats().items():
+        LOG_QUEUE.set(value, state=state)
+
+
+async def create_indexes(db):
+    """Ensure indexes in the background; queries work (slower) until then."""
+    if await run_query(ensure_indexes, *db):
+        logger.info("Database indexes ensured")
+
+
+async def start_services(application):
+    """Start background services registered in bot_data (none of them block startup)."""
+    application.bot_data["index_task"] = asyncio.create_task(
+        create_indexes(application.bot_data["db"])
+    )
+
+    stats_counter = application.bot_data.get("stats_counter")
+    if stats_counter:
+        await stats_counter.start()
+
+    team_index = application.bot_data.get("team_index")
+    if team_index:
+        await team_index.start()
+
+    analytics_refresher = application.bot_data.get("analytics_refresher")
+    if analytics_refresher:
+        await analytics_refresher.start()
+
+    conversations = application.bot_data.get("conversations")
+    if conversations:
+        await conversations.start()
+
+    change_feed = application.bot_data.get("change_feed")
+    if change_feed:
+        await change_feed.start()
+        logger.info(f"Change feed started in {change_feed.mode} mode")
+
+
+async def stop_services(application):
+    """Stop background services registered in bot_data."""
+    index_task = application.bot_data.pop("index_task", None)
+    if index_task and not index_task.done():
+        index_task.cancel()
+
+    change_feed = application.bot_data.get("change_feed")
+    if change_feed:
+        await change_feed.stop()
+
+    stats_counter = application.bot_data.get("stats_counter")
+    if stats_counter:
+        await stats_counter.stop()
+
+    team_index = application.bot_data.get("team_index")
+    if team_index:
+        await team_index.stop()
+
+    analytics_refresher = application.bot_data.get("analytics_refresher")
+    if analytics_refresher:
+        await analytics_refresher.stop()
+
+    conversations = application.bot_data.get("conversations")
+    if conversations:
+        await conversations.stop()
+
+    scheduler = application.bot_data.get("scheduler")
+    if scheduler:
+        scheduler.shutdown()
+
+    backend = application.bot_data.get("backend")
+    if backend:
+        await backend.close()
+
+
+async def setup_webhook(bot, webhook_url: str, backend=None):
+    """
+    Set up webhook for the bot, skipping the call if it is already current.
+    With several workers only the one that claims the key in the shared
+    `backend` registers it.
+    """
     webhook_endpoint = f"{webhook_url}/webhook"
+    if backend is not None:
+        claim = f"webhook:{webhook_endpoint}"
+        if not await backend.add(claim, str(os.getpid()), ttl=WEBHOOK_CLAIM_TTL):
+            logger.info("Webhook registration handled by another worker")
+            return False
+        try:
+            return await setup_webhook(bot, webhook_url)
+        except Exception:
+            # Let another worker or the next start retry
+            await backend.delete(claim)
+            raise
+
+    info = await bot.get_webhook_info()
+    if info.url == webhook_endpoint:
+        logger.info(f"Webhook already set to: {webhook_endpoint}")
+        return False
     await bot.set_webhook(url=webhook_endpoint)
     logger.info(f"Webhook set to: {webhook_endpoint}")
+    return True
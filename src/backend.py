@@ -0,0 +1,280 @@
+"""
+Shared state backends for running several worker processes.
+
+Caches, single-flight locks, rate-limit buckets and the one-time webhook
+registration go through a backend so uvicorn workers can coordinate:
+
+- "memory": in-process dicts (default, one worker)
+- "sqlite": a SQLite file, by default in /dev/shm, shared by workers on one host
+- "redis": any Redis-compatible server (needs the `redis` package)
+
+Values are strings; callers encode JSON themselves.
+"""
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+# Expired sqlite rows are purged after this many writes
+PURGE_EVERY = 1000
+
+
+def take_tokens(tokens, updated, blocked, now, rate, capacity, amount=1.0):
+    """
+    Token bucket step shared by all backends.
+    Returns `(tokens, wait)`: the new token count and the seconds to wait
+    (0 when `amount` tokens were taken).
+    """
+    if tokens is None:
+        tokens, updated = capacity, now
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if blocked > now:
+        return tokens, blocked - now
+    if tokens >= amount:
+        return tokens - amount, 0.0
+    return tokens, (amount - tokens) / rate
+
+
+class MemoryBackend:
+    """Process-local backend; state is not shared between workers."""
+
+    shared = False
+
+    def __init__(self):
+        self._values = {}  # key -> (value, expires_at or None)
+        self._buckets = {}  # key -> [tokens, updated, blocked_until]
+
+    async def get(self, key):
+        item = self._values.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and time.time() >= expires_at:
+            del self._values[key]
+            return None
+        return value
+
+    async def set(self, key, value, ttl=None):
+        self._values[key] = (value, time.time() + ttl if ttl else None)
+
+    async def add(self, key, value, ttl=None):
+        """Set `key` only if it is absent; returns True if it was set."""
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key):
+        self._values.pop(key, None)
+
+    async def take(self, key, rate, capacity, amount=1.0):
+        """Take `amount` tokens from bucket `key`; returns seconds to wait."""
+        now = time.time()
+        state = self._buckets.get(key, [None, now, 0.0])
+        tokens, wait = take_tokens(*state, now, rate, capacity, amount)
+        self._buckets[key] = [tokens, now, state[2]]
+        return wait
+
+    async def block(self, key, seconds):
+        """Empty bucket `key` and refuse tokens for `seconds`."""
+        now = time.time()
+        state = self._buckets.setdefault(key, [0.0, now, 0.0])
+        state[0] = 0.0
+        state[2] = max(state[2], now + seconds)
+
+    async def close(self):
+        pass
+
+
+class SqliteBackend:
+    """
+    Backend in a SQLite database file. Put it on tmpfs (/dev/shm) so it is
+    shared by workers on one host without disk writes. Calls run on one
+    dedicated thread so the event loop never waits on the file lock.
+    """
+
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-sqlite")
+        self._conn = None
+        self._writes = 0
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS kv "
+                         "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets "
+                         "(key TEXT PRIMARY KEY, tokens REAL, updated REAL, blocked_until REAL)")
+            self._conn = conn
+        return self._conn
+
+    def _wrote(self, conn):
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def _get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, value, ttl):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)",
+                     (key, value, time.time() + ttl if ttl else None))
+        self._wrote(conn)
+
+    def _add(self, key, value, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute("INSERT OR IGNORE INTO kv VALUES (?, ?, ?)",
+                                  (key, value, now + ttl if ttl else None))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._wrote(conn)
+        return cursor.rowcount == 1
+
+    def _delete(self, key):
+        self._connect().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def _take(self, key, rate, capacity, amount):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated, blocked_until FROM buckets WHERE key = ?",
+                               (key,)).fetchone()
+            tokens, updated, blocked = row if row else (None, now, 0.0)
+            tokens, wait = take_tokens(tokens, updated, blocked, now, rate, capacity, amount)
+            conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)",
+                         (key, tokens, now, blocked))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def _block(self, key, seconds):
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO buckets VALUES (?, 0, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+            "tokens = 0, updated = excluded.updated, "
+            "blocked_until = MAX(blocked_until, excluded.blocked_until)",
+            (key, now, now + seconds)
+        )
+
+    async def get(self, key):
+        return await self._call(self._get, key)
+
+    async def set(self, key, value, ttl=None):
+        await self._call(self._set, key, value, ttl)
+
+    async def add(self, key, value, ttl=None):
+        return await self._call(self._add, key, value, ttl)
+
+    async def delete(self, key):
+        await self._call(self._delete, key)
+
+    async def take(self, key, rate, capacity, amount=1.0):
+        return await self._call(self._take, key, rate, capacity, amount)
+
+    async def block(self, key, seconds):
+        await self._call(self._block, key, seconds)
+
+    async def close(self):
+        if self._conn is not None:
+            await self._call(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+
+# Same step as take_tokens, run atomically on the server. Returned as a
+# string because Redis truncates Lua numbers to integers.
+TAKE_SCRIPT = """
+local rate, capacity, amount, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'blocked')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+local blocked = tonumber(state[3]) or 0
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if blocked > now then
+    wait = blocked - now
+elseif tokens >= amount then
+    tokens = tokens - amount
+else
+    wait = (amount - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now), 'blocked', tostring(blocked))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Backend on a Redis-compatible server, shared across hosts."""
+
+    shared = True
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("STATE_BACKEND=redis needs the 'redis' package")
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._take_script = self._redis.register_script(TAKE_SCRIPT)
+
+    async def get(self, key):
+        return await self._redis.get(key)
+
+    async def set(self, key, value, ttl=None):
+        await self._redis.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    async def add(self, key, value, ttl=None):
+        return bool(await self._redis.set(key, value, nx=True, px=int(ttl * 1000) if ttl else None))
+
+    async def delete(self, key):
+        await self._redis.delete(key)
+
+    async def take(self, key, rate, capacity, amount=1.0):
+        wait = await self._take_script(keys=[key], args=[rate, capacity, amount, time.time()])
+        return float(wait)
+
+    async def block(self, key, seconds):
+        now = time.time()
+        blocked = float(await self._redis.hget(key, "blocked") or 0)
+        await self._redis.hset(key, mapping={
+            "tokens": 0, "updated": now, "blocked": max(blocked, now + seconds)
+        })
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def create_backend(kind, sqlite_path=None, redis_url=None):
+    """Backend for STATE_BACKEND `kind` ("memory", "sqlite" or "redis")."""
+    if kind == "sqlite":
+        return SqliteBackend(sqlite_path)
+    if kind == "redis":
+        return RedisBackend(redis_url)
+    return MemoryBackend()
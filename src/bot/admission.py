@@ -0,0 +1,68 @@
+"""Admission control for webhook updates."""
+from telegram.ext import BaseUpdateProcessor
+
+
+class UpdateAdmission:
+    """
+    Updates admitted by the webhook and not yet finished by their handlers.
+
+    PTB turns every queued update into a task right away and only limits
+    concurrency inside that task, so neither the update queue nor the task
+    count pushes back on Telegram. The webhook admits an update only while
+    fewer than `limit` are in flight; the rest are shed at the door.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.admitted = 0
+        self.shed = 0
+        self._in_flight = set()
+
+    @property
+    def in_flight(self):
+        return len(self._in_flight)
+
+    def admit(self, update_id):
+        """Reserve a slot for the update; False if it must be shed."""
+        if len(self._in_flight) >= self.limit:
+            self.shed += 1
+            return False
+        self._in_flight.add(update_id)
+        self.admitted += 1
+        return True
+
+    def release(self, update_id):
+        """Free the update's slot (no-op for updates that were not admitted)."""
+        self._in_flight.discard(update_id)
+
+
+class AdmittedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Runs up to `max_concurrent_updates` updates at once, like PTB's
+    SimpleUpdateProcessor, and releases each update's admission when its
+    handlers are done.
+    """
+
+    def __init__(self, max_concurrent_updates, admission):
+        super().__init__(max_concurrent_updates)
+        self.admission = admission
+        self.processing = 0
+
+    @property
+    def pending(self):
+        """Admitted updates still waiting for a processing slot."""
+        return max(self.admission.in_flight - self.processing, 0)
+
+    async def do_process_update(self, update, coroutine):
+        self.processing += 1
+        try:
+            await coroutine
+        finally:
+            self.processing -= 1
+            self.admission.release(getattr(update, "update_id", None))
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,195 @@
+"""Per-chat conversation state for multi-step menu flows."""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from src.db.queries import load_conversations, save_conversations
+from src.db.runner import run_query
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStore:
+    """
+    Chat id -> (state, data) with a sliding TTL.
+
+    Entries live in an OrderedDict kept in expiry order (every write moves
+    the chat to the end), so lookups are O(1) and eviction only pops from
+    the front. Nothing touches the database on the message path: with a
+    `persistence` layer, changes are written behind every `flush_interval`
+    seconds and loaded back on start. With a shared `backend` (several
+    workers) the state lives in the backend instead.
+    """
+
+    def __init__(self, ttl=300.0, max_chats=100000, persistence=None,
+                 flush_interval=5.0, backend=None):
+        self.ttl = ttl
+        self.max_chats = max_chats
+        self.persistence = persistence
+        self.flush_interval = flush_interval
+        self.backend = backend if backend is not None and backend.shared else None
+        self._entries = OrderedDict()  # chat_id -> (state, data, expires_at)
+        self._dirty = {}  # chat_id -> entry, or None for a deletion
+        self._task = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, chat_id):
+        """`(state, data)` for the chat, or `(None, None)`."""
+        if self.backend is not None:
+            value = await self.backend.get(f"conversation:{chat_id}")
+            if value is None:
+                return None, None
+            state, data = json.loads(value)
+            return state, data
+
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            return None, None
+        if entry[2] <= time.time():
+            self._delete(chat_id)
+            return None, None
+        return entry[0], entry[1]
+
+    async def set(self, chat_id, state, data=None):
+        """Enter `state` for the chat; the TTL restarts."""
+        if self.backend is not None:
+            await self.backend.set(f"conversation:{chat_id}", json.dumps([state, data]), ttl=self.ttl)
+            return
+
+        entry = (state, data, time.time() + self.ttl)
+        self._entries[chat_id] = entry
+        self._entries.move_to_end(chat_id)
+        self._mark(chat_id, entry)
+        self._evict()
+
+    async def clear(self, chat_id):
+        """Leave any state for the chat."""
+        if self.backend is not None:
+            await self.backend.delete(f"conversation:{chat_id}")
+            return
+        if chat_id in self._entries:
+            self._delete(chat_id)
+
+    def _delete(self, chat_id):
+        del self._entries[chat_id]
+        self._mark(chat_id, None)
+
+    def _mark(self, chat_id, entry):
+        if self.persistence is not None:
+            self._dirty[chat_id] = entry
+
+    def _evict(self):
+        now = time.time()
+        entries = self._entries
+        while entries:
+            chat_id, entry = next(iter(entries.items()))
+            if entry[2] > now and len(entries) <= self.max_chats:
+                break
+            entries.popitem(last=False)
+            # Expired entries need no write: persistence drops them by expiry
+            if entry[2] > now:
+                self._mark(chat_id, None)
+
+    async def start(self):
+        """Load persisted state and write changes behind, in the background."""
+        if self.persistence is None or self.backend is not None or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def _load(self):
+        try:
+            now = time.time()
+            for chat_id, state, data, expires_at in sorted(await self.persistence.load(), key=lambda e: e[3]):
+                # Chats that moved on while loading keep their newer state
+                if expires_at > now and chat_id not in self._entries and chat_id not in self._dirty:
+                    self._entries[chat_id] = (state, data, expires_at)
+            # Loaded entries are older than any set meanwhile; keep expiry order
+            self._entries = OrderedDict(sorted(self._entries.items(), key=lambda item: item[1][2]))
+            self._evict()
+            logger.info(f"Loaded {len(self._entries)} conversation states")
+        except Exception as e:
+            logger.error(f"Conversation state load failed: {e}")
+
+    async def stop(self):
+        """Stop the writer and flush what is left."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        changes, self._dirty = self._dirty, {}
+        try:
+            await self.persistence.save(changes)
+        except Exception as e:
+            logger.error(f"Conversation state flush failed: {e}")
+            # Keep newer changes made meanwhile
+            changes.update(self._dirty)
+            self._dirty = changes
+
+    async def _run(self):
+        await self._load()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+class FilePersistence:
+    """Conversation state in a local JSON file, replaced atomically on save."""
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+
+    async def load(self):
+        return await asyncio.to_thread(self._load)
+
+    async def save(self, changes):
+        for chat_id, entry in changes.items():
+            if entry is None:
+                self._entries.pop(str(chat_id), None)
+            else:
+                self._entries[str(chat_id)] = list(entry)
+        now = time.time()
+        snapshot = {key: entry for key, entry in self._entries.items() if entry[2] > now}
+        self._entries = snapshot
+        await asyncio.to_thread(self._write, snapshot)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            self._entries = json.load(f)
+        return [(int(key), *entry) for key, entry in self._entries.items()]
+
+    def _write(self, snapshot):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+
+
+class MongoPersistence:
+    """Conversation state in `<collection>_conversations` with a TTL index."""
+
+    def __init__(self, connection_string, database_name, collection_name):
+        self.db = (connection_string, database_name, collection_name)
+
+    async def load(self):
+        return await run_query(load_conversations, *self.db) or []
+
+    async def save(self, changes):
+        if not await run_query(save_conversations, *self.db, changes):
+            raise RuntimeError("could not write conversation state")
@@ -0,0 +1,187 @@
+"""Coalesced registrations export with a short-lived artifact cache."""
+import logging
+import time
+
+from telegram.error import TelegramError
+
+from src.bot.helpers import document_file, new_document_buffer, unique_filename
+from src.config import Config
+from src.db.cache import SharedSingleFlight, SingleFlight
+from src.db.export import EXPORT_FAILED, ExportOptions, export_collection
+from src.db.queries import export_mongo_collection_to_csv, stream_collection_to_csv
+from src.db.runner import run_query
+
+logger = logging.getLogger(__name__)
+
+# Distinct export variants (format/fields/dates) whose file_id is kept
+MAX_CACHED_EXPORTS = 32
+
+
+async def build_registrations_export(connection_string, database_name, collection_name, options=None):
+    """
+    Export the collection as described by `options` (plain CSV of every
+    document by default); returns a binary file object, None if nothing
+    was exported, or EXPORT_FAILED when an `options` export failed.
+    """
+    if options is not None and not options.is_default:
+        return await run_query(
+            export_collection,
+            connection_string, database_name, collection_name, options, Config.EXPORT_BATCH_SIZE
+        )
+
+    if Config.EXPORT_STREAMING:
+        return await run_query(
+            stream_collection_to_csv,
+            connection_string, database_name, collection_name, Config.EXPORT_BATCH_SIZE
+        )
+
+    buffer = new_document_buffer()
+    result = await run_query(
+        export_mongo_collection_to_csv,
+        connection_string, database_name, collection_name, buffer
+    )
+    if result is None:
+        buffer.close()
+        return None
+    buffer.seek(0)
+    return buffer
+
+
+class ExportCoordinator:
+    """
+    Single-flight export of one artifact shared by concurrent requests.
+
+    The first request for a collection version and set of ExportOptions
+    runs the export and uploads
+    the file to its own chat; requests that arrive meanwhile wait for that
+    upload and re-send the resulting Telegram `file_id`. The `file_id` is
+    cached for `ttl` seconds while the collection version is unchanged, so
+    repeat downloads are not exported or uploaded again. With a shared
+    `backend` the export and its `file_id` are shared between workers too.
+    """
+
+    def __init__(self, exporter, versioner, ttl=60.0, pool=None,
+                 filename="registrations.csv", caption="Registrations file ready.",
+                 backend=None):
+        self.exporter = exporter
+        self.versioner = versioner
+        self.ttl = ttl
+        self.pool = pool
+        self.filename = filename
+        self.caption = caption
+        self.hits = 0
+        self.misses = 0
+        self._cached = {}  # options key -> (version, file_id, expires_at)
+        self._flight = SingleFlight()
+        self._shared = None
+        if backend is not None and backend.shared:
+            self._shared = SharedSingleFlight(backend, ttl, lock_ttl=300.0, poll_interval=0.2)
+
+    async def send(self, bot, chat_id, options=None):
+        """Deliver the export to `chat_id`; returns False if it failed."""
+        options = options or ExportOptions()
+        version = await self.versioner()
+
+        file_id = self._cached_file_id(version, options)
+        if file_id is not None:
+            try:
+                await bot.send_document(chat_id=chat_id, document=file_id, caption=self.caption)
+                self.hits += 1
+                return True
+            except TelegramError as e:
+                logger.warning(f"Cached export file_id rejected ({e}), exporting again")
+                self._cached.pop(options.key(), None)
+                if self._shared is not None:
+                    await self._shared.forget(self._shared_key(version, options))
+
+        self.misses += 1
+        try:
+            produce = lambda: self._produce(bot, chat_id, version, options)
+            if self._shared is not None and version is not None:
+                result = await self._shared.do(self._shared_key(version, options), produce)
+            else:
+                result = await self._flight.do((version, options.key()), produce)
+            if result is None:
+                return False
+
+            file_id, sent_to = result
+            if sent_to != chat_id:
+                await bot.send_document(chat_id=chat_id, document=file_id, caption=self.caption)
+            return True
+
+        except TelegramError as e:
+            logger.error(f"Export delivery error: {e}")
+            return False
+
+    async def send_once(self, bot, chat_id, options, caption=None):
+        """
+        Export and upload without sharing or caching (per-chat exports such
+        as `/registrations new`). Returns True once delivered, None if
+        nothing matched and False if the export or the upload failed.
+        """
+        self.misses += 1
+        if self.pool is not None:
+            buffer = await self.pool.run(self.exporter, options)
+        else:
+            buffer = await self.exporter(options)
+        if buffer is EXPORT_FAILED:
+            return False
+        if buffer is None:
+            return None
+
+        try:
+            await bot.send_document(
+                chat_id=chat_id,
+                document=document_file(buffer, unique_filename(self.filename_for(options))),
+                caption=caption or self.caption
+            )
+            return True
+        except TelegramError as e:
+            logger.error(f"Export delivery error: {e}")
+            return False
+        finally:
+            buffer.close()
+
+    def invalidate(self):
+        """Forget cached file_ids of this worker (e.g. after a bulk import)."""
+        self._cached.clear()
+
+    def filename_for(self, options):
+        stem = self.filename.split(".", 1)[0]
+        return f"{stem}.{options.extension}"
+
+    def _shared_key(self, version, options):
+        return f"export:{self.filename}:{options.key()}:{version!r}"
+
+    def _cached_file_id(self, version, options):
+        cached = self._cached.get(options.key())
+        if cached is None or version is None:
+            return None
+        cached_version, file_id, expires_at = cached
+        if cached_version != version or time.monotonic() >= expires_at:
+            return None
+        return file_id
+
+    async def _produce(self, bot, chat_id, version, options):
+        if self.pool is not None:
+            buffer = await self.pool.run(self.exporter, options)
+        else:
+            buffer = await self.exporter(options)
+        if buffer is None or buffer is EXPORT_FAILED:
+            return None
+
+        try:
+            message = await bot.send_document(
+                chat_id=chat_id,
+                document=document_file(buffer, unique_filename(self.filename_for(options))),
+                caption=self.caption
+            )
+        finally:
+            buffer.close()
+
+        file_id = message.document.file_id
+        if version is not None and self.ttl > 0:
+            if len(self._cached) >= MAX_CACHED_EXPORTS:
+                self._cached.pop(next(iter(self._cached)))
+            self._cached[options.key()] = (version, file_id, time.monotonic() + self.ttl)
+        return file_id, chat_id
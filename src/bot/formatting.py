@@ -0,0 +1,119 @@
+"""Message building, escaping and Telegram-aware chunking."""
+import asyncio
+import html
+import re
+
+from telegram.constants import ParseMode
+
+# Hard Telegram limit for message text
+MESSAGE_LIMIT = 4096
+
+_MARKDOWN_SPECIAL = re.compile(r"([_*`\[])")
+_MARKDOWN_V2_SPECIAL = re.compile(r"([_*\[\]()~`>#+\-=|{}.!\\])")
+_MARKDOWN_V2_CODE_SPECIAL = re.compile(r"([`\\])")
+
+
+def escape(text, parse_mode=None):
+    """Escape plain text for the given parse mode (None means plain text)."""
+    text = str(text)
+    if parse_mode == ParseMode.HTML:
+        return html.escape(text, quote=False)
+    if parse_mode == ParseMode.MARKDOWN_V2:
+        return _MARKDOWN_V2_SPECIAL.sub(r"\\\1", text)
+    if parse_mode == ParseMode.MARKDOWN:
+        return _MARKDOWN_SPECIAL.sub(r"\\\1", text)
+    return text
+
+
+def bold(text, parse_mode=None):
+    """Bold entity for `text`; plain text if the mode cannot nest it safely."""
+    if parse_mode == ParseMode.HTML:
+        return f"<b>{escape(text, parse_mode)}</b>"
+    if parse_mode == ParseMode.MARKDOWN_V2:
+        return f"*{escape(text, parse_mode)}*"
+    # Legacy Markdown has no escaping inside entities
+    return escape(text, parse_mode)
+
+
+def code(text, parse_mode=None):
+    """Inline code entity for `text`."""
+    if parse_mode == ParseMode.HTML:
+        return f"<code>{escape(text, parse_mode)}</code>"
+    if parse_mode == ParseMode.MARKDOWN_V2:
+        escaped = _MARKDOWN_V2_CODE_SPECIAL.sub(r"\\\1", str(text))
+        return f"`{escaped}`"
+    return escape(text, parse_mode)
+
+
+def preformatted(parse_mode=None):
+    """Opening and closing markup of a preformatted block."""
+    if parse_mode == ParseMode.HTML:
+        return "<pre>", "</pre>"
+    if parse_mode in (ParseMode.MARKDOWN, ParseMode.MARKDOWN_V2):
+        return "```\n", "```"
+    return "", ""
+
+
+def utf16_len(text):
+    """Length as Telegram counts it, in UTF-16 code units."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _split_line(line, budget, escape_line):
+    """
+    Split a raw line into escaped pieces of at most `budget` units. The
+    escapers work character by character, so splitting the raw text never
+    cuts an escape sequence or entity in half.
+    """
+    pieces = []
+    start = size = 0
+    for index, char in enumerate(line):
+        width = utf16_len(escape_line(char))
+        if size + width > budget and index > start:
+            pieces.append(escape_line(line[start:index]))
+            start, size = index, 0
+        size += width
+    pieces.append(escape_line(line[start:]))
+    return pieces
+
+
+def chunk_lines(lines, limit=MESSAGE_LIMIT, opening="", closing="", escape_line=None):
+    """
+    Pack raw lines, escaped with `escape_line`, into messages of at most
+    `limit` UTF-16 units, each wrapped in `opening`/`closing`. Lines are
+    never split unless a single line is longer than a whole message; such
+    a line is split before escaping.
+    """
+    escape_line = escape_line or (lambda line: line)
+    budget = limit - utf16_len(opening) - utf16_len(closing)
+    if budget <= 0:
+        raise ValueError("limit is too small for the wrapper markup")
+
+    chunks = []
+    current = []
+    size = 0
+    for line in lines:
+        escaped = escape_line(line)
+        pieces = [escaped] if utf16_len(escaped) <= budget else _split_line(line, budget, escape_line)
+        for piece in pieces:
+            length = utf16_len(piece)
+            if current and size + length > budget:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(piece)
+            size += length
+    if current:
+        chunks.append(current)
+
+    return [f"{opening}{''.join(chunk)}{closing}" for chunk in chunks]
+
+
+async def send_chunks(bot, chat_id, chunks, parse_mode=None, interval=0.0):
+    """
+    Send messages in order, waiting `interval` seconds between them.
+    Flood control retries are left to the bot's rate limiter.
+    """
+    for index, chunk in enumerate(chunks):
+        if index and interval:
+            await asyncio.sleep(interval)
+        await bot.send_message(chat_id=chat_id, text=chunk, parse_mode=parse_mode)
@@ -1,168 +1,581 @@
 """Bot command handlers."""
-import os
 import asyncio
 import logging
+from datetime import datetime, timezone
+from bson import json_util
 from telegram import Update
+from telegram.constants import ParseMode
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 
 logger = logging.getLogger(__name__)
 
+# Transactions messages per chat whose page bounds are kept for navigation
+# (without a shared backend)
+MAX_TRACKED_PAGES = 10
+
+# Reply keyboard buttons (see get_main_keyboard)
+MENU_BUTTONS = frozenset({"View Stats", "View Transactions", "Download Registrations", "Find a Team"})
+
+# Conversation state: the next plain-text message is a team name query
+FIND_STATE = "find"
+
+# Import errors listed in the summary message; the full list is sent as a file
+IMPORT_ERRORS_SHOWN = 10
+IMPORT_USAGE = (
+    "Send a .csv, .json or .jsonl file with the caption /import to upsert "
+    "registrations by team name. Add 'ordered' to stop at the first write error.\n"
+    "Fields: teamName, member1Name..member4Name, transactionId"
+)
+
+from src.config import Config
 from src.db.queries import (
-    export_mongo_collection_to_csv,
     get_stats,
     find_team_by_name,
-    get_teams_with_transaction_numbers
+    find_team_by_id,
+    get_teams_with_transaction_numbers,
+    get_transactions_page,
+    get_collection_watermark,
+    get_export_watermark,
+    set_export_watermark
 )
+from src.db.export import parse_export_args
+from src.db.importer import import_registrations
+from src.db.runner import run_query
+from src.bot.scheduler import command_class
+from src.logs import SAMPLED
+from src.metrics import stage
 from src.bot.helpers import (
     get_main_keyboard,
+    get_team_choices_keyboard,
+    decode_team_id,
     format_team_details,
     format_stats_message,
+    format_stats_check_message,
+    format_analytics_message,
     send_large_text_or_file,
-    format_transactions_list
+    format_transactions_list,
+    format_transaction_chunk,
+    get_transactions_page_keyboard,
+    new_document_buffer
 )
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command."""
-    user = update.effective_user
-    username = user.username or user.first_name or "Unknown"
-    logger.info(f"User @{username} (ID: {user.id}) executed /start")
-    
     await update.message.reply_text(
         "Welcome to the Brewathon Bot! 🦥\nUse the menu below to interact.",
         reply_markup=get_main_keyboard()
     )
 
 
+@command_class("lookup")
 async def send_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, 
                      connection_string: str, database_name: str, collection_name: str):
     """Handle /stats command and View Stats button."""
     chat_id = update.effective_chat.id
-    user = update.effective_user
-    username = user.username or user.first_name or "Unknown"
-    logger.info(f"User @{username} (ID: {user.id}) requested stats")
-
-    loop = asyncio.get_running_loop()
-    stats = await loop.run_in_executor(
-        None, get_stats,
-        connection_string, database_name, collection_name
-    )
+    stats = None
+    stats_counter = context.bot_data.get("stats_counter")
+    if stats_counter is not None:
+        stats = stats_counter.snapshot()
+
+    if stats is None:
+        stats_cache = context.bot_data.get("stats_cache")
+        if stats_cache is not None:
+            stats = await stats_cache.get()
+        else:
+            stats = await run_query(get_stats, connection_string, database_name, collection_name)
 
-    msg = format_stats_message(stats)
+    with stage("format"):
+        msg = format_stats_message(stats)
     await context.bot.send_message(chat_id=chat_id, text=msg)
 
 
+@command_class("export")
+async def check_stats(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                      connection_string: str, database_name: str, collection_name: str):
+    """Handle /statscheck command: compare incremental stats with a full aggregation."""
+    stats_counter = context.bot_data.get("stats_counter")
+    if stats_counter is None or stats_counter.snapshot() is None:
+        await update.message.reply_text("Incremental stats are not enabled.")
+        return
+
+    incremental = stats_counter.snapshot()
+    full = await run_query(get_stats, connection_string, database_name, collection_name)
+    if full is None:
+        await update.message.reply_text("Unable to fetch statistics.")
+        return
+
+    await update.message.reply_text(format_stats_check_message(incremental, full))
+
+    if incremental != full:
+        await stats_counter.reconcile()
+
+
+async def send_analytics(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                         connection_string: str, database_name: str, collection_name: str):
+    """Handle /analytics: team sizes, missing/duplicate transactions, registrations per day."""
+    # Reading the materialized summary is a point lookup; computing it live
+    # scans the collection, so it is deferred like the exports
+    if Config.ANALYTICS_MATERIALIZE:
+        return await _send_stored_analytics(update, context)
+    return await _send_live_analytics(update, context)
+
+
+async def _reply_analytics(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    analytics = await context.bot_data["analytics_cache"].get()
+    if analytics is None and Config.ANALYTICS_MATERIALIZE:
+        await context.bot.send_message(
+            chat_id=chat_id, text="Analytics are not ready yet, please try again in a few minutes."
+        )
+        return
+
+    with stage("format"):
+        text = format_analytics_message(analytics)
+    await send_large_text_or_file(context, chat_id, text, "analytics.txt")
+
+
+_send_stored_analytics = command_class("lookup")(_reply_analytics)
+_send_live_analytics = command_class("export")(_reply_analytics)
+
+
+@command_class("export")
 async def send_csv(update: Update, context: ContextTypes.DEFAULT_TYPE,
                    connection_string: str, database_name: str, collection_name: str):
     """Handle /registrations command and Download Registrations button."""
     chat_id = update.effective_chat.id
-    user = update.effective_user
-    username = user.username or user.first_name or "Unknown"
-    logger.info(f"User @{username} (ID: {user.id}) requested CSV download")
+    args = context.args or []
+    # `new` may appear anywhere, e.g. `/registrations csv new`
+    rest = [arg for arg in args if arg.lower() != "new"]
+    if len(rest) < len(args):
+        await send_new_registrations(update, context, connection_string, database_name,
+                                     collection_name, rest)
+        return
 
-    status_msg = await context.bot.send_message(chat_id=chat_id, text="Generating CSV...")
+    try:
+        options = parse_export_args(args, Config.EXPORT_DEFAULT_FORMAT)
+    except ValueError as e:
+        await context.bot.send_message(chat_id=chat_id, text=str(e))
+        return
+    label = options.extension.upper()
+    logger.info("Registrations export requested", extra={"export": options.key(), **SAMPLED})
 
-    output_file = "registrations.csv"
+    status_msg = await context.bot.send_message(chat_id=chat_id, text=f"Generating {label}...")
 
-    loop = asyncio.get_running_loop()
-    file_path = await loop.run_in_executor(
-        None, export_mongo_collection_to_csv,
-        connection_string, database_name, collection_name, output_file
-    )
+    # Concurrent requests share one export; the export itself runs in the
+    # "export" scheduler pool
+    coordinator = context.bot_data["export_coordinator"]
+    if await coordinator.send(context.bot, chat_id, options):
+        await context.bot.delete_message(chat_id, status_msg.message_id)
+    else:
+        await context.bot.send_message(chat_id=chat_id, text=f"Error creating {label}.")
 
+
+async def send_new_registrations(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                 connection_string: str, database_name: str,
+                                 collection_name: str, args):
+    """
+    `/registrations new`: export only registrations added since this chat's
+    previous `/registrations new`, as an indexed `_id` range.
+    """
+    chat_id = update.effective_chat.id
     try:
-        if file_path and os.path.exists(file_path):
-            await context.bot.send_document(
-                chat_id=chat_id,
-                document=open(file_path, "rb"),
-                filename="registrations.csv",
-                caption="Registrations file ready."
-            )
-            await context.bot.delete_message(chat_id, status_msg.message_id)
-        else:
-            await context.bot.send_message(chat_id=chat_id, text="Error creating CSV.")
+        options = parse_export_args(args, Config.EXPORT_DEFAULT_FORMAT)
+    except ValueError as e:
+        await context.bot.send_message(chat_id=chat_id, text=str(e))
+        return
+    logger.info("New registrations export requested", extra={"export": options.key(), **SAMPLED})
+
+    previous = await run_query(get_export_watermark, connection_string, database_name,
+                               collection_name, chat_id) or {}
+    last_id = previous.get("lastId")
+    exported_at = datetime.now(timezone.utc)
+    watermark = await run_query(get_collection_watermark, connection_string, database_name,
+                                collection_name)
+    if watermark is None:
+        await context.bot.send_message(chat_id=chat_id, text="Error creating export.")
+        return
 
-    finally:
-        if file_path and os.path.exists(file_path):
-            os.remove(file_path)
+    # Bound the range by the newest _id now, so documents inserted during
+    # the export are left for the next one instead of being skipped
+    upto_id = watermark[1]
+    nothing_new = upto_id is None or (last_id is not None and upto_id <= last_id)
+    if nothing_new and not Config.EXPORT_UPDATED_FIELD:
+        await context.bot.send_message(chat_id=chat_id, text="No new registrations since your last download.")
+        return
 
+    options.after_id = last_id
+    options.upto_id = upto_id
+    if Config.EXPORT_UPDATED_FIELD:
+        options.updated_field = Config.EXPORT_UPDATED_FIELD
+        options.updated_after = previous.get("exportedAt")
 
+    if last_id is None:
+        caption = "All registrations (first /registrations new for this chat)."
+    else:
+        kind = "New and updated" if Config.EXPORT_UPDATED_FIELD else "New"
+        caption = f"{kind} registrations since {last_id.generation_time:%Y-%m-%d %H:%M} UTC."
+
+    coordinator = context.bot_data["export_coordinator"]
+    sent = await coordinator.send_once(context.bot, chat_id, options, caption)
+    # Advance the watermark only after a delivery or a confirmed empty range
+    if sent is None:
+        await context.bot.send_message(chat_id=chat_id, text="No new registrations since your last download.")
+    elif not sent:
+        await context.bot.send_message(chat_id=chat_id, text="Error creating export.")
+        return
+
+    if upto_id is not None:
+        await run_query(set_export_watermark, connection_string, database_name, collection_name,
+                        chat_id, upto_id, exported_at)
+
+
+@command_class("lookup")
 async def find_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
                        connection_string: str, database_name: str, collection_name: str):
     """Handle /find command to search for a team."""
-    user = update.effective_user
-    username = user.username or user.first_name or "Unknown"
-    
     if not context.args:
-        logger.info(f"User @{username} (ID: {user.id}) used /find without team name")
-        await update.message.reply_text("Usage: /find team_name")
+        await ask_team_name(update, context)
         return
 
-    team_name = " ".join(context.args)
-    logger.info(f"User @{username} (ID: {user.id}) searched for team: '{team_name}'")
+    await find_team(update, context, connection_string, database_name, collection_name,
+                    " ".join(context.args))
 
-    loop = asyncio.get_running_loop()
-    team = await loop.run_in_executor(
-        None, find_team_by_name,
-        connection_string, database_name, collection_name, team_name
-    )
 
-    if team:
-        msg = format_team_details(team)
-    else:
-        msg = f"No team found with name: {team_name}"
+async def ask_team_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Take the chat's next plain-text message as a /find query."""
+    await context.bot_data["conversations"].set(update.effective_chat.id, FIND_STATE)
+    await update.message.reply_text("Send the team name to search for (or /find team_name).")
+
+
+@command_class("lookup")
+async def find_team(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                    connection_string: str, database_name: str, collection_name: str, team_name):
+    """Reply with the team called `team_name`, or suggestions."""
+    logger.info("Team search", extra={"team_name": team_name, **SAMPLED})
+
+    team = None
+    matches = []
+    team_index = context.bot_data.get("team_index")
+    if team_index is not None and team_index.ready:
+        matches = team_index.search(team_name, limit=Config.FIND_SUGGESTIONS)
+        if matches and matches[0][2]:
+            team = await run_query(
+                find_team_by_id,
+                connection_string, database_name, collection_name, matches[0][0]
+            )
+
+    if team is None:
+        # The index can lag behind new registrations until its next refresh
+        team = await run_query(
+            find_team_by_name,
+            connection_string, database_name, collection_name, team_name
+        )
+
+    if team is None and matches:
+        await update.message.reply_text(
+            f"No exact match for: {team_name}\nDid you mean:",
+            reply_markup=get_team_choices_keyboard(matches)
+        )
+        return
+
+    with stage("format"):
+        if team:
+            msg = format_team_details(team)
+        else:
+            msg = f"No team found with name: {team_name}"
 
     await update.message.reply_text(msg)
 
 
+@command_class("lookup")
+async def find_choice(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                      connection_string: str, database_name: str, collection_name: str):
+    """Handle a team picked from /find suggestions."""
+    query = update.callback_query
+    await query.answer()
+
+    team_id = decode_team_id(query.data.split(":", 1)[1])
+    logger.info("Team suggestion picked", extra={"team_id": str(team_id), **SAMPLED})
+
+    team = await run_query(
+        find_team_by_id,
+        connection_string, database_name, collection_name, team_id
+    )
+
+    with stage("format"):
+        if team:
+            msg = format_team_details(team)
+        else:
+            msg = "That team no longer exists."
+
+    await query.edit_message_text(msg)
+
+
+@command_class("lookup")
 async def send_transactions(update: Update, context: ContextTypes.DEFAULT_TYPE,
                             connection_string: str, database_name: str, collection_name: str):
-    """Handle /transactions command and View Transactions button."""
+    """Handle /transactions command and View Transactions button (first page)."""
+    page = await run_query(
+        get_transactions_page,
+        connection_string, database_name, collection_name,
+        None, None, Config.TRANSACTIONS_PAGE_SIZE
+    )
+
+    if not page or not page["items"]:
+        await update.message.reply_text("No transactions found.")
+        return
+
+    with stage("format"):
+        text = format_transaction_chunk(page["items"], 0, len(page["items"])) + "\nPage 1"
+    message = await update.message.reply_text(
+        text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=get_transactions_page_keyboard(page["has_prev"], page["has_next"])
+    )
+    await _remember_transactions_page(context, message.chat_id, message.message_id, 1, page["items"])
+
+
+@command_class("lookup")
+async def transactions_page(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                            connection_string: str, database_name: str, collection_name: str):
+    """Handle next/prev/full-list buttons under a transactions page."""
+    query = update.callback_query
+    action = query.data.split(":", 1)[1]
+
+    if action == "all":
+        await query.answer()
+        # Hands off to the export pool and returns its task, freeing this
+        # lookup slot
+        return await send_all_transactions(update, context, connection_string, database_name,
+                                           collection_name)
+
+    message = query.message
+    state = await _recall_transactions_page(context, message.chat_id, message.message_id)
+    if state is None:
+        await query.answer("This list has expired, please open it again.")
+        return
+    await query.answer()
+
+    after = state["last"] if action == "next" else None
+    before = state["first"] if action == "prev" else None
+    page = await run_query(
+        get_transactions_page,
+        connection_string, database_name, collection_name,
+        after, before, Config.TRANSACTIONS_PAGE_SIZE
+    )
+
+    if not page or not page["items"]:
+        await query.edit_message_text("No more transactions.")
+        return
+
+    number = state["page"] + (1 if action == "next" else -1)
+    with stage("format"):
+        text = format_transaction_chunk(page["items"], 0, len(page["items"])) + f"\nPage {number}"
+    await query.edit_message_text(
+        text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=get_transactions_page_keyboard(page["has_prev"], page["has_next"])
+    )
+    await _remember_transactions_page(context, message.chat_id, message.message_id, number, page["items"])
+
+
+def _shared_backend(context):
+    backend = context.bot_data.get("backend")
+    return backend if backend is not None and backend.shared else None
+
+
+async def _remember_transactions_page(context, chat_id, message_id, number, items):
+    """
+    Keep keyset bounds of the page shown in a message. With a shared
+    backend they live there (any worker may get the next button press),
+    otherwise in chat_data for the last few messages.
+    """
+    state = {
+        "page": number,
+        "first": (items[0]["teamName"], items[0]["_id"]),
+        "last": (items[-1]["teamName"], items[-1]["_id"])
+    }
+    backend = _shared_backend(context)
+    if backend is not None:
+        await backend.set(
+            f"transactions:{chat_id}:{message_id}", json_util.dumps(state),
+            ttl=Config.TRANSACTIONS_PAGE_TTL
+        )
+        return
+
+    pages = context.chat_data.setdefault("transaction_pages", {})
+    pages.pop(message_id, None)
+    pages[message_id] = state
+    while len(pages) > MAX_TRACKED_PAGES:
+        pages.pop(next(iter(pages)))
+
+
+async def _recall_transactions_page(context, chat_id, message_id):
+    """Page state stored by `_remember_transactions_page`, or None."""
+    backend = _shared_backend(context)
+    if backend is not None:
+        value = await backend.get(f"transactions:{chat_id}:{message_id}")
+        return json_util.loads(value) if value is not None else None
+    return context.chat_data.get("transaction_pages", {}).get(message_id)
+
+
+@command_class("export")
+async def send_all_transactions(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                connection_string: str, database_name: str, collection_name: str):
+    """Send the complete transactions list as text or file."""
     chat_id = update.effective_chat.id
-    user = update.effective_user
-    username = user.username or user.first_name or "Unknown"
-    logger.info(f"User @{username} (ID: {user.id}) requested transactions list")
-    
-    loop = asyncio.get_running_loop()
-    data = await loop.run_in_executor(
-        None, get_teams_with_transaction_numbers,
+
+    data = await run_query(
+        get_teams_with_transaction_numbers,
         connection_string, database_name, collection_name
     )
-    
+
     if not data:
-        await update.message.reply_text("No transactions found.")
+        await context.bot.send_message(chat_id=chat_id, text="No transactions found.")
         return
 
-    formatted_text = format_transactions_list(data)
+    with stage("format"):
+        formatted_text = format_transactions_list(data)
     await send_large_text_or_file(context, chat_id, formatted_text, "transactions_list.txt")
 
 
+@command_class("export")
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                         connection_string: str, database_name: str, collection_name: str):
+    """Handle /import and documents sent with an /import caption (admins only)."""
+    message = update.message
+    user = update.effective_user
+    if user.id not in Config.ADMIN_IDS:
+        logger.warning("Import refused without admin rights", extra={"user_id": user.id})
+        await message.reply_text("Only admins can import registrations.")
+        return
+
+    document = message.document
+    if document is None:
+        await message.reply_text(IMPORT_USAGE)
+        return
+
+    name = (document.file_name or "").lower()
+    if name.endswith(".csv"):
+        fmt = "csv"
+    elif name.endswith((".json", ".jsonl", ".ndjson")):
+        fmt = "json"
+    else:
+        await message.reply_text("Unsupported file type. " + IMPORT_USAGE)
+        return
+    ordered = "ordered" in (message.caption or "").lower().split()
+    logger.info("Import started", extra={"user_id": user.id, "file_name": name, "ordered": ordered})
+
+    status_msg = await message.reply_text("Downloading file...")
+    loop = asyncio.get_running_loop()
+    finished = False
+
+    async def show(text):
+        if finished:
+            return
+        try:
+            await context.bot.edit_message_text(text, chat_id=message.chat_id, message_id=status_msg.message_id)
+        except TelegramError:
+            pass
+
+    def progress(result):
+        # Called from the import thread
+        text = f"Importing... {result.rows} rows read, {result.valid} valid, {len(result.errors)} errors"
+        asyncio.run_coroutine_threadsafe(show(text), loop)
+
+    buffer = new_document_buffer()
+    try:
+        telegram_file = await document.get_file()
+        await telegram_file.download_to_memory(buffer)
+        buffer.seek(0)
+        await show("Importing...")
+        result = await run_query(
+            import_registrations, connection_string, database_name, collection_name, buffer, fmt,
+            ordered, Config.IMPORT_BATCH_SIZE, progress, Config.IMPORT_PROGRESS_INTERVAL
+        )
+    except Exception as e:
+        logger.error(f"Import error: {e}")
+        result = None
+    finally:
+        buffer.close()
+        finished = True
+
+    if result is None:
+        await context.bot.edit_message_text("Import failed.", chat_id=message.chat_id,
+                                            message_id=status_msg.message_id)
+        return
+
+    # Cached stats, export file_ids and the name index no longer match
+    await invalidate_after_import(context.bot_data)
+
+    errors = [f"Row {number}: {error}" for number, error in result.errors]
+    summary = "Import finished.\n" + result.summary()
+    if errors:
+        summary += "\n\n" + "\n".join(errors[:IMPORT_ERRORS_SHOWN])
+    await context.bot.edit_message_text(summary, chat_id=message.chat_id, message_id=status_msg.message_id)
+    if len(errors) > IMPORT_ERRORS_SHOWN:
+        await send_large_text_or_file(context, message.chat_id, "\n".join(errors),
+                                      "import_errors.txt", mode="file")
+
+
+async def invalidate_after_import(bot_data):
+    """
+    Drop caches that a bulk write made stale (a change feed would do it
+    later). Without a feed the name index is rebuilt before returning.
+    """
+    for key in ("stats_cache", "analytics_cache"):
+        cache = bot_data.get(key)
+        if cache is not None:
+            cache.invalidate()
+    coordinator = bot_data.get("export_coordinator")
+    if coordinator is not None:
+        coordinator.invalidate()
+    team_index = bot_data.get("team_index")
+    if team_index is not None and bot_data.get("change_feed") is None:
+        await team_index.rebuild()
+
+
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE,
                       connection_string: str, database_name: str, collection_name: str):
     """Handle text messages (menu button clicks)."""
     text = update.message.text.strip()
-    user = update.effective_user
-    username = user.username or user.first_name or "Unknown"
-    logger.info(f"User @{username} (ID: {user.id}) sent message: '{text}'")
+    # Only menu buttons are logged by name; free text may be personal data
+    button = text if text in MENU_BUTTONS else None
+    logger.info("Text message", extra={"button": button, "length": len(text), **SAMPLED})
+
+    # Menu buttons and greetings leave any pending conversation step
+    conversations = context.bot_data["conversations"]
+    chat_id = update.effective_chat.id
 
     if text.lower() == "hi":
+        await conversations.clear(chat_id)
         await update.message.reply_text(
             "Hello! Please use the menu buttons to interact.",
             reply_markup=get_main_keyboard()
         )
 
     elif text == "View Stats":
+        await conversations.clear(chat_id)
         await send_stats(update, context, connection_string, database_name, collection_name)
 
     elif text == "Download Registrations":
-        await send_csv(update, context, connection_string, database_name, collection_name)
+        await conversations.clear(chat_id)
+        # Runs in the export pool; returning its task lets the wrappers time it
+        return await send_csv(update, context, connection_string, database_name, collection_name)
 
     elif text == "Find a Team":
-        await update.message.reply_text("To search for a team, type:\n/find team_name")
+        await ask_team_name(update, context)
 
     elif text == "View Transactions":
+        await conversations.clear(chat_id)
         await send_transactions(update, context, connection_string, database_name, collection_name)
 
+    elif (await conversations.get(chat_id))[0] == FIND_STATE:
+        await conversations.clear(chat_id)
+        await find_team(update, context, connection_string, database_name, collection_name, text)
+
     else:
         await update.message.reply_text(
             "I did not understand that. Please use the menu buttons.",
@@ -1,9 +1,20 @@
 """Helper functions for bot operations."""
-import os
-import asyncio
-from telegram import ReplyKeyboardMarkup, KeyboardButton
+import tempfile
+import uuid
+from datetime import datetime
+from bson import ObjectId
+from telegram import (
+    ReplyKeyboardMarkup, KeyboardButton,
+    InlineKeyboardMarkup, InlineKeyboardButton, InputFile
+)
 from telegram.constants import ParseMode
 
+from src.bot.formatting import bold, code, escape, preformatted, chunk_lines, send_chunks
+from src.config import Config
+
+# Outgoing documents stay in memory up to this size, then spill to a temp file
+DOCUMENT_SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
 
 def get_main_keyboard():
     """Main keyboard layout for bot menu."""
@@ -14,27 +25,57 @@ def get_main_keyboard():
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, is_persistent=True)
 
 
-def format_transaction_chunk(transactions, start_index, chunk_size=20):
-    """Format a chunk of transactions for display."""
+def encode_team_id(team_id):
+    """Encode a document `_id` for callback data."""
+    return str(team_id)
+
+
+def decode_team_id(value):
+    """Inverse of `encode_team_id` for ObjectId and string ids."""
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+
+def get_team_choices_keyboard(matches):
+    """Inline keyboard with one button per `(_id, teamName, exact)` match."""
+    keyboard = [
+        [InlineKeyboardButton(name, callback_data=f"find:{encode_team_id(team_id)}")]
+        for team_id, name, _ in matches
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
+def get_transactions_page_keyboard(has_prev, has_next):
+    """Inline navigation keyboard for a transactions page."""
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton("« Prev", callback_data="tx:prev"))
+    if has_next:
+        navigation.append(InlineKeyboardButton("Next »", callback_data="tx:next"))
+
+    keyboard = [navigation] if navigation else []
+    keyboard.append([InlineKeyboardButton("Download full list", callback_data="tx:all")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def format_transaction_chunk(transactions, start_index, chunk_size=20, parse_mode=ParseMode.HTML):
+    """Format a chunk of transactions for display in `parse_mode`."""
     chunk = transactions[start_index : start_index + chunk_size]
-    msg = "Team Transactions:\n\n"
-    for t in chunk:
-        name = t.get("teamName", "N/A")
-        tid = t.get("transactionId", "N/A")
-        msg += f"• *{name}*: `{tid}`\n"
-    return msg
+    lines = ["Team Transactions:\n\n"]
+    lines.extend(
+        f"• {bold(t.get('teamName', 'N/A'), parse_mode)}: {code(t.get('transactionId', 'N/A'), parse_mode)}\n"
+        for t in chunk
+    )
+    return "".join(lines)
 
 
 def format_team_details(team):
     """Format team details for display."""
     if not team:
         return "No team data available."
-    
-    msg = f"Team Found: {team.get('teamName', 'Unknown')}\n\n"
-    for key, value in team.items():
-        if key != "_id":
-            msg += f"{key}: {value}\n"
-    return msg
+
+    lines = [f"Team Found: {team.get('teamName', 'Unknown')}\n\n"]
+    lines.extend(f"{key}: {value}\n" for key, value in team.items() if key != "_id")
+    return "".join(lines)
 
 
 def format_stats_message(stats):
@@ -50,34 +91,108 @@ def format_stats_message(stats):
     return msg
 
 
-async def send_large_text_or_file(context, chat_id, text, filename="output.txt"):
-    """Send text as message or file if too large."""
-    # Telegram message limit is 4096 chars
-    if len(text) > 4000:
-        # Save to file
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(text)
-            
+def format_stats_check_message(incremental, full):
+    """Format incremental vs full stats comparison for display."""
+    status = "OK" if incremental == full else "DRIFT (resyncing)"
+    return (
+        f"Stats Check: {status}\n\n"
+        f"Incremental: {incremental.get('total_teams', 0)} teams, "
+        f"{incremental.get('total_members', 0)} members\n"
+        f"Full aggregation: {full.get('total_teams', 0)} teams, "
+        f"{full.get('total_members', 0)} members"
+    )
+
+
+def format_analytics_message(analytics):
+    """Format the analytics breakdowns as plain text."""
+    if not analytics:
+        return "Unable to fetch analytics."
+
+    lines = [
+        "Registration Analytics",
+        "",
+        f"Teams: {analytics.get('totalTeams', 0)}, members: {analytics.get('totalMembers', 0)}",
+        "",
+        "Team sizes:",
+    ]
+    for bucket in analytics.get("teamSizes", []):
+        size = bucket["_id"]
+        lines.append(f"  {size} member{'' if size == 1 else 's'}: {bucket['teams']}")
+
+    lines += ["", f"Teams without transaction ID: {analytics.get('missingTransaction', 0)}"]
+
+    duplicates = analytics.get("duplicateTransactions", [])
+    lines.append(f"Duplicate transaction IDs: {analytics.get('duplicateTransactionCount', 0)}")
+    for duplicate in duplicates:
+        lines.append(f"  {duplicate['_id']}: {duplicate['teams']} teams")
+
+    lines += ["", "Registrations per day:"]
+    for day in analytics.get("perDay", []):
+        lines.append(f"  {day['_id']}: {day['teams']}")
+
+    if analytics.get("computedAt"):
+        lines += ["", f"Computed at {analytics['computedAt']}"]
+    return "\n".join(lines)
+
+
+def new_document_buffer():
+    """Private binary buffer for an outgoing document (no shared path)."""
+    return tempfile.SpooledTemporaryFile(max_size=DOCUMENT_SPOOL_MAX_SIZE, mode="w+b")
+
+
+def document_file(buffer, filename):
+    """
+    Upload for a spooled buffer. PTB names file handles after their path,
+    which an in-memory SpooledTemporaryFile does not have, so the content
+    is passed as bytes under `filename`.
+    """
+    buffer.seek(0)
+    return InputFile(buffer.read(), filename=filename)
+
+
+def unique_filename(filename):
+    """Per-request display name, e.g. `registrations_20250101-120000_1a2b3c.csv`."""
+    # Split at the first dot so `registrations.csv.gz` keeps both suffixes
+    stem, dot, ext = filename.partition(".")
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return f"{stem}_{stamp}_{uuid.uuid4().hex[:6]}{dot}{ext}"
+
+
+async def send_large_text_or_file(context, chat_id, text, filename="output.txt", mode=None):
+    """
+    Send plain text as a preformatted message, several messages or a file.
+    Text is split on line boundaries into messages within Telegram's limit,
+    measured after escaping. With mode="messages" up to
+    LONG_OUTPUT_MAX_MESSAGES messages are sent before falling back to a
+    file; with mode="file" anything longer than one message becomes a file.
+    """
+    mode = mode or Config.LONG_OUTPUT_MODE
+    opening, closing = preformatted(ParseMode.HTML)
+    chunks = chunk_lines(
+        text.splitlines(keepends=True), opening=opening, closing=closing,
+        escape_line=lambda line: escape(line, ParseMode.HTML)
+    )
+
+    if len(chunks) == 1 or (mode == "messages" and len(chunks) <= Config.LONG_OUTPUT_MAX_MESSAGES):
+        await send_chunks(
+            context.bot, chat_id, chunks,
+            parse_mode=ParseMode.HTML, interval=Config.MESSAGE_INTERVAL
+        )
+        return
+
+    with new_document_buffer() as buffer:
+        buffer.write(text.encode("utf-8"))
+        buffer.seek(0)
         await context.bot.send_document(
             chat_id=chat_id,
-            document=open(filename, "rb"),
+            document=document_file(buffer, unique_filename(filename)),
             caption="List is too long, sending as file."
         )
-        os.remove(filename)
-    else:
-        # Send as text message
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text=f"```\n{text}```",
-            parse_mode=ParseMode.MARKDOWN
-        )
 
 
 def format_transactions_list(data):
     """Format list of transactions as text."""
-    formatted_text = ""
-    for item in data:
-        t_name = item.get("teamName", "Unknown")
-        t_id = item.get("transactionId", "N/A")
-        formatted_text += f"{t_name}: {t_id}\n"
-    return formatted_text
+    return "".join(
+        f"{item.get('teamName', 'Unknown')}: {item.get('transactionId', 'N/A')}\n"
+        for item in data
+    )
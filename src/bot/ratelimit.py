@@ -0,0 +1,230 @@
+"""Outbound Telegram rate limiting."""
+import asyncio
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from src.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Bot API methods treated as bulk transfers; everything else is interactive
+BULK_ENDPOINTS = frozenset({
+    "sendDocument", "sendPhoto", "sendVideo", "sendAudio", "sendMediaGroup", "sendAnimation"
+})
+
+# Idle per-chat buckets are dropped once this many are tracked
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Classic token bucket; `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        # Serves waiters of one chat in arrival order
+        self.lock = asyncio.Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now, amount=1.0):
+        """Seconds until `amount` tokens are available (after refill)."""
+        blocked = max(0.0, self.blocked_until - now)
+        if self.tokens >= amount:
+            return blocked
+        return max(blocked, (amount - self.tokens) / self.rate)
+
+    def block(self, seconds):
+        """Refuse tokens for `seconds` (after a flood-control response)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+class TokenBucketRateLimiter(BaseRateLimiter):
+    """
+    Rate limiter for `ApplicationBuilder.rate_limiter`.
+
+    Every Bot API call takes a token from a global bucket and, if it targets
+    a chat, from that chat's bucket (group chats use the stricter group
+    rate). Interactive calls go first: bulk uploads wait while interactive
+    calls that are clear of their chat's bucket wait for global tokens, and
+    leave `bulk_reserve` global tokens untouched.
+    A 429 response blocks the affected bucket for `retry_after` seconds and
+    the call is retried up to `max_retries` times.
+
+    With a shared `backend` the global and per-chat budgets are also taken
+    from buckets in the backend, so several workers together stay within
+    Telegram's per-bot limits; priority and ordering stay per worker.
+    """
+
+    def __init__(self, global_rate=30.0, chat_rate=1.0, chat_burst=3,
+                 group_rate=20 / 60, bulk_reserve=5, max_retries=3, backend=None):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.bulk_reserve = bulk_reserve
+        self.max_retries = max_retries
+        self.backend = backend if backend is not None and backend.shared else None
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}
+        self._interactive_waiting = 0
+        self.metrics = {
+            "requests": 0,
+            "interactive": 0,
+            "bulk": 0,
+            "delayed": 0,
+            "delay_seconds": 0.0,
+            "retries": 0,
+            "rejected": 0,
+        }
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        self._chats.clear()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        bulk = endpoint in BULK_ENDPOINTS
+        self.metrics["requests"] += 1
+        self.metrics["bulk" if bulk else "interactive"] += 1
+
+        return await self._send(callback, args, kwargs, endpoint, chat_id, bulk)
+
+    async def _send(self, callback, args, kwargs, endpoint, chat_id, bulk):
+        for attempt in range(self.max_retries + 1):
+            # Time spent waiting for tokens; the call itself is the "telegram" stage
+            with stage("ratelimit"):
+                await self._acquire(chat_id, bulk)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                delay = e.retry_after
+                delay = delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+                if attempt == self.max_retries:
+                    self.metrics["rejected"] += 1
+                    raise
+                self.metrics["retries"] += 1
+                logger.warning(f"Flood control on {endpoint} for chat {chat_id}, retrying in {delay}s")
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else self._global
+                bucket.block(delay)
+                if self.backend is not None:
+                    await self.backend.block(self._shared_key(chat_id), delay)
+
+    def snapshot(self):
+        """Counters plus current queue and bucket state."""
+        return dict(
+            self.metrics,
+            interactive_waiting=self._interactive_waiting,
+            tracked_chats=len(self._chats),
+            global_tokens=round(self._global.tokens, 2)
+        )
+
+    async def _acquire(self, chat_id, bulk):
+        chat = self._chat_bucket(chat_id) if chat_id is not None else None
+        reserve = 1.0 + (self.bulk_reserve if bulk else 0.0)
+        started = time.monotonic()
+        waited = False
+        holding_lock = False
+        # Interactive callers hold back bulk uploads only while they wait on
+        # the global bucket; waiting for their own chat must not starve
+        # uploads to other chats.
+        counted = False
+
+        try:
+            if chat is not None:
+                await chat.lock.acquire()
+                holding_lock = True
+            while True:
+                now = time.monotonic()
+                self._global.refill(now)
+                if chat is not None:
+                    chat.refill(now)
+                    chat_delay = chat.wait_time(now)
+                    if chat_delay > 0:
+                        if counted:
+                            self._interactive_waiting -= 1
+                            counted = False
+                        waited = True
+                        await asyncio.sleep(chat_delay)
+                        continue
+
+                if not bulk and not counted:
+                    self._interactive_waiting += 1
+                    counted = True
+                delay = self._global.wait_time(now, reserve)
+                if bulk and self._interactive_waiting:
+                    delay = max(delay, 1 / self.global_rate)
+
+                if delay <= 0:
+                    self._global.tokens -= 1
+                    if chat is not None:
+                        chat.tokens -= 1
+                    break
+
+                waited = True
+                await asyncio.sleep(delay)
+
+            if counted:
+                self._interactive_waiting -= 1
+                counted = False
+            if self.backend is not None:
+                waited = await self._acquire_shared(chat_id) or waited
+        finally:
+            if holding_lock:
+                chat.lock.release()
+            if counted:
+                self._interactive_waiting -= 1
+
+        if waited:
+            self.metrics["delayed"] += 1
+            self.metrics["delay_seconds"] += time.monotonic() - started
+
+    async def _acquire_shared(self, chat_id):
+        """Take the chat and then the global token from the shared backend."""
+        buckets = [(self._shared_key(None), self.global_rate, self.global_rate)]
+        if chat_id is not None:
+            rate = self.group_rate if isinstance(chat_id, int) and chat_id < 0 else self.chat_rate
+            buckets.insert(0, (self._shared_key(chat_id), rate, self.chat_burst))
+
+        waited = False
+        for key, rate, capacity in buckets:
+            delay = await self.backend.take(key, rate, capacity)
+            while delay > 0:
+                waited = True
+                await asyncio.sleep(delay)
+                delay = await self.backend.take(key, rate, capacity)
+        return waited
+
+    @staticmethod
+    def _shared_key(chat_id):
+        return "ratelimit:global" if chat_id is None else f"ratelimit:chat:{chat_id}"
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._evict_idle()
+            # Negative ids are groups and channels, which have a lower limit
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = TokenBucket(rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for chat_id, bucket in list(self._chats.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.capacity and bucket.blocked_until <= now and not bucket.lock.locked():
+                del self._chats[chat_id]
@@ -0,0 +1,31 @@
+"""Bot API transport that times every call as the "telegram" stage."""
+from telegram.request import BaseRequest, HTTPXRequest
+
+from src.metrics import stage
+
+# PTB's default connection pool for the main (non-getUpdates) request
+CONNECTION_POOL_SIZE = 256
+
+
+class TimedRequest(BaseRequest):
+    """
+    Wraps the real transport so Bot API round trips are attributed to the
+    current command whether or not the rate limiter is enabled.
+    """
+
+    def __init__(self, request=None):
+        self.request = request or HTTPXRequest(connection_pool_size=CONNECTION_POOL_SIZE)
+
+    @property
+    def read_timeout(self):
+        return self.request.read_timeout
+
+    async def initialize(self):
+        await self.request.initialize()
+
+    async def shutdown(self):
+        await self.request.shutdown()
+
+    async def do_request(self, *args, **kwargs):
+        with stage("telegram"):
+            return await self.request.do_request(*args, **kwargs)
@@ -0,0 +1,142 @@
+"""Per-command-class concurrency limits and worker pools."""
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.db.runner import current_pool
+
+logger = logging.getLogger(__name__)
+
+BUSY_MESSAGE = "The bot is busy with other downloads right now, please try again in a minute."
+
+
+class CommandPool:
+    """
+    A concurrency limit plus a dedicated thread pool for one command class.
+
+    A pool with a `backlog` is detached: its handlers are handed off as
+    background tasks, so they do not hold one of PTB's concurrent update
+    slots while they queue. At most `limit + backlog` of them exist at
+    once; handlers beyond that are rejected.
+    """
+
+    def __init__(self, name, limit, backlog=None):
+        self.name = name
+        self.limit = limit
+        self.backlog = backlog
+        self.executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"{name}-pool")
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self._semaphore = asyncio.Semaphore(limit)
+        self._tasks = set()
+
+    @property
+    def detached(self):
+        return self.backlog is not None
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Await `func(*args, **kwargs)` once a slot is free. Blocking queries
+        issued through `run_query` inside it use this pool's threads.
+        Calls made while already holding a slot of this pool run directly.
+        """
+        if current_pool.get() is self:
+            return await func(*args, **kwargs)
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.wait_seconds += time.perf_counter() - queued_at
+
+        self.active += 1
+        token = current_pool.set(self)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            current_pool.reset(token)
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def defer(self, func, *args, **kwargs):
+        """
+        Run `func` in this pool as a background task. Returns the task, or
+        None (rejected) when `limit + backlog` handlers are already pending.
+        """
+        if len(self._tasks) >= self.limit + (self.backlog or 0):
+            self.rejected += 1
+            return None
+        task = asyncio.create_task(self.run(func, *args, **kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+        return task
+
+    def _finished(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"{self.name} handler failed: {task.exception()}", exc_info=task.exception())
+
+    def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class CommandScheduler:
+    """
+    Named pools, e.g. a small "export" pool next to a wide "lookup" pool.
+    Pools named in `backlogs` are detached (see CommandPool).
+    """
+
+    def __init__(self, limits, backlogs=None):
+        backlogs = backlogs or {}
+        self.pools = {
+            name: CommandPool(name, limit, backlogs.get(name)) for name, limit in limits.items()
+        }
+
+    def pool(self, name):
+        return self.pools[name]
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+
+
+def command_class(name):
+    """
+    Run a handler inside the scheduler pool `name` found in
+    `context.bot_data["scheduler"]`. Handlers called from a handler that
+    already holds a slot in the same pool run directly. Handlers of a
+    detached pool run in the background (or answer BUSY_MESSAGE when its
+    backlog is full) and the wrapper returns their task at once, so the
+    metrics and log wrappers around it, and callers that return it in
+    turn, can finish with the task.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(update, context, *args, **kwargs):
+            scheduler = context.bot_data.get("scheduler") if context is not None else None
+            if scheduler is None:
+                return await handler(update, context, *args, **kwargs)
+
+            pool = scheduler.pool(name)
+            if current_pool.get() is pool:
+                return await handler(update, context, *args, **kwargs)
+            if pool.detached:
+                task = pool.defer(handler, update, context, *args, **kwargs)
+                if task is None:
+                    message = update.effective_message
+                    if message is not None:
+                        await message.reply_text(BUSY_MESSAGE)
+                return task
+            return await pool.run(handler, update, context, *args, **kwargs)
+        return wrapper
+    return decorator
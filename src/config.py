@@ -16,8 +16,132 @@ class Config:
     
     # Bot Configuration
     BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+    # Bot API server root, e.g. http://127.0.0.1:8081 (default: api.telegram.org)
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "").rstrip("/")
     WEBHOOK_URL = os.getenv("WEBHOOK_URL")
     PORT = int(os.environ.get("PORT", 8080))
+    # Number of updates processed concurrently (1 = sequential)
+    CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", 64))
+
+    # Concurrent handlers per command class (each class has its own pool).
+    # The limit also caps MONGO_DRIVER=async queries, which use no threads,
+    # so raise LOOKUP_CONCURRENCY when switching to the async driver
+    EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", 2))
+    LOOKUP_CONCURRENCY = int(os.getenv("LOOKUP_CONCURRENCY", 32))
+    # Export-class handlers queued in the background (outside PTB's update
+    # slots) before further requests are turned away as busy
+    EXPORT_BACKLOG = int(os.getenv("EXPORT_BACKLOG", 100))
+
+    # Webhook admission: updates admitted beyond the CONCURRENT_UPDATES being
+    # processed, and what to do with updates arriving when that is reached
+    UPDATE_QUEUE_MAXSIZE = int(os.getenv("UPDATE_QUEUE_MAXSIZE", 1000))
+    # "reject" answers 503 so Telegram redelivers, "drop" acks and discards
+    WEBHOOK_SHED_POLICY = os.getenv("WEBHOOK_SHED_POLICY", "reject").lower()
+    WEBHOOK_RETRY_AFTER = int(os.getenv("WEBHOOK_RETRY_AFTER", 5))
+
+    # uvicorn worker processes (uvicorn's own variable name)
+    WORKERS = int(os.getenv("WEB_CONCURRENCY", 1))
+    # State shared by workers: "memory" (per process, one worker only),
+    # "sqlite" or "redis"
+    STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()
+    STATE_SQLITE_PATH = os.getenv("STATE_SQLITE_PATH", "/dev/shm/registration-bot-state.sqlite3")
+    STATE_REDIS_URL = os.getenv("STATE_REDIS_URL", "redis://localhost:6379/0")
+
+    # MongoDB client pool, timeouts (ms, 0 = no limit) and wire compression
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 2))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 10000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0))
+    # Comma-separated, e.g. "zstd,snappy,zlib" (zstd/snappy need extra packages)
+    MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+    # Connections opened at startup so early requests skip the handshake
+    MONGO_WARM_CONNECTIONS = int(os.getenv("MONGO_WARM_CONNECTIONS", 4))
+
+    # "sync" runs pymongo calls in the executor, "async" uses AsyncMongoClient
+    MONGO_DRIVER = os.getenv("MONGO_DRIVER", "sync").lower()
+
+    # Stats cache: seconds a computed result is reused (0 disables caching)
+    STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", 30))
+
+    # Change feed for cache invalidation: "none", "change_stream" or "poll"
+    CHANGE_FEED_MODE = os.getenv("CHANGE_FEED_MODE", "none").lower()
+    CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", 5))
+
+    # Incremental stats counters (requires CHANGE_FEED_MODE)
+    STATS_INCREMENTAL = os.getenv("STATS_INCREMENTAL", "false").lower() == "true"
+    STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", 3600))
+    # Teams tracked in memory (~150 bytes each) before the counter turns
+    # itself off; 0 means unbounded
+    STATS_MAX_TEAMS = int(os.getenv("STATS_MAX_TEAMS", 1000000))
+
+    # In-memory team name index for /find (prefix and typo-tolerant matching)
+    TEAM_INDEX_ENABLED = os.getenv("TEAM_INDEX_ENABLED", "true").lower() == "true"
+    # Rebuild interval in seconds when no change feed is configured
+    TEAM_INDEX_REFRESH_INTERVAL = float(os.getenv("TEAM_INDEX_REFRESH_INTERVAL", 300))
+    FIND_SUGGESTIONS = int(os.getenv("FIND_SUGGESTIONS", 5))
+
+    # Output longer than one message: "file" sends a document, "messages"
+    # splits it into up to LONG_OUTPUT_MAX_MESSAGES messages first
+    LONG_OUTPUT_MODE = os.getenv("LONG_OUTPUT_MODE", "file").lower()
+    LONG_OUTPUT_MAX_MESSAGES = int(os.getenv("LONG_OUTPUT_MAX_MESSAGES", 5))
+    # Pause between consecutive messages to one chat (seconds)
+    MESSAGE_INTERVAL = float(os.getenv("MESSAGE_INTERVAL", 0))
+
+    # Outbound rate limiting (token buckets, per second unless noted)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_GLOBAL = float(os.getenv("RATE_LIMIT_GLOBAL", 30))
+    RATE_LIMIT_PER_CHAT = float(os.getenv("RATE_LIMIT_PER_CHAT", 1))
+    RATE_LIMIT_CHAT_BURST = int(os.getenv("RATE_LIMIT_CHAT_BURST", 3))
+    RATE_LIMIT_PER_GROUP = float(os.getenv("RATE_LIMIT_PER_GROUP", 20))  # per minute
+    RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", 3))
+
+    # Rows per /transactions page
+    TRANSACTIONS_PAGE_SIZE = int(os.getenv("TRANSACTIONS_PAGE_SIZE", 20))
+    # Seconds a page's navigation buttons work when state is in a shared backend
+    TRANSACTIONS_PAGE_TTL = float(os.getenv("TRANSACTIONS_PAGE_TTL", 3600))
+
+    # Export Configuration
+    EXPORT_STREAMING = os.getenv("EXPORT_STREAMING", "true").lower() == "true"
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+    # Seconds an uploaded export is re-sent by file_id while data is unchanged
+    EXPORT_CACHE_TTL = float(os.getenv("EXPORT_CACHE_TTL", 60))
+    # Optional last-modified field; `/registrations new` then also exports
+    # older documents changed since the chat's previous download
+    EXPORT_UPDATED_FIELD = os.getenv("EXPORT_UPDATED_FIELD", "")
+    # /analytics: materialize into <collection>_analytics every interval
+    # instead of running the pipeline on demand
+    ANALYTICS_MATERIALIZE = os.getenv("ANALYTICS_MATERIALIZE", "false").lower() == "true"
+    ANALYTICS_REFRESH_INTERVAL = float(os.getenv("ANALYTICS_REFRESH_INTERVAL", 600))
+
+    # Telegram user ids allowed to run /import (comma-separated)
+    ADMIN_IDS = frozenset(
+        int(value) for value in os.getenv("ADMIN_IDS", "").split(",") if value.strip()
+    )
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+    IMPORT_PROGRESS_INTERVAL = float(os.getenv("IMPORT_PROGRESS_INTERVAL", 2))
+
+    # Logging: level, "json" or "text" lines, queue bound (records beyond
+    # it are dropped rather than blocking) and sampling of high-volume
+    # records per level, e.g. "DEBUG=0.01,INFO=0.1"
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+    LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+    # Per-chat menu flow state (e.g. "Find a Team" waiting for a name):
+    # idle timeout in seconds, chats kept in memory, and where state is
+    # written behind for restarts: none, mongo or file
+    CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", 300))
+    CONVERSATION_MAX_CHATS = int(os.getenv("CONVERSATION_MAX_CHATS", 100000))
+    CONVERSATION_PERSISTENCE = os.getenv("CONVERSATION_PERSISTENCE", "none").lower()
+    CONVERSATION_FILE = os.getenv("CONVERSATION_FILE", "conversations.json")
+    CONVERSATION_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", 5))
+
+    # Format of a bare /registrations: csv, gz, parquet or xlsx
+    EXPORT_DEFAULT_FORMAT = os.getenv("EXPORT_DEFAULT_FORMAT", "csv").lower()
     
     @classmethod
     def validate(cls):
@@ -32,3 +156,22 @@ class Config:
             raise ValueError("DATABASE_NAME is missing")
         if not cls.COLLECTION_NAME:
             raise ValueError("COLLECTION_NAME is missing")
+        if cls.MONGO_DRIVER not in ("sync", "async"):
+            raise ValueError("MONGO_DRIVER must be 'sync' or 'async'")
+        if cls.WEBHOOK_SHED_POLICY not in ("reject", "drop"):
+            raise ValueError("WEBHOOK_SHED_POLICY must be 'reject' or 'drop'")
+        if cls.EXPORT_DEFAULT_FORMAT not in ("csv", "gz", "parquet", "xlsx"):
+            raise ValueError("EXPORT_DEFAULT_FORMAT must be 'csv', 'gz', 'parquet' or 'xlsx'")
+        from src.db.export import EXPORT_FORMATS, format_available
+        if not format_available(cls.EXPORT_DEFAULT_FORMAT):
+            module = EXPORT_FORMATS[cls.EXPORT_DEFAULT_FORMAT][1]
+            raise ValueError(f"EXPORT_DEFAULT_FORMAT '{cls.EXPORT_DEFAULT_FORMAT}' needs the {module} package "
+                             "(pip install 'brewathon[exports]')")
+        if cls.STATE_BACKEND not in ("memory", "sqlite", "redis"):
+            raise ValueError("STATE_BACKEND must be 'memory', 'sqlite' or 'redis'")
+        if cls.WORKERS > 1 and cls.STATE_BACKEND == "memory":
+            raise ValueError("WEB_CONCURRENCY > 1 needs STATE_BACKEND 'sqlite' or 'redis'")
+        if cls.CONVERSATION_PERSISTENCE not in ("none", "mongo", "file"):
+            raise ValueError("CONVERSATION_PERSISTENCE must be 'none', 'mongo' or 'file'")
+        if cls.LOG_FORMAT not in ("json", "text"):
+            raise ValueError("LOG_FORMAT must be 'json' or 'text'")
@@ -0,0 +1,197 @@
+"""
+Registration analytics computed by one `$facet` aggregation, optionally
+materialized into a summary collection with `$merge` on a schedule.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+
+from src.db.queries import MEMBER_FIELDS, get_mongo_client, get_mongo_collection
+
+logger = logging.getLogger(__name__)
+
+# Summary collection is `<collection><suffix>`, holding one document
+ANALYTICS_SUFFIX = "_analytics"
+SUMMARY_ID = "summary"
+# Duplicate transaction ids listed individually (all are counted)
+MAX_DUPLICATES = 50
+
+
+def analytics_pipeline():
+    """Single-pass pipeline: every breakdown is a `$facet` branch over one projection."""
+    member_count = {
+        "$sum": [{"$cond": [{"$ifNull": [f"${field}", False]}, 1, 0]} for field in MEMBER_FIELDS]
+    }
+    has_transaction = {"transactionId": {"$nin": [None, ""]}}
+    return [
+        {
+            "$project": {
+                "_id": 0,
+                "memberCount": member_count,
+                "transactionId": 1,
+                # Registration day from the ObjectId creation time
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$toDate": "$_id"}}},
+            }
+        },
+        {
+            "$facet": {
+                "totals": [
+                    {"$group": {"_id": None, "teams": {"$sum": 1}, "members": {"$sum": "$memberCount"}}}
+                ],
+                "teamSizes": [
+                    {"$group": {"_id": "$memberCount", "teams": {"$sum": 1}}},
+                    {"$sort": {"_id": 1}},
+                ],
+                "missingTransaction": [
+                    {"$match": {"$nor": [has_transaction]}},
+                    {"$count": "teams"},
+                ],
+                "duplicateTransactions": [
+                    {"$match": has_transaction},
+                    {"$group": {"_id": "$transactionId", "teams": {"$sum": 1}}},
+                    {"$match": {"teams": {"$gt": 1}}},
+                    {"$sort": {"teams": -1, "_id": 1}},
+                ],
+                "perDay": [
+                    {"$group": {"_id": "$day", "teams": {"$sum": 1}}},
+                    {"$sort": {"_id": 1}},
+                ],
+            }
+        },
+        {
+            "$project": {
+                "totalTeams": {"$ifNull": [{"$first": "$totals.teams"}, 0]},
+                "totalMembers": {"$ifNull": [{"$first": "$totals.members"}, 0]},
+                "teamSizes": 1,
+                "missingTransaction": {"$ifNull": [{"$first": "$missingTransaction.teams"}, 0]},
+                "duplicateTransactionCount": {"$size": "$duplicateTransactions"},
+                "duplicateTransactions": {"$slice": ["$duplicateTransactions", MAX_DUPLICATES]},
+                "perDay": 1,
+            }
+        },
+    ]
+
+
+def summary_collection(connection_string, database_name, collection_name):
+    client = get_mongo_client(connection_string)
+    db = client.get_database(database_name)
+    return db.get_collection(f"{collection_name}{ANALYTICS_SUFFIX}")
+
+
+def normalize(result):
+    """Plain dict for callers and caches: no `_id`, `computedAt` as ISO text."""
+    result = dict(result)
+    result.pop("_id", None)
+    computed_at = result.get("computedAt")
+    if isinstance(computed_at, datetime):
+        if computed_at.tzinfo is None:
+            computed_at = computed_at.replace(tzinfo=timezone.utc)
+        result["computedAt"] = computed_at.isoformat(timespec="seconds")
+    return result
+
+
+def compute_analytics(connection_string, database_name, collection_name):
+    """Run the analytics pipeline now (one collection scan)."""
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        result = list(collection.aggregate(analytics_pipeline()))
+        result = result[0] if result else {}
+        result["computedAt"] = datetime.now(timezone.utc)
+        return normalize(result)
+
+    except Exception as e:
+        logger.error(f"Analytics error: {e}")
+        return None
+
+
+def materialize_analytics(connection_string, database_name, collection_name):
+    """Run the pipeline server-side and `$merge` the result into the summary collection."""
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        pipeline = analytics_pipeline() + [
+            {"$addFields": {"_id": SUMMARY_ID, "computedAt": "$$NOW"}},
+            {
+                "$merge": {
+                    "into": f"{collection_name}{ANALYTICS_SUFFIX}",
+                    "on": "_id",
+                    "whenMatched": "replace",
+                    "whenNotMatched": "insert",
+                }
+            },
+        ]
+        collection.aggregate(pipeline)
+        return True
+
+    except Exception as e:
+        logger.error(f"Analytics materialization error: {e}")
+        return False
+
+
+def get_materialized_analytics(connection_string, database_name, collection_name):
+    """Precomputed analytics from the summary collection, or None."""
+    try:
+        summary = summary_collection(connection_string, database_name, collection_name)
+        result = summary.find_one({"_id": SUMMARY_ID})
+        return normalize(result) if result else None
+
+    except Exception as e:
+        logger.error(f"Analytics read error: {e}")
+        return None
+
+
+def load_analytics(connection_string, database_name, collection_name, materialized=False):
+    """
+    Read the summary when materializing (None until the first refresh has
+    written it, so a lookup never turns into a scan); otherwise compute live.
+    """
+    if materialized:
+        return get_materialized_analytics(connection_string, database_name, collection_name)
+    return compute_analytics(connection_string, database_name, collection_name)
+
+
+class AnalyticsRefresher:
+    """
+    Re-materialize analytics every `interval` seconds. With a shared
+    `backend` only the worker that claims the current interval runs it.
+    """
+
+    def __init__(self, materializer, interval=600.0, backend=None, on_refresh=None):
+        self.materializer = materializer
+        self.interval = interval
+        self.backend = backend if backend is not None and backend.shared else None
+        self.on_refresh = on_refresh
+        self._task = None
+
+    async def refresh(self):
+        if self.backend is not None:
+            claimed = await self.backend.add("analytics:refresh", str(os.getpid()), ttl=self.interval * 0.9)
+            if not claimed:
+                return False
+        ok = await self.materializer()
+        if ok and self.on_refresh is not None:
+            self.on_refresh()
+        return ok
+
+    async def start(self):
+        """Materialize now and then every `interval` seconds."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Analytics refresh failed: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,300 @@
+"""Asyncio-native database query functions for MongoDB operations."""
+import logging
+from pymongo import AsyncMongoClient
+import asyncio
+import certifi
+
+from src.config import Config
+from src.db.monitoring import mongo_listeners
+
+from src.db.queries import (
+    CsvStreamBuilder,
+    MEMBER_FIELDS,
+    TEAM_NAME_COLLATION,
+    TEAM_NAME_INDEX,
+    TEAM_PAGE_INDEX,
+    EXPORT_WATERMARKS_SUFFIX,
+    build_transactions_page_query,
+    make_transactions_page,
+    count_members,
+    mongo_client_options
+)
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def get_mongo_client(connection_string):
+    """Create or reuse global async MongoDB client (connection pooling)."""
+    global _client
+    if _client is None:
+        _client = AsyncMongoClient(
+            connection_string, tlsCAFile=certifi.where(),
+            event_listeners=mongo_listeners("async"),
+            **mongo_client_options()
+        )
+    return _client
+
+
+async def warm_mongo_client(connection_string, connections=0):
+    """Connect and ping now; `connections` concurrent pings pre-open sockets."""
+    try:
+        client = get_mongo_client(connection_string)
+        await client.admin.command("ping")
+        if connections > 1:
+            await asyncio.gather(*(client.admin.command("ping") for _ in range(connections)))
+        return True
+
+    except Exception as e:
+        logger.error(f"MongoDB warm-up error: {e}")
+        return False
+
+
+async def close_mongo_client():
+    """Close the global async client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def get_mongo_collection(connection_string, database_name, collection_name):
+    """Get async MongoDB collection."""
+    client = get_mongo_client(connection_string)
+    db = client.get_database(database_name)
+    return db.get_collection(collection_name)
+
+
+async def stream_collection_to_csv(connection_string, database_name, collection_name, batch_size=1000):
+    """
+    Stream entire collection into a CSV buffer, batch by batch, without `_id`.
+    Returns a binary file object positioned at the start, or None if the
+    collection is empty. CSV encoding and the final rewrite run in a worker
+    thread, a batch at a time, so the event loop only awaits the cursor.
+    """
+    builder = CsvStreamBuilder()
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        cursor = collection.find({}, {"_id": 0}, batch_size=batch_size)
+
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                await asyncio.to_thread(builder.extend, batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(builder.extend, batch)
+
+        output = await asyncio.to_thread(builder.finish)
+        if output is None:
+            logger.info("No documents found.")
+        return output
+
+    except Exception as e:
+        logger.error(f"CSV stream export error: {e}")
+        builder.close()
+        return None
+
+
+async def get_stats(connection_string, database_name, collection_name):
+    """Get total teams and total members stats."""
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+
+        pipeline = [
+            {
+                "$project": {
+                    "teamName": 1,
+                    "memberCount": {
+                        "$sum": [
+                            {"$cond": [{"$ifNull": ["$member1Name", False]}, 1, 0]},
+                            {"$cond": [{"$ifNull": ["$member2Name", False]}, 1, 0]},
+                            {"$cond": [{"$ifNull": ["$member3Name", False]}, 1, 0]},
+                            {"$cond": [{"$ifNull": ["$member4Name", False]}, 1, 0]}
+                        ]
+                    }
+                }
+            },
+            {
+                "$group": {
+                    "_id": None,
+                    "total_teams": {"$sum": 1},
+                    "total_members": {"$sum": "$memberCount"}
+                }
+            }
+        ]
+
+        cursor = await collection.aggregate(pipeline)
+        result = await cursor.to_list(None)
+
+        if result:
+            return {
+                "total_teams": result[0]["total_teams"],
+                "total_members": result[0]["total_members"]
+            }
+
+        return {"total_teams": 0, "total_members": 0}
+
+    except Exception as e:
+        logger.error(f"Stats error: {e}")
+        return None
+
+
+async def ensure_indexes(connection_string, database_name, collection_name):
+    """Create the indexes the bot queries rely on (no-op if they exist)."""
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        await collection.create_index(
+            [("teamName", 1)], name=TEAM_NAME_INDEX, collation=TEAM_NAME_COLLATION
+        )
+        await collection.create_index([("teamName", 1), ("_id", 1)], name=TEAM_PAGE_INDEX)
+        if Config.EXPORT_UPDATED_FIELD:
+            await collection.create_index([(Config.EXPORT_UPDATED_FIELD, 1)])
+        return True
+
+    except Exception as e:
+        logger.error(f"Index creation error: {e}")
+        return False
+
+
+async def find_team_by_name(connection_string, database_name, collection_name, team_name):
+    """Case-insensitive exact match served by the collation index."""
+    try:
+        if not team_name:
+            return None
+
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        query = {"teamName": team_name.strip()}
+        return await collection.find_one(query, collation=TEAM_NAME_COLLATION)
+
+    except Exception as e:
+        logger.error(f"Find error: {e}")
+        return None
+
+
+async def find_team_by_id(connection_string, database_name, collection_name, team_id):
+    """Fetch a single team document by `_id`."""
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        return await collection.find_one({"_id": team_id})
+
+    except Exception as e:
+        logger.error(f"Find by id error: {e}")
+        return None
+
+
+async def get_team_names(connection_string, database_name, collection_name, batch_size=1000):
+    """List `(_id, teamName)` pairs for every document (projection-only scan)."""
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        cursor = collection.find({}, {"teamName": 1}, batch_size=batch_size)
+        return [(doc["_id"], doc.get("teamName")) async for doc in cursor]
+
+    except Exception as e:
+        logger.error(f"Team name fetch error: {e}")
+        return None
+
+
+async def get_member_counts(connection_string, database_name, collection_name, batch_size=1000):
+    """Map every document `_id` to its member count (projection-only scan)."""
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        projection = {field: 1 for field in MEMBER_FIELDS}
+        cursor = collection.find({}, projection, batch_size=batch_size)
+        return {doc["_id"]: count_members(doc) async for doc in cursor}
+
+    except Exception as e:
+        logger.error(f"Member count error: {e}")
+        return None
+
+
+async def get_teams_with_transaction_numbers(connection_string, database_name, collection_name):
+    """
+    Get all team names with their transaction numbers.
+    Returns a list of dicts with teamName and transactionId, sorted by teamName.
+    """
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        cursor = collection.find(
+            {},
+            {"teamName": 1, "transactionId": 1, "_id": 0}
+        ).sort("teamName", 1)
+
+        return await cursor.to_list(None)
+
+    except Exception as e:
+        logger.error(f"Error fetching teams with transaction numbers: {e}")
+        return None
+
+
+async def get_transactions_page(connection_string, database_name, collection_name,
+                                after=None, before=None, limit=20):
+    """
+    Fetch one page of teamName/transactionId rows ordered by (teamName, _id)
+    with a keyset range query, so every page costs the same.
+    Returns `{"items", "has_prev", "has_next"}`.
+    """
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        query, sort = build_transactions_page_query(after, before)
+        cursor = collection.find(
+            query, {"teamName": 1, "transactionId": 1}
+        ).sort(sort).limit(limit + 1)
+
+        return make_transactions_page(await cursor.to_list(None), limit, after, before)
+
+    except Exception as e:
+        logger.error(f"Transactions page error: {e}")
+        return None
+
+
+async def get_collection_watermark(connection_string, database_name, collection_name):
+    """
+    Cheap change marker for the collection: (estimated document count, max _id).
+    Both values come from metadata or the _id index, so no collection scan.
+    """
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        count = await collection.estimated_document_count()
+        latest = await collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        return (count, latest["_id"] if latest else None)
+
+    except Exception as e:
+        logger.error(f"Watermark error: {e}")
+        return None
+
+
+def get_export_watermarks_collection(connection_string, database_name, collection_name):
+    """Per-chat `/registrations new` watermarks, next to the registrations."""
+    client = get_mongo_client(connection_string)
+    db = client.get_database(database_name)
+    return db.get_collection(f"{collection_name}{EXPORT_WATERMARKS_SUFFIX}")
+
+
+async def get_export_watermark(connection_string, database_name, collection_name, chat_id):
+    """`{"lastId", "exportedAt"}` of the previous delta export to `chat_id`, or None."""
+    try:
+        watermarks = get_export_watermarks_collection(connection_string, database_name, collection_name)
+        return await watermarks.find_one({"_id": chat_id})
+
+    except Exception as e:
+        logger.error(f"Export watermark error: {e}")
+        return None
+
+
+async def set_export_watermark(connection_string, database_name, collection_name, chat_id, last_id, exported_at):
+    """Advance the watermark of `chat_id` (never moves back)."""
+    try:
+        watermarks = get_export_watermarks_collection(connection_string, database_name, collection_name)
+        await watermarks.update_one(
+            {"_id": chat_id},
+            {"$max": {"lastId": last_id, "exportedAt": exported_at}},
+            upsert=True
+        )
+        return True
+
+    except Exception as e:
+        logger.error(f"Export watermark update error: {e}")
+        return False
@@ -0,0 +1,143 @@
+"""Caching helpers for expensive queries."""
+import asyncio
+import json
+import os
+import time
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers with the same key."""
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, func):
+        """Await `func()` or join the call already running for `key`."""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+        # Shield so one caller giving up does not cancel the shared call
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+
+class SharedSingleFlight:
+    """
+    SingleFlight across worker processes through a shared backend.
+
+    Within a process callers are coalesced as with SingleFlight; across
+    processes the first worker takes a lock in the backend and publishes its
+    JSON-encodable result for `ttl` seconds, while the others poll for it.
+    If the lock holder dies, waiters run `func` themselves after `lock_ttl`.
+    """
+
+    def __init__(self, backend, ttl, lock_ttl=30.0, poll_interval=0.05):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self._local = SingleFlight()
+
+    async def do(self, key, func):
+        """Await the shared result for `key`, computing it with `func()` if needed."""
+        return await self._local.do(key, lambda: self._shared(key, func))
+
+    async def forget(self, key):
+        """Drop the published result for `key`."""
+        await self.backend.delete(key)
+
+    async def _shared(self, key, func):
+        cached = await self.backend.get(key)
+        if cached is not None:
+            return json.loads(cached)
+
+        lock_key = f"{key}:lock"
+        deadline = time.monotonic() + self.lock_ttl
+        locked = await self.backend.add(lock_key, str(os.getpid()), ttl=self.lock_ttl)
+        while not locked and time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            cached = await self.backend.get(key)
+            if cached is not None:
+                return json.loads(cached)
+            locked = await self.backend.add(lock_key, str(os.getpid()), ttl=self.lock_ttl)
+
+        try:
+            value = await func()
+            if value is not None and self.ttl > 0:
+                await self.backend.set(key, json.dumps(value), ttl=self.ttl)
+            return value
+        finally:
+            if locked:
+                await self.backend.delete(lock_key)
+
+
+class StatsCache:
+    """
+    TTL cache in front of the stats aggregation.
+    Concurrent misses share one in-flight load; `invalidate` can be
+    subscribed to a ChangeFeed to drop the value as soon as data changes.
+    With a shared `backend` the value is kept only in the backend, so the
+    load is shared between workers and an invalidation by one worker
+    reaches all of them.
+    """
+
+    def __init__(self, loader, ttl=30.0, backend=None, key="stats"):
+        self.loader = loader
+        self.ttl = ttl
+        self.key = key
+        self.hits = 0
+        self.misses = 0
+        self._value = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._loads = 0
+        self._shared = backend is not None and backend.shared
+        if self._shared:
+            self._flight = SharedSingleFlight(backend, ttl)
+        else:
+            self._flight = SingleFlight()
+
+    async def get(self):
+        """Return cached stats or load them."""
+        if self._shared:
+            loads = self._loads
+            value = await self._flight.do(self.key, self._load)
+            if self._loads == loads:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return value
+
+        if self._value is not None and time.monotonic() < self._expires_at:
+            self.hits += 1
+            return self._value
+        self.misses += 1
+        return await self._flight.do(self.key, self._load)
+
+    def invalidate(self, change=None):
+        """Drop the cached value (signature matches ChangeFeed callbacks)."""
+        self._generation += 1
+        self._value = None
+        if self._shared:
+            asyncio.ensure_future(self._flight.forget(self.key))
+
+    async def _load(self):
+        self._loads += 1
+        generation = self._generation
+        value = await self.loader()
+        self._remember(value, generation)
+        return value
+
+    def _remember(self, value, generation):
+        # Do not cache a result that raced with an invalidation; shared
+        # values are cached by the backend only
+        if self._shared:
+            return
+        if value is not None and self.ttl > 0 and generation == self._generation:
+            self._value = value
+            self._expires_at = time.monotonic() + self.ttl
@@ -0,0 +1,155 @@
+"""Collection change notifications for in-process caches and indexes."""
+import asyncio
+import logging
+import uuid
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from src.db.async_queries import get_mongo_collection, get_collection_watermark
+from src.db.queries import get_collection_watermark as get_collection_watermark_sync
+from src.db.runner import run_query
+
+logger = logging.getLogger(__name__)
+
+# Retry delay after the change stream drops (network blip, failover)
+RECONNECT_DELAY = 5.0
+
+
+class ChangeFeed:
+    """
+    Watch a collection and notify subscribers when it changes.
+
+    In "change_stream" mode subscribers receive each change event document.
+    In "poll" mode (or when the server does not support change streams, e.g.
+    a standalone mongod) the collection watermark is polled and subscribers
+    receive None, meaning "something changed, details unknown".
+    """
+
+    def __init__(self, connection_string, database_name, collection_name,
+                 mode="change_stream", poll_interval=5.0):
+        self.connection_string = connection_string
+        self.database_name = database_name
+        self.collection_name = collection_name
+        self.mode = mode
+        self.poll_interval = poll_interval
+        # Incremented on every notification; usable as a cheap cache key
+        self.version = 0
+        self._subscribers = []
+        self._task = None
+
+    def subscribe(self, callback):
+        """Register `callback(change)`; change is an event dict or None."""
+        self._subscribers.append(callback)
+
+    @property
+    def running(self):
+        """Whether the watcher task is alive."""
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start watching in a background task."""
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop watching."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _notify(self, change):
+        self.version += 1
+        for callback in self._subscribers:
+            try:
+                callback(change)
+            except Exception as e:
+                logger.error(f"Change subscriber error: {e}", exc_info=True)
+
+    async def _run(self):
+        if self.mode == "change_stream":
+            try:
+                await self._watch()
+                return
+            except OperationFailure as e:
+                logger.warning(f"Change streams unavailable ({e}), falling back to polling")
+        await self._poll()
+
+    async def _watch(self):
+        collection = get_mongo_collection(self.connection_string, self.database_name, self.collection_name)
+        resume_token = None
+        while True:
+            try:
+                async with await collection.watch(
+                    full_document="updateLookup", resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self._notify(change)
+            except OperationFailure:
+                if resume_token is None:
+                    raise
+                # Resume token may have fallen off the oplog; start fresh and
+                # tell subscribers they missed events.
+                resume_token = None
+                self._notify(None)
+            except PyMongoError as e:
+                logger.warning(f"Change stream error: {e}, reconnecting")
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _poll(self):
+        last = await get_collection_watermark(self.connection_string, self.database_name, self.collection_name)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = await get_collection_watermark(self.connection_string, self.database_name, self.collection_name)
+            if current is not None and current != last:
+                last = current
+                self._notify(None)
+
+
+class SharedChangeMarker:
+    """
+    Collection-wide change marker kept in the shared state backend.
+
+    Every worker's ChangeFeed sets it on each notification: to the event's
+    clusterTime, which is the same in every worker, or to a fresh value for
+    unknown changes. All workers therefore read the same marker, and unlike
+    the watermark it also moves on updates.
+    """
+
+    def __init__(self, backend, key):
+        self.backend = backend
+        self.key = key
+        self._tasks = set()
+
+    def apply(self, change):
+        """ChangeFeed subscriber."""
+        if change is not None and change.get("clusterTime") is not None:
+            marker = str(change["clusterTime"])
+        else:
+            marker = uuid.uuid4().hex
+        task = asyncio.create_task(self.backend.set(self.key, marker))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get(self):
+        return await self.backend.get(self.key)
+
+
+async def collection_version(change_marker, connection_string, database_name, collection_name):
+    """
+    Hashable marker that changes whenever the collection does, equal in
+    every worker: the count/max-_id watermark (inserts and deletes) plus
+    the shared change marker when a change feed is running (updates).
+    None if the watermark cannot be read.
+    """
+    watermark = await run_query(get_collection_watermark_sync, connection_string, database_name, collection_name)
+    if watermark is None:
+        return None
+    marker = await change_marker.get() if change_marker is not None else None
+    return (watermark, marker)
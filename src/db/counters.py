@@ -0,0 +1,151 @@
+"""Incrementally maintained registration stats."""
+import asyncio
+import logging
+
+from src.db.queries import count_members
+
+logger = logging.getLogger(__name__)
+
+
+class StatsCounter:
+    """
+    In-process `total_teams`/`total_members` kept current from change events.
+
+    The counter holds an `_id -> member count` map so deletes and updates
+    can be applied without a pre-image. That map grows with the collection
+    (roughly 150 bytes per team), so it is capped at `max_teams`: beyond
+    that the counter switches itself off and /stats falls back to the
+    cached aggregation. It is rebuilt from a full projection scan on
+    startup and every `reconcile_interval` seconds; events that arrive
+    while a rebuild is running are replayed on top of it.
+    """
+
+    def __init__(self, loader, reconcile_interval=3600.0, max_teams=0):
+        self.loader = loader
+        self.reconcile_interval = reconcile_interval
+        self.max_teams = max_teams
+        self.total_members = 0
+        self.ready = False
+        self.overflowed = False
+        self._members_by_id = {}
+        self._pending = None
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._reconcile_task = None
+
+    @property
+    def total_teams(self):
+        return len(self._members_by_id)
+
+    def snapshot(self):
+        """Current stats in the same shape as `get_stats`, or None if not ready."""
+        if not self.ready or self.overflowed:
+            return None
+        return {"total_teams": self.total_teams, "total_members": self.total_members}
+
+    def apply(self, change):
+        """Apply a ChangeFeed event (signature matches ChangeFeed callbacks)."""
+        if self._pending is not None:
+            self._pending.append(change)
+            return
+        if self.overflowed:
+            return
+
+        if change is None:
+            # Details unknown (poll mode or missed events): rebuild, once
+            if self._reconcile_task is None or self._reconcile_task.done():
+                self._reconcile_task = asyncio.get_running_loop().create_task(self.reconcile())
+            return
+
+        operation = change.get("operationType")
+        if operation in ("insert", "replace", "update"):
+            document = change.get("fullDocument")
+            if document is not None:
+                self._set(document["_id"], count_members(document))
+        elif operation == "delete":
+            self._remove(change["documentKey"]["_id"])
+        elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            self._members_by_id = {}
+            self.total_members = 0
+
+    async def reconcile(self):
+        """
+        Rebuild from a full scan. Returns the drift that was corrected as
+        `{"total_teams": delta, "total_members": delta}`, or None on failure.
+        """
+        async with self._lock:
+            self._pending = []
+            try:
+                members_by_id = await self.loader()
+            except Exception:
+                members_by_id = None
+
+            pending, self._pending = self._pending, None
+            if members_by_id is None:
+                for change in pending:
+                    if change is not None:
+                        self.apply(change)
+                logger.error("Stats counter reconcile failed")
+                return None
+
+            if self.max_teams and len(members_by_id) > self.max_teams:
+                self._overflow()
+                return None
+
+            before = (self.total_teams, self.total_members)
+            self._members_by_id = members_by_id
+            self.total_members = sum(members_by_id.values())
+            for change in pending:
+                if change is not None:
+                    self.apply(change)
+
+            was_ready, self.ready = self.ready, True
+            drift = {
+                "total_teams": self.total_teams - before[0],
+                "total_members": self.total_members - before[1]
+            }
+            if was_ready and any(drift.values()):
+                logger.warning(f"Stats counter drift corrected: {drift}")
+            return drift
+
+    async def start(self):
+        """Run the initial rebuild and schedule periodic reconciliation."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop periodic reconciliation."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._reconcile_task is not None:
+            self._reconcile_task.cancel()
+            self._reconcile_task = None
+
+    async def _run(self):
+        while not self.overflowed:
+            await self.reconcile()
+            await asyncio.sleep(self.reconcile_interval)
+
+    def _overflow(self):
+        """Drop the map for good once the collection outgrows `max_teams`."""
+        if not self.overflowed:
+            logger.warning(f"Stats counter disabled: more than {self.max_teams} teams")
+        self.overflowed = True
+        self.ready = False
+        self._members_by_id = {}
+        self.total_members = 0
+
+    def _set(self, doc_id, count):
+        self.total_members += count - self._members_by_id.get(doc_id, 0)
+        self._members_by_id[doc_id] = count
+        if self.max_teams and len(self._members_by_id) > self.max_teams:
+            self._overflow()
+
+    def _remove(self, doc_id):
+        self.total_members -= self._members_by_id.pop(doc_id, 0)
@@ -0,0 +1,309 @@
+"""
+Registrations export engine: CSV, gzip CSV, Parquet and XLSX with
+server-side projection and date filters.
+
+Parquet needs `pyarrow` and XLSX needs `openpyxl`; both are optional and
+imported only when that format is requested.
+"""
+import gzip
+import importlib.util
+import logging
+import re
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import bson
+from bson import ObjectId
+
+from src.db.queries import EXPORT_SPOOL_MAX_SIZE, CsvStreamBuilder, get_mongo_collection
+
+logger = logging.getLogger(__name__)
+
+# Format name -> (file extension, optional module it needs)
+EXPORT_FORMATS = {
+    "csv": ("csv", None),
+    "gz": ("csv.gz", None),
+    "parquet": ("parquet", "pyarrow"),
+    "xlsx": ("xlsx", "openpyxl"),
+}
+FORMAT_ALIASES = {"csv.gz": "gz", "gzip": "gz", "arrow": "parquet", "excel": "xlsx"}
+
+# Returned by export_collection when the export failed, as opposed to None
+# for "nothing matched", so delta exports can tell the two apart
+EXPORT_FAILED = object()
+
+FIELD_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+DATE_FORMAT = "%Y-%m-%d"
+
+EXPORT_USAGE = (
+    "Usage: /registrations [new] [csv|gz|parquet|xlsx] [field1,field2,...] "
+    "[since=YYYY-MM-DD] [until=YYYY-MM-DD]"
+)
+
+
+def format_available(fmt):
+    """Whether the optional library for `fmt` is installed."""
+    module = EXPORT_FORMATS[fmt][1]
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+class ExportOptions:
+    """
+    Format, projected fields and registration date range of one export.
+    `after_id`/`upto_id` bound a delta export by `_id`; with
+    `updated_field` documents changed after `updated_after` are included
+    as well.
+    """
+
+    def __init__(self, fmt="csv", fields=None, since=None, until=None,
+                 after_id=None, upto_id=None, updated_field=None, updated_after=None):
+        self.format = fmt
+        self.fields = tuple(fields) if fields else ()
+        self.since = since
+        self.until = until
+        self.after_id = after_id
+        self.upto_id = upto_id
+        self.updated_field = updated_field
+        self.updated_after = updated_after
+
+    @property
+    def extension(self):
+        return EXPORT_FORMATS[self.format][0]
+
+    @property
+    def is_default(self):
+        """Plain CSV of every document (served by the original export path)."""
+        return (self.format == "csv" and not self.fields
+                and self.since is None and self.until is None
+                and self.after_id is None and self.upto_id is None)
+
+    def key(self):
+        """Stable string identifying the export, for caches."""
+        dates = [d.strftime(DATE_FORMAT) if d else "" for d in (self.since, self.until)]
+        ids = [str(i) if i else "" for i in (self.after_id, self.upto_id)]
+        return f"{self.format}:{','.join(self.fields)}:{dates[0]}:{dates[1]}:{ids[0]}:{ids[1]}"
+
+    def query(self):
+        """
+        `(filter, projection)` for the find. Dates filter on the `_id`
+        creation time, so the range is served by the `_id` index.
+        """
+        id_range = {}
+        if self.since:
+            id_range["$gte"] = ObjectId.from_datetime(self.since)
+        if self.until:
+            # `until` is inclusive: everything before the next midnight
+            id_range["$lt"] = ObjectId.from_datetime(self.until + timedelta(days=1))
+        if self.after_id is not None:
+            id_range["$gt"] = self.after_id
+        if self.upto_id is not None:
+            id_range["$lte"] = self.upto_id
+        query = {"_id": id_range} if id_range else {}
+
+        if self.updated_field and self.updated_after is not None:
+            # Index union: new documents by _id, changed ones by the update time
+            changed = {self.updated_field: {"$gt": self.updated_after}}
+            query = {"$or": [query, changed]}
+
+        projection = {"_id": 0}
+        projection.update({field: 1 for field in self.fields})
+        return query, projection
+
+
+def parse_export_args(args, default_format="csv"):
+    """
+    Parse /registrations arguments, e.g. `["xlsx", "teamName,member1Name",
+    "since=2025-01-31"]`. Raises ValueError with a user-facing message.
+    """
+    fmt = default_format
+    fields = []
+    since = until = None
+
+    for arg in args:
+        lowered = arg.lower()
+        name = FORMAT_ALIASES.get(lowered, lowered)
+        if name in EXPORT_FORMATS:
+            fmt = name
+        elif "=" in arg:
+            key, _, value = arg.partition("=")
+            if key.lower() not in ("since", "until"):
+                raise ValueError(f"Unknown option '{key}'.\n{EXPORT_USAGE}")
+            try:
+                date = datetime.strptime(value, DATE_FORMAT).replace(tzinfo=timezone.utc)
+            except ValueError:
+                raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD.") from None
+            if key.lower() == "since":
+                since = date
+            else:
+                until = date
+        else:
+            for field in filter(None, arg.split(",")):
+                if not FIELD_PATTERN.match(field):
+                    raise ValueError(f"Invalid field name '{field}'.\n{EXPORT_USAGE}")
+                if field not in fields:
+                    fields.append(field)
+
+    if not format_available(fmt):
+        raise ValueError(f"{fmt} export is not available on this server.")
+    return ExportOptions(fmt, fields, since, until)
+
+
+def value_kind(value):
+    """Column type of one value: bool, int, float, datetime or string."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, datetime):
+        return "datetime"
+    return "string"
+
+
+class ColumnBuffer:
+    """
+    Values of one column plus its inferred type. Mixed int/float columns
+    widen to float; any other mix falls back to string.
+    """
+
+    def __init__(self, name, padding=0):
+        self.name = name
+        self.kind = None
+        self.values = [None] * padding
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+        if value is not None:
+            kind = value_kind(value)
+            if self.kind is None:
+                self.kind = kind
+            elif kind != self.kind:
+                self.kind = "float" if {kind, self.kind} == {"int", "float"} else "string"
+        self.values.append(value)
+
+    def typed_values(self):
+        """Values converted to the column type (None stays None)."""
+        if self.kind == "string":
+            return [None if v is None else str(v) for v in self.values]
+        if self.kind == "float":
+            return [None if v is None else float(v) for v in self.values]
+        return self.values
+
+
+class ColumnarTable:
+    """
+    Documents decoded batch by batch into per-column buffers. Columns are
+    discovered in first-seen order; rows missing a field get None.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.rows = 0
+
+    def add_batch(self, docs):
+        columns = self.columns
+        for doc in docs:
+            for key, value in doc.items():
+                column = columns.get(key)
+                if column is None:
+                    column = columns[key] = ColumnBuffer(key, self.rows)
+                column.append(value)
+            self.rows += 1
+            if len(doc) < len(columns):
+                for column in columns.values():
+                    if len(column) < self.rows:
+                        column.append(None)
+
+
+def read_table(collection, options, batch_size):
+    """Fetch the export into a ColumnarTable using raw BSON cursor batches."""
+    query, projection = options.query()
+    table = ColumnarTable()
+    for batch in collection.find_raw_batches(query, projection, batch_size=batch_size):
+        table.add_batch(bson.decode_all(batch))
+    return table
+
+
+def new_export_buffer():
+    return tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE, mode="w+b")
+
+
+def write_parquet(table, output):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"bool": pa.bool_(), "int": pa.int64(), "float": pa.float64(),
+             "datetime": pa.timestamp("ms"), "string": pa.string(), None: pa.string()}
+    arrays = [pa.array(column.typed_values(), type=types[column.kind])
+              for column in table.columns.values()]
+    pq.write_table(pa.Table.from_arrays(arrays, names=list(table.columns)), output,
+                   compression="zstd")
+
+
+def write_xlsx(table, output):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("registrations")
+    sheet.append(list(table.columns))
+    for row in zip(*(column.typed_values() for column in table.columns.values())):
+        sheet.append(row)
+    workbook.save(output)
+
+
+def write_csv(collection, options, batch_size, output, compress):
+    """Stream rows through CsvStreamBuilder; optionally gzip the result."""
+    query, projection = options.query()
+    builder = CsvStreamBuilder()
+    try:
+        for doc in collection.find(query, projection, batch_size=batch_size):
+            builder.add(doc)
+    except Exception:
+        builder.close()
+        raise
+    csv_file = builder.finish()
+    if csv_file is None:
+        return False
+    with csv_file:
+        if compress:
+            with gzip.GzipFile(fileobj=output, mode="wb", compresslevel=6) as gz:
+                shutil.copyfileobj(csv_file, gz)
+        else:
+            shutil.copyfileobj(csv_file, output)
+    return True
+
+
+def export_collection(connection_string, database_name, collection_name, options, batch_size=1000):
+    """
+    Export the documents selected by `options` in its format. Returns a
+    binary file object positioned at the start, None if nothing matched, or
+    EXPORT_FAILED on error.
+    """
+    output = new_export_buffer()
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+
+        if options.format in ("csv", "gz"):
+            written = write_csv(collection, options, batch_size, output, options.format == "gz")
+        else:
+            table = read_table(collection, options, batch_size)
+            written = table.rows > 0
+            if written:
+                writer = write_parquet if options.format == "parquet" else write_xlsx
+                writer(table, output)
+
+        if not written:
+            logger.info("No documents found.")
+            output.close()
+            return None
+        output.seek(0)
+        return output
+
+    except Exception as e:
+        logger.error(f"{options.format} export error: {e}")
+        output.close()
+        return EXPORT_FAILED
@@ -0,0 +1,184 @@
+"""
+Bulk registration import: stream CSV or JSON rows, validate them against
+the registration schema and upsert them by team name with `bulk_write`.
+"""
+import csv
+import io
+import json
+import time
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src.db.queries import MEMBER_FIELDS, TEAM_NAME_COLLATION, get_mongo_collection
+
+REGISTRATION_FIELDS = ("teamName",) + MEMBER_FIELDS + ("transactionId",)
+REQUIRED_FIELDS = ("teamName", "member1Name")
+MAX_FIELD_LENGTH = 200
+
+
+class ImportResult:
+    """Counters and per-row errors of one import."""
+
+    def __init__(self):
+        self.rows = 0
+        self.valid = 0
+        self.upserted = 0
+        self.modified = 0
+        self.matched = 0
+        self.errors = []  # (row number, message)
+        self.stopped = False
+
+    def summary(self):
+        lines = [
+            f"Rows read: {self.rows}",
+            f"Valid rows: {self.valid}",
+            f"New teams: {self.upserted}",
+            f"Updated teams: {self.modified}",
+            f"Unchanged teams: {self.matched - self.modified}",
+            f"Errors: {len(self.errors)}",
+        ]
+        if self.stopped:
+            lines.append("Import stopped early; later rows were not applied.")
+        return "\n".join(lines)
+
+
+def validate_row(row):
+    """
+    Check one row against the registration schema. Returns `(set, unset)`
+    field dicts, or raises ValueError. Empty optional fields are unset, so
+    a correction can remove a member.
+    """
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+    if None in row:
+        # csv.DictReader puts cells beyond the header under None
+        raise ValueError("more values than header columns")
+    unknown = [key for key in row if key not in REGISTRATION_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(map(str, unknown))}")
+
+    to_set, to_unset = {}, {}
+    for field in REGISTRATION_FIELDS:
+        if field not in row:
+            continue
+        value = row[field]
+        if value is None:
+            value = ""
+        if not isinstance(value, (str, int)) or isinstance(value, bool):
+            raise ValueError(f"{field} must be text")
+        value = str(value).strip()
+        if len(value) > MAX_FIELD_LENGTH:
+            raise ValueError(f"{field} is longer than {MAX_FIELD_LENGTH} characters")
+        if value:
+            to_set[field] = value
+        else:
+            to_unset[field] = ""
+
+    for field in REQUIRED_FIELDS:
+        if field not in to_set:
+            raise ValueError(f"{field} is required")
+    return to_set, to_unset
+
+
+def iter_rows(fileobj, fmt):
+    """
+    Yield rows from a binary file: CSV with a header line, a JSON array, or
+    JSON lines. Only JSON arrays are parsed in one go.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        yield from csv.DictReader(text)
+        return
+
+    first = text.read(1)
+    while first and first.isspace():
+        first = text.read(1)
+    if first == "[":
+        rows = json.loads(first + text.read())
+        yield from rows
+        return
+
+    pending = first
+    for line in text:
+        line = pending + line
+        pending = ""
+        if line.strip():
+            yield json.loads(line)
+
+
+def import_registrations(connection_string, database_name, collection_name, fileobj, fmt,
+                         ordered=False, batch_size=1000, progress=None, progress_interval=2.0):
+    """
+    Upsert rows from `fileobj` ("csv" or "json") keyed on teamName (case
+    insensitive, served by the collation index). Writes go out in
+    `bulk_write` batches; ordered imports stop at the first write error,
+    and any import stops when a whole batch fails (e.g. connection lost).
+    The result always holds what was applied before that.
+    `progress(result)` is called at most every `progress_interval` seconds.
+    """
+    result = ImportResult()
+    collection = get_mongo_collection(connection_string, database_name, collection_name)
+    operations, row_numbers = [], []
+    last_report = time.monotonic()
+
+    def flush():
+        try:
+            outcome = collection.bulk_write(operations, ordered=ordered)
+            details = outcome.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for error in details.get("writeErrors", []):
+                result.errors.append((row_numbers[error["index"]], error.get("errmsg", "write error")))
+            if ordered:
+                result.stopped = True
+        except Exception as e:
+            # Nothing reliable is known about this batch; stop here
+            result.errors.append((row_numbers[0], f"batch of {len(operations)} rows failed: {e}"))
+            result.stopped = True
+            details = {}
+        result.upserted += details.get("nUpserted", 0)
+        result.matched += details.get("nMatched", 0)
+        result.modified += details.get("nModified", 0)
+        operations.clear()
+        row_numbers.clear()
+
+    try:
+        # Row 1 is the CSV header; JSON rows are numbered from 1
+        first_row = 2 if fmt == "csv" else 1
+        for number, row in enumerate(iter_rows(fileobj, fmt), start=first_row):
+            result.rows += 1
+            try:
+                to_set, to_unset = validate_row(row)
+            except ValueError as e:
+                result.errors.append((number, str(e)))
+                continue
+
+            result.valid += 1
+            update = {"$set": to_set}
+            if to_unset:
+                update["$unset"] = to_unset
+            operations.append(UpdateOne(
+                {"teamName": to_set["teamName"]}, update, upsert=True, collation=TEAM_NAME_COLLATION
+            ))
+            row_numbers.append(number)
+
+            if len(operations) >= batch_size:
+                flush()
+                if result.stopped:
+                    return result
+            if progress is not None and time.monotonic() - last_report >= progress_interval:
+                progress(result)
+                last_report = time.monotonic()
+
+        if operations:
+            flush()
+
+    except (csv.Error, json.JSONDecodeError, UnicodeDecodeError) as e:
+        result.errors.append((result.rows + 1, f"unreadable file: {e}"))
+        result.stopped = True
+        # Rows read before the damage are still applied
+        if operations:
+            flush()
+
+    return result
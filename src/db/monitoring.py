@@ -0,0 +1,77 @@
+"""pymongo monitoring listeners feeding the metrics registry and command logs."""
+from pymongo import monitoring
+
+from src.logs import add_mongo_command
+from src.metrics import REGISTRY
+
+MONGO_COMMAND_LATENCY = REGISTRY.histogram(
+    "mongo_command_seconds", "MongoDB command round-trip time.", ["command"])
+MONGO_COMMAND_FAILURES = REGISTRY.counter(
+    "mongo_command_failures_total", "Failed MongoDB commands.", ["command"])
+MONGO_CONNECTIONS = REGISTRY.gauge(
+    "mongo_pool_connections", "Open pooled MongoDB connections.", ["client"])
+MONGO_CHECKED_OUT = REGISTRY.gauge(
+    "mongo_pool_checked_out", "Pooled MongoDB connections currently in use.", ["client"])
+MONGO_CHECKOUT_FAILURES = REGISTRY.counter(
+    "mongo_pool_checkout_failures_total", "Connection check-outs that failed.", ["client", "reason"])
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Command latency per command name."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
+        add_mongo_command(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
+        MONGO_COMMAND_FAILURES.inc(command=event.command_name)
+        add_mongo_command(event.duration_micros / 1e6)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Connection counts for one client ("sync" or "async")."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        MONGO_CONNECTIONS.inc(client=self.client)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_CONNECTIONS.dec(client=self.client)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        MONGO_CHECKOUT_FAILURES.inc(client=self.client, reason=str(event.reason))
+
+    def connection_checked_out(self, event):
+        MONGO_CHECKED_OUT.inc(client=self.client)
+
+    def connection_checked_in(self, event):
+        MONGO_CHECKED_OUT.dec(client=self.client)
+
+
+def mongo_listeners(client):
+    """Listeners to pass as `event_listeners` when creating a client."""
+    return [CommandMetricsListener(), PoolMetricsListener(client)]
@@ -1,21 +1,95 @@
 """Database query functions for MongoDB operations."""
+import logging
 import os
-import pandas as pd
-from pymongo import MongoClient
+import csv
+import io
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pymongo import DeleteOne, MongoClient, ReplaceOne
+from pymongo.collation import Collation
 import certifi
-import re
+
+from src.config import Config
+from src.db.monitoring import mongo_listeners
+
+logger = logging.getLogger(__name__)
 
 _client = None
 
+MEMBER_FIELDS = ("member1Name", "member2Name", "member3Name", "member4Name")
+
+# Case-insensitive comparison (strength 2 ignores case, keeps diacritics)
+TEAM_NAME_COLLATION = Collation(locale="en", strength=2)
+TEAM_NAME_INDEX = "teamName_ci"
+# Binary-order (teamName, _id) index backing keyset pagination
+TEAM_PAGE_INDEX = "teamName_id"
+
+# Suffix of the collection holding per-chat delta export watermarks
+EXPORT_WATERMARKS_SUFFIX = "_exportWatermarks"
+
+# Suffix of the collection persisting per-chat conversation state
+CONVERSATIONS_SUFFIX = "_conversations"
+
+# Rows are spooled in memory up to this size before spilling to a temp file
+EXPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def mongo_client_options():
+    """Pool sizing, timeouts and compression settings from Config."""
+    options = {
+        "maxPoolSize": Config.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": Config.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": Config.MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": Config.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": Config.MONGO_SOCKET_TIMEOUT_MS or None,
+        "waitQueueTimeoutMS": Config.MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+    }
+    if Config.MONGO_COMPRESSORS:
+        options["compressors"] = Config.MONGO_COMPRESSORS
+    return options
+
 
 def get_mongo_client(connection_string):
     """Create or reuse global MongoDB client (connection pooling)."""
     global _client
     if _client is None:
-        _client = MongoClient(connection_string, tlsCAFile=certifi.where())
+        _client = MongoClient(
+            connection_string, tlsCAFile=certifi.where(),
+            event_listeners=mongo_listeners("sync"),
+            **mongo_client_options()
+        )
     return _client
 
 
+def warm_mongo_client(connection_string, connections=0):
+    """
+    Connect and ping now instead of on the first user request (DNS SRV
+    lookup, TLS handshake, server selection). With `connections` > 0 that
+    many pings run concurrently so the pool holds that many open sockets.
+    """
+    try:
+        client = get_mongo_client(connection_string)
+        client.admin.command("ping")
+        if connections > 1:
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                list(executor.map(lambda _: client.admin.command("ping"), range(connections)))
+        return True
+
+    except Exception as e:
+        logger.error(f"MongoDB warm-up error: {e}")
+        return False
+
+
+def close_mongo_client():
+    """Close the global client and its pooled connections."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
 def get_mongo_collection(connection_string, database_name, collection_name):
     """Get MongoDB collection."""
     client = get_mongo_client(connection_string)
@@ -24,26 +98,121 @@ def get_mongo_collection(connection_string, database_name, collection_name):
 
 
 def export_mongo_collection_to_csv(connection_string, database_name, collection_name, output_file="registrations.csv"):
-    """Export entire collection into a CSV file."""
+    """Export entire collection into a CSV file path or binary file object."""
     try:
         collection = get_mongo_collection(connection_string, database_name, collection_name)
         data = list(collection.find({}))
 
         if not data:
-            print("No documents found.")
+            logger.info("No documents found.")
             return None
 
+        # Imported here: pandas adds ~0.5s to startup and only this path uses it
+        import pandas as pd
+
         df = pd.DataFrame(data)
 
         # Remove MongoDB ObjectId for CSV
         if "_id" in df.columns:
             df.drop(columns=["_id"], inplace=True)
 
-        df.to_csv(output_file, index=False)
+        mode = "w" if isinstance(output_file, (str, os.PathLike)) else "wb"
+        df.to_csv(output_file, index=False, mode=mode, encoding="utf-8")
         return output_file
 
     except Exception as e:
-        print(f"CSV export error: {e}")
+        logger.error(f"CSV export error: {e}")
+        return None
+
+
+class CsvStreamBuilder:
+    """
+    Incrementally encode documents into a CSV buffer.
+    Columns are discovered as documents arrive, in first-seen order (same as
+    the pandas export). Rows are spooled in memory up to
+    EXPORT_SPOOL_MAX_SIZE and spill to a temp file beyond that.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self._body = tempfile.SpooledTemporaryFile(
+            max_size=EXPORT_SPOOL_MAX_SIZE, mode="w+", newline="", encoding="utf-8"
+        )
+        self._writer = csv.writer(self._body)
+
+    def add(self, doc):
+        """Append one document as a CSV row."""
+        columns = self.columns
+        for key in doc:
+            if key not in columns:
+                columns[key] = len(columns)
+        row = [""] * len(columns)
+        for key, value in doc.items():
+            row[columns[key]] = "" if value is None else value
+        self._writer.writerow(row)
+
+    def extend(self, docs):
+        """Append a batch of documents (one thread hop per batch for async callers)."""
+        for doc in docs:
+            self.add(doc)
+
+    def finish(self):
+        """
+        Return a binary file object with header and rows, positioned at the
+        start, or None if no documents were added.
+        """
+        try:
+            if not self.columns:
+                return None
+
+            # Rows written before a column was discovered are shorter than
+            # the header, so pad them while copying behind the header.
+            width = len(self.columns)
+            output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE, mode="w+b")
+            text_output = io.TextIOWrapper(output, encoding="utf-8", newline="", write_through=True)
+            writer = csv.writer(text_output)
+            writer.writerow(list(self.columns))
+
+            self._body.seek(0)
+            for row in csv.reader(self._body):
+                if len(row) < width:
+                    row.extend([""] * (width - len(row)))
+                writer.writerow(row)
+
+            text_output.flush()
+            text_output.detach()
+            output.seek(0)
+            return output
+        finally:
+            self.close()
+
+    def close(self):
+        """Release the intermediate row buffer."""
+        self._body.close()
+
+
+def stream_collection_to_csv(connection_string, database_name, collection_name, batch_size=1000):
+    """
+    Stream entire collection into a CSV buffer, batch by batch, without `_id`.
+    Returns a binary file object positioned at the start, or None if the
+    collection is empty.
+    """
+    builder = CsvStreamBuilder()
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        cursor = collection.find({}, {"_id": 0}, batch_size=batch_size)
+
+        for doc in cursor:
+            builder.add(doc)
+
+        output = builder.finish()
+        if output is None:
+            logger.info("No documents found.")
+        return output
+
+    except Exception as e:
+        logger.error(f"CSV stream export error: {e}")
+        builder.close()
         return None
 
 
@@ -86,26 +255,86 @@ def get_stats(connection_string, database_name, collection_name):
         return {"total_teams": 0, "total_members": 0}
 
     except Exception as e:
-        print(f"Stats error: {e}")
+        logger.error(f"Stats error: {e}")
         return None
 
 
+def ensure_indexes(connection_string, database_name, collection_name):
+    """Create the indexes the bot queries rely on (no-op if they exist)."""
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        collection.create_index(
+            [("teamName", 1)], name=TEAM_NAME_INDEX, collation=TEAM_NAME_COLLATION
+        )
+        collection.create_index([("teamName", 1), ("_id", 1)], name=TEAM_PAGE_INDEX)
+        if Config.EXPORT_UPDATED_FIELD:
+            # Range scans for `/registrations new` on changed documents
+            collection.create_index([(Config.EXPORT_UPDATED_FIELD, 1)])
+        return True
+
+    except Exception as e:
+        logger.error(f"Index creation error: {e}")
+        return False
+
+
 def find_team_by_name(connection_string, database_name, collection_name, team_name):
-    """Case-insensitive safe match using regex."""
+    """Case-insensitive exact match served by the collation index."""
     try:
         if not team_name:
             return None
 
         collection = get_mongo_collection(connection_string, database_name, collection_name)
-        safe_name = re.escape(team_name.strip())
-
-        query = {"teamName": {"$regex": f"^{safe_name}$", "$options": "i"}}
-        result = collection.find_one(query)
+        query = {"teamName": team_name.strip()}
+        result = collection.find_one(query, collation=TEAM_NAME_COLLATION)
 
         return result
 
     except Exception as e:
-        print(f"Find error: {e}")
+        logger.error(f"Find error: {e}")
+        return None
+
+
+def count_members(doc):
+    """
+    Count filled member fields in a document, matching the `$cond`/`$ifNull`
+    test in the stats pipeline (null, missing, false and 0 do not count).
+    """
+    return sum(1 for field in MEMBER_FIELDS if doc.get(field) not in (None, False, 0))
+
+
+def get_member_counts(connection_string, database_name, collection_name, batch_size=1000):
+    """Map every document `_id` to its member count (projection-only scan)."""
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        projection = {field: 1 for field in MEMBER_FIELDS}
+        cursor = collection.find({}, projection, batch_size=batch_size)
+        return {doc["_id"]: count_members(doc) for doc in cursor}
+
+    except Exception as e:
+        logger.error(f"Member count error: {e}")
+        return None
+
+
+def find_team_by_id(connection_string, database_name, collection_name, team_id):
+    """Fetch a single team document by `_id`."""
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        return collection.find_one({"_id": team_id})
+
+    except Exception as e:
+        logger.error(f"Find by id error: {e}")
+        return None
+
+
+def get_team_names(connection_string, database_name, collection_name, batch_size=1000):
+    """List `(_id, teamName)` pairs for every document (projection-only scan)."""
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        cursor = collection.find({}, {"teamName": 1}, batch_size=batch_size)
+        return [(doc["_id"], doc.get("teamName")) for doc in cursor]
+
+    except Exception as e:
+        logger.error(f"Team name fetch error: {e}")
         return None
 
 
@@ -120,7 +349,7 @@ def get_team_transactions(connection_string, database_name, collection_name):
         return results
 
     except Exception as e:
-        print(f"Transaction fetch error: {e}")
+        logger.error(f"Transaction fetch error: {e}")
         return None
 
 
@@ -141,5 +370,163 @@ def get_teams_with_transaction_numbers(connection_string, database_name, collect
         return results
 
     except Exception as e:
-        print(f"Error fetching teams with transaction numbers: {e}")
+        logger.error(f"Error fetching teams with transaction numbers: {e}")
+        return None
+
+
+def build_transactions_page_query(after=None, before=None):
+    """
+    Keyset filter and sort for a transactions page.
+    `after`/`before` are `(teamName, _id)` of the last/first row already
+    shown. Only string team names are paged, so range comparisons stay
+    within one BSON type.
+    """
+    if after is not None:
+        name, doc_id = after
+        query = {"$or": [
+            {"teamName": {"$gt": name}},
+            {"teamName": name, "_id": {"$gt": doc_id}}
+        ]}
+        sort = [("teamName", 1), ("_id", 1)]
+    elif before is not None:
+        name, doc_id = before
+        query = {"$or": [
+            {"teamName": {"$lt": name, "$type": "string"}},
+            {"teamName": name, "_id": {"$lt": doc_id}}
+        ]}
+        sort = [("teamName", -1), ("_id", -1)]
+    else:
+        query = {"teamName": {"$type": "string"}}
+        sort = [("teamName", 1), ("_id", 1)]
+    return query, sort
+
+
+def make_transactions_page(rows, limit, after=None, before=None):
+    """Trim a `limit + 1` fetch into a page dict with navigation flags."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before is not None:
+        rows.reverse()
+        return {"items": rows, "has_prev": has_more, "has_next": True}
+    return {"items": rows, "has_prev": after is not None, "has_next": has_more}
+
+
+def get_transactions_page(connection_string, database_name, collection_name,
+                          after=None, before=None, limit=20):
+    """
+    Fetch one page of teamName/transactionId rows ordered by (teamName, _id)
+    with a keyset range query, so every page costs the same.
+    Returns `{"items", "has_prev", "has_next"}`.
+    """
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        query, sort = build_transactions_page_query(after, before)
+        cursor = collection.find(
+            query, {"teamName": 1, "transactionId": 1}
+        ).sort(sort).limit(limit + 1)
+
+        return make_transactions_page(list(cursor), limit, after, before)
+
+    except Exception as e:
+        logger.error(f"Transactions page error: {e}")
+        return None
+
+
+def get_collection_watermark(connection_string, database_name, collection_name):
+    """
+    Cheap change marker for the collection: (estimated document count, max _id).
+    Both values come from metadata or the _id index, so no collection scan.
+    """
+    try:
+        collection = get_mongo_collection(connection_string, database_name, collection_name)
+        count = collection.estimated_document_count()
+        latest = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        return (count, latest["_id"] if latest else None)
+
+    except Exception as e:
+        logger.error(f"Watermark error: {e}")
         return None
+
+
+def get_export_watermarks_collection(connection_string, database_name, collection_name):
+    """Per-chat `/registrations new` watermarks, next to the registrations."""
+    client = get_mongo_client(connection_string)
+    db = client.get_database(database_name)
+    return db.get_collection(f"{collection_name}{EXPORT_WATERMARKS_SUFFIX}")
+
+
+def get_export_watermark(connection_string, database_name, collection_name, chat_id):
+    """`{"lastId", "exportedAt"}` of the previous delta export to `chat_id`, or None."""
+    try:
+        watermarks = get_export_watermarks_collection(connection_string, database_name, collection_name)
+        return watermarks.find_one({"_id": chat_id})
+
+    except Exception as e:
+        logger.error(f"Export watermark error: {e}")
+        return None
+
+
+def set_export_watermark(connection_string, database_name, collection_name, chat_id, last_id, exported_at):
+    """Advance the watermark of `chat_id` (never moves back)."""
+    try:
+        watermarks = get_export_watermarks_collection(connection_string, database_name, collection_name)
+        watermarks.update_one(
+            {"_id": chat_id},
+            {"$max": {"lastId": last_id, "exportedAt": exported_at}},
+            upsert=True
+        )
+        return True
+
+    except Exception as e:
+        logger.error(f"Export watermark update error: {e}")
+        return False
+
+
+def get_conversations_collection(connection_string, database_name, collection_name):
+    """Persisted per-chat conversation state, next to the registrations."""
+    client = get_mongo_client(connection_string)
+    db = client.get_database(database_name)
+    return db.get_collection(f"{collection_name}{CONVERSATIONS_SUFFIX}")
+
+
+def load_conversations(connection_string, database_name, collection_name):
+    """Unexpired `(chat_id, state, data, expires_at)` tuples; ensures the TTL index."""
+    try:
+        conversations = get_conversations_collection(connection_string, database_name, collection_name)
+        # MongoDB removes documents once `expiresAt` has passed
+        conversations.create_index("expiresAt", expireAfterSeconds=0)
+        now = datetime.now(timezone.utc)
+        return [
+            (doc["_id"], doc["state"], doc.get("data"),
+             doc["expiresAt"].replace(tzinfo=timezone.utc).timestamp())
+            for doc in conversations.find({"expiresAt": {"$gt": now}})
+        ]
+
+    except Exception as e:
+        logger.error(f"Conversation load error: {e}")
+        return None
+
+
+def save_conversations(connection_string, database_name, collection_name, changes):
+    """Apply `{chat_id: (state, data, expires_at) or None}` in one bulk write."""
+    try:
+        conversations = get_conversations_collection(connection_string, database_name, collection_name)
+        operations = []
+        for chat_id, entry in changes.items():
+            if entry is None:
+                operations.append(DeleteOne({"_id": chat_id}))
+            else:
+                state, data, expires_at = entry
+                operations.append(ReplaceOne(
+                    {"_id": chat_id},
+                    {"state": state, "data": data,
+                     "expiresAt": datetime.fromtimestamp(expires_at, timezone.utc)},
+                    upsert=True
+                ))
+        if operations:
+            conversations.bulk_write(operations, ordered=False)
+        return True
+
+    except Exception as e:
+        logger.error(f"Conversation save error: {e}")
+        return False
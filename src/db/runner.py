@@ -0,0 +1,67 @@
+"""Dispatch query calls to the configured MongoDB data layer."""
+import asyncio
+import contextvars
+import time
+from contextvars import ContextVar
+
+from src.config import Config
+from src.db import async_queries, queries
+from src.metrics import EXECUTOR_WAIT, stage
+
+# Pool (with `name` and `executor`) for blocking queries; set by the
+# command scheduler while a handler holds a slot
+current_pool = ContextVar("current_pool", default=None)
+
+
+async def run_query(func, *args):
+    """
+    Run a function from `src.db.queries` on the configured driver.
+    With MONGO_DRIVER=async the same-named coroutine from
+    `src.db.async_queries` is awaited directly on the event loop;
+    otherwise (or if there is no async counterpart) the blocking call is
+    sent to the current command pool's executor, or the default one.
+    """
+    with stage("mongo"):
+        if Config.MONGO_DRIVER == "async":
+            async_func = getattr(async_queries, func.__name__, None)
+            if async_func is not None:
+                return await async_func(*args)
+
+        pool = current_pool.get()
+        executor = pool.executor if pool is not None else None
+        pool_name = pool.name if pool is not None else "default"
+        submitted = time.perf_counter()
+
+        def timed():
+            EXECUTOR_WAIT.observe(time.perf_counter() - submitted, pool=pool_name)
+            return func(*args)
+
+        # The thread sees the caller's context, so its logs and Mongo
+        # timings are attributed to the current command
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, context.run, timed)
+
+
+async def open_database(connection_string):
+    """
+    Warm the MongoDB client(s) the app will use, so the first request does
+    not pay for connection setup. The async client is also used by the
+    change feed.
+    """
+    loop = asyncio.get_running_loop()
+    ok = await loop.run_in_executor(
+        None, queries.warm_mongo_client, connection_string, Config.MONGO_WARM_CONNECTIONS
+    )
+    if Config.MONGO_DRIVER == "async" or Config.CHANGE_FEED_MODE in ("change_stream", "poll"):
+        ok = await async_queries.warm_mongo_client(
+            connection_string, Config.MONGO_WARM_CONNECTIONS
+        ) and ok
+    return ok
+
+
+async def close_database():
+    """Close MongoDB clients after in-flight work has drained."""
+    await async_queries.close_mongo_client()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, queries.close_mongo_client)
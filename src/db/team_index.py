@@ -0,0 +1,302 @@
+"""In-memory team name index with prefix and typo-tolerant search."""
+import asyncio
+import bisect
+import logging
+from collections import Counter, defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Longest prefix-match run scanned per query (keeps short prefixes cheap)
+MAX_PREFIX_SCAN = 200
+# Minimum trigram Dice similarity for a fuzzy match
+MIN_SIMILARITY = 0.35
+# Postings counted per fuzzy query; rarest trigrams are used first
+MAX_POSTINGS_SCAN = 1000
+
+
+def normalize_name(name):
+    """Case-fold and collapse whitespace for matching."""
+    return " ".join(str(name).casefold().split())
+
+
+def trigrams(text):
+    """Padded character trigrams of normalized text."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TeamNameIndex:
+    """
+    Search index over team names, mirroring the collection.
+
+    Lookups are served from memory: exact (case-insensitive) match, prefix
+    of the full name or of any word in it, then trigram similarity for
+    misspellings. Only the `_id` of the chosen team is needed to fetch its
+    full document from MongoDB. Built from a projection-only cursor and kept
+    fresh from ChangeFeed events, or by periodic rebuilds without a feed.
+    """
+
+    def __init__(self, loader, refresh_interval=0.0):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self.ready = False
+        self._clear()
+        self._pending = None
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._rebuild_task = None
+
+    def __len__(self):
+        return len(self._slot_by_id)
+
+    def _clear(self):
+        self._install(self._build([]))
+
+    def _install(self, state):
+        # One synchronous step, so lookups on the event loop never see a
+        # half-replaced index
+        self._next_slot = state["next_slot"]
+        self._slot_by_id = state["slot_by_id"]
+        self._entries = state["entries"]              # slot -> (_id, name, normalized)
+        self._by_normalized = state["by_normalized"]
+        self._prefixes = state["prefixes"]            # sorted (text, slot)
+        self._grams = state["grams"]                  # trigram -> slots
+
+    def add(self, doc_id, name):
+        """Insert or rename a team."""
+        if doc_id in self._slot_by_id:
+            self.remove(doc_id)
+        if not name:
+            return
+
+        slot = self._next_slot
+        self._next_slot += 1
+        normalized = normalize_name(name)
+        self._slot_by_id[doc_id] = slot
+        self._entries[slot] = (doc_id, name, normalized)
+        self._by_normalized[normalized].add(slot)
+
+        for text in self._prefix_texts(normalized):
+            bisect.insort(self._prefixes, (text, slot))
+
+        for gram in trigrams(normalized):
+            self._grams[gram].add(slot)
+
+    def remove(self, doc_id):
+        """Drop a team if present."""
+        slot = self._slot_by_id.pop(doc_id, None)
+        if slot is None:
+            return
+
+        _, _, normalized = self._entries.pop(slot)
+        self._by_normalized[normalized].discard(slot)
+        if not self._by_normalized[normalized]:
+            del self._by_normalized[normalized]
+
+        for text in self._prefix_texts(normalized):
+            i = bisect.bisect_left(self._prefixes, (text, slot))
+            if i < len(self._prefixes) and self._prefixes[i] == (text, slot):
+                del self._prefixes[i]
+
+        for gram in trigrams(normalized):
+            postings = self._grams[gram]
+            postings.discard(slot)
+            if not postings:
+                del self._grams[gram]
+
+    def load(self, names):
+        """Replace the contents with `(_id, teamName)` pairs."""
+        self._install(self._build(names))
+
+    @classmethod
+    def _build(cls, names):
+        """
+        Fresh index tables for `(_id, teamName)` pairs. Touches no shared
+        state, so rebuilds run it in a worker thread.
+        """
+        slot_by_id = {}
+        entries = {}
+        by_normalized = defaultdict(set)
+        grams = defaultdict(set)
+        prefixes = []
+        slot = 0
+        for doc_id, name in names:
+            if not name:
+                continue
+            normalized = normalize_name(name)
+            slot_by_id[doc_id] = slot
+            entries[slot] = (doc_id, name, normalized)
+            by_normalized[normalized].add(slot)
+            prefixes.extend((text, slot) for text in cls._prefix_texts(normalized))
+            for gram in trigrams(normalized):
+                grams[gram].add(slot)
+            slot += 1
+        # One sort instead of an insort per name
+        prefixes.sort()
+        return {
+            "next_slot": slot, "slot_by_id": slot_by_id, "entries": entries,
+            "by_normalized": by_normalized, "prefixes": prefixes, "grams": grams,
+        }
+
+    def search(self, query, limit=5):
+        """
+        Best matches for `query` as a list of `(_id, teamName, exact)`.
+        Exact matches win outright, otherwise prefix matches; trigram
+        similarity is only used when nothing matches by prefix.
+        """
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+
+        scores = {}
+        for slot in self._by_normalized.get(normalized, ()):
+            scores[slot] = 3.0
+        if scores:
+            return self._ranked(scores, limit)
+
+        i = bisect.bisect_left(self._prefixes, (normalized, -1))
+        end = min(i + MAX_PREFIX_SCAN, len(self._prefixes))
+        while i < end:
+            text, slot = self._prefixes[i]
+            if not text.startswith(normalized):
+                break
+            if slot not in scores:
+                full = self._entries[slot][2]
+                # Whole-name prefixes beat word prefixes; shorter names first
+                base = 2.5 if full.startswith(normalized) else 2.0
+                scores[slot] = base + len(normalized) / len(full) * 0.4
+            i += 1
+
+        if not scores:
+            self._score_fuzzy(normalized, scores, limit)
+
+        return self._ranked(scores, limit)
+
+    def _score_fuzzy(self, normalized, scores, limit):
+        grams = trigrams(normalized)
+        postings = sorted(
+            (self._grams[gram] for gram in grams if gram in self._grams), key=len
+        )
+
+        # Count candidates from the rarest trigrams only; common ones (digits,
+        # word boundaries) add cost without discriminating much.
+        shared = Counter()
+        budget = MAX_POSTINGS_SCAN
+        for slots in postings:
+            if shared and len(slots) > budget:
+                break
+            shared.update(slots)
+            budget -= len(slots)
+        if not shared:
+            return
+
+        # Only the best-overlapping candidates are worth an exact similarity
+        best = max(shared.values())
+        cutoff = max(1, best - 1)
+        candidates = [slot for slot, count in shared.items() if count >= cutoff]
+        if len(candidates) > limit * 4:
+            candidates.sort(key=shared.__getitem__, reverse=True)
+            del candidates[limit * 4:]
+
+        for slot in candidates:
+            if slot in scores:
+                continue
+            candidate = trigrams(self._entries[slot][2])
+            similarity = 2 * len(grams & candidate) / (len(grams) + len(candidate))
+            if similarity >= MIN_SIMILARITY:
+                scores[slot] = similarity
+
+    def _ranked(self, scores, limit):
+        best = sorted(scores.items(), key=lambda item: (-item[1], self._entries[item[0]][2]))[:limit]
+        return [
+            (self._entries[slot][0], self._entries[slot][1], score == 3.0)
+            for slot, score in best
+        ]
+
+    def apply(self, change):
+        """Apply a ChangeFeed event (signature matches ChangeFeed callbacks)."""
+        if self._pending is not None:
+            self._pending.append(change)
+            return
+
+        if change is None:
+            # Details unknown (poll mode or missed events): rebuild, once
+            if self._rebuild_task is None or self._rebuild_task.done():
+                self._rebuild_task = asyncio.get_running_loop().create_task(self.rebuild())
+            return
+
+        operation = change.get("operationType")
+        if operation in ("insert", "replace", "update"):
+            document = change.get("fullDocument")
+            if document is not None:
+                self.add(document["_id"], document.get("teamName"))
+        elif operation == "delete":
+            self.remove(change["documentKey"]["_id"])
+        elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            self._clear()
+
+    async def rebuild(self):
+        """
+        Reload all names and build the new tables in a worker thread, then
+        swap them in; events seen meanwhile are replayed on top.
+        """
+        async with self._lock:
+            self._pending = []
+            try:
+                names = await self.loader()
+            except Exception:
+                names = None
+
+            state = None
+            if names is not None:
+                try:
+                    state = await asyncio.to_thread(self._build, names)
+                except Exception as e:
+                    logger.error(f"Team name index build error: {e}")
+
+            pending, self._pending = self._pending, None
+            if state is not None:
+                self._install(state)
+            for change in pending:
+                if change is not None:
+                    self.apply(change)
+
+            if state is None:
+                logger.error("Team name index rebuild failed")
+                return False
+
+            self.ready = True
+            logger.info(f"Team name index built with {len(self)} names")
+            return True
+
+    async def start(self):
+        """Build the index and schedule periodic rebuilds if configured."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop periodic rebuilds."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._rebuild_task is not None:
+            self._rebuild_task.cancel()
+            self._rebuild_task = None
+
+    async def _run(self):
+        await self.rebuild()
+        while self.refresh_interval > 0:
+            await asyncio.sleep(self.refresh_interval)
+            await self.rebuild()
+
+    @staticmethod
+    def _prefix_texts(normalized):
+        words = normalized.split(" ")
+        texts = {normalized}
+        texts.update(word for word in words[1:] if word)
+        return texts
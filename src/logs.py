@@ -0,0 +1,254 @@
+"""
+Structured logging through a queue: callers only enqueue records, a
+listener thread formats them as JSON lines and does the I/O.
+"""
+import asyncio
+import atexit
+import copy
+import functools
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+# Pass as `extra=` to mark a record as high volume (subject to sampling)
+SAMPLED = {"sampled": True}
+
+# Command being handled, for the fields attached to every record
+_command_log = ContextVar("command_log", default=None)
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sampled"}
+
+_listener = None
+_queue_handler = None
+
+
+class CommandLog:
+    """User, chat and timings of one handled update."""
+
+    __slots__ = ("command", "user_id", "chat_id", "stages", "mongo_commands", "mongo_server")
+
+    def __init__(self, command, user_id=None, chat_id=None):
+        self.command = command
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.stages = {}
+        self.mongo_commands = 0
+        self.mongo_server = 0.0
+
+
+def add_stage_time(name, seconds):
+    """Add time spent in a stage ("mongo", "format", ...) to the current command."""
+    log = _command_log.get()
+    if log is not None:
+        log.stages[name] = log.stages.get(name, 0.0) + seconds
+
+
+def add_mongo_command(seconds):
+    """Count one MongoDB round trip of the current command."""
+    log = _command_log.get()
+    if log is not None:
+        log.mongo_commands += 1
+        log.mongo_server += seconds
+
+
+def _failed(task):
+    return not task.cancelled() and task.exception() is not None
+
+
+def logged(command, logger_name="src.bot.commands"):
+    """
+    Set the log context for a handler and emit one sampled record per
+    update with its latency and stage timings. Nested calls keep the
+    outermost context. A handler that hands its work to a background task
+    (see `command_class`) shares the context with it, and the record is
+    emitted when that task finishes.
+    """
+    logger = logging.getLogger(logger_name)
+
+    def emit(log, started, outcome):
+        fields = {"outcome": outcome, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+        for name, seconds in log.stages.items():
+            fields[f"{name}_ms"] = round(seconds * 1000, 2)
+        if log.mongo_commands:
+            fields["mongo_commands"] = log.mongo_commands
+            fields["mongo_server_ms"] = round(log.mongo_server * 1000, 2)
+        logger.info("update handled", extra={**fields, **SAMPLED})
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(update, *args, **kwargs):
+            if _command_log.get() is not None:
+                return await handler(update, *args, **kwargs)
+            user = getattr(update, "effective_user", None)
+            chat = getattr(update, "effective_chat", None)
+            log = CommandLog(command, user.id if user else None, chat.id if chat else None)
+            token = _command_log.set(log)
+            started = time.perf_counter()
+            try:
+                result = await handler(update, *args, **kwargs)
+            except Exception:
+                emit(log, started, "error")
+                raise
+            else:
+                if isinstance(result, asyncio.Task):
+                    # Callbacks run in a copy of this context, so the record
+                    # still carries the command's user and chat
+                    result.add_done_callback(
+                        lambda task: emit(log, started, "error" if _failed(task) else "ok")
+                    )
+                else:
+                    emit(log, started, "ok")
+                return result
+            finally:
+                _command_log.reset(token)
+        return wrapper
+    return decorator
+
+
+class ContextFilter(logging.Filter):
+    """Copy the current command's user, chat and command onto the record."""
+
+    def filter(self, record):
+        log = _command_log.get()
+        if log is not None:
+            record.command = log.command
+            record.user_id = log.user_id
+            record.chat_id = log.chat_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep records marked `SAMPLED` with a per-level probability, e.g.
+    `{logging.INFO: 0.1}`. Unmarked records and unlisted levels always pass.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+
+    def filter(self, record):
+        if not getattr(record, "sampled", False):
+            return True
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never waits: a full queue drops the record. Records
+    are prepared without formatting so `extra` fields reach the listener.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and extra fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def parse_sample_rates(value):
+    """`"DEBUG=0.01,INFO=0.1"` -> `{10: 0.01, 20: 0.1}`."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, rate = item.partition("=")
+        level = logging.getLevelName(name.strip().upper())
+        if not isinstance(level, int):
+            raise ValueError(f"Unknown log level '{name}'")
+        rates[level] = float(rate)
+    return rates
+
+
+def setup_logging(level="INFO", fmt="json", queue_size=10000, sample_rates=None):
+    """
+    Route the root logger through a bounded queue to a stdout handler run
+    by a listener thread. Safe to call again; the previous listener stops.
+    """
+    global _listener, _queue_handler
+    stop_logging()
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rates or {}))
+    queue_handler.addFilter(ContextFilter())
+
+    output = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    _queue_handler = queue_handler
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def queue_stats():
+    """Queued and dropped record counts, for metrics."""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    _queue_handler = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,218 @@
+"""In-process metrics with Prometheus text exposition."""
+import asyncio
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from src.logs import add_stage_time
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Command currently being handled; stages are attributed to it
+_current_command = ContextVar("current_command", default=None)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Mirror a cumulative total kept elsewhere (sampled by a collector)."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Holds metrics plus collectors that sample live state at scrape time."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def set_collector(self, key, collector):
+        """
+        Register `collector()` under `key` (replacing any previous one). It is
+        called on every scrape to refresh gauges from live objects.
+        """
+        self._collectors[key] = collector
+
+    def render(self):
+        """All metrics in Prometheus text format."""
+        for collector in list(self._collectors.values()):
+            collector()
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+COMMAND_LATENCY = REGISTRY.histogram(
+    "bot_command_seconds", "Handler latency per command.", ["command"])
+COMMAND_ERRORS = REGISTRY.counter(
+    "bot_command_errors_total", "Handler exceptions per command.", ["command"])
+STAGE_LATENCY = REGISTRY.histogram(
+    "bot_command_stage_seconds", "Time spent per command in mongo, format, ratelimit and telegram stages.",
+    ["command", "stage"])
+EXECUTOR_WAIT = REGISTRY.histogram(
+    "bot_executor_wait_seconds", "Time blocking queries waited for an executor thread.", ["pool"])
+
+
+@contextmanager
+def stage(name):
+    """Time a stage (e.g. "mongo", "format", "telegram") of the current command."""
+    command = _current_command.get()
+    if command is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_LATENCY.observe(elapsed, command=command, stage=name)
+        add_stage_time(name, elapsed)
+
+
+def instrumented(command):
+    """
+    Record latency and errors of a handler under `command`. Nested
+    instrumented calls are attributed to the outermost command. A handler
+    that hands its work to a background task (see `command_class`) is
+    measured until that task finishes.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            if _current_command.get() is not None:
+                return await handler(*args, **kwargs)
+            token = _current_command.set(command)
+            started = time.perf_counter()
+
+            def finished(failed=False):
+                if failed:
+                    COMMAND_ERRORS.inc(command=command)
+                COMMAND_LATENCY.observe(time.perf_counter() - started, command=command)
+
+            try:
+                result = await handler(*args, **kwargs)
+            except Exception:
+                finished(failed=True)
+                raise
+            else:
+                if isinstance(result, asyncio.Task):
+                    result.add_done_callback(
+                        lambda task: finished(not task.cancelled() and task.exception() is not None)
+                    )
+                else:
+                    finished()
+                return result
+            finally:
+                _current_command.reset(token)
+        return wrapper
+    return decorator
@@ -1,10 +1,29 @@
 """FastAPI webhook setup."""
+import asyncio
+import json
 import logging
+import time
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from telegram import Update
 
+from src.config import Config
+from src.metrics import REGISTRY
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+WEBHOOK_UPDATES = REGISTRY.counter(
+    "webhook_updates_total", "Webhook updates by outcome (enqueued, shed, error).", ["outcome"])
+WEBHOOK_ENQUEUE_LATENCY = REGISTRY.histogram(
+    "webhook_enqueue_seconds", "Time from request to update enqueued.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+
 
 def create_app(get_telegram_app, lifespan=None) -> FastAPI:
     """Create and configure FastAPI application."""
@@ -22,23 +41,61 @@ def create_app(get_telegram_app, lifespan=None) -> FastAPI:
     
     @app.post('/webhook')
     async def webhook(request: Request):
-        """Handle webhook updates from Telegram."""
+        """
+        Handle webhook updates from Telegram.
+        Updates are decoded and placed on the update queue without waiting
+        for handlers, as long as the application admits them (fewer than
+        CONCURRENT_UPDATES + UPDATE_QUEUE_MAXSIZE unfinished). Otherwise
+        the update is shed: with WEBHOOK_SHED_POLICY=reject a 503 asks
+        Telegram to redeliver later, with "drop" it is acknowledged and
+        discarded.
+        """
         try:
-            json_data = await request.json()
             telegram_app = get_telegram_app()
             
             if telegram_app is None:
                 logger.error("Telegram app is not initialized")
-                return {"status": "error", "message": "Bot not initialized"}
-            
+                return JSONResponse(
+                    {"status": "error", "message": "Bot not initialized"}, status_code=503
+                )
+
+            started = time.perf_counter()
+            json_data = json_loads(await request.body())
             update = Update.de_json(json_data, telegram_app.bot)
-            
-            # Process update asynchronously using update_queue
-            await telegram_app.update_queue.put(update)
-            
+
+            admission = telegram_app.bot_data.get("admission")
+            admitted = admission is None or admission.admit(update.update_id)
+            if admitted:
+                try:
+                    telegram_app.update_queue.put_nowait(update)
+                except asyncio.QueueFull:
+                    if admission is not None:
+                        admission.release(update.update_id)
+                    admitted = False
+
+            if not admitted:
+                WEBHOOK_UPDATES.inc(outcome="shed")
+                logger.warning(f"Too many unfinished updates, shedding update {update.update_id}")
+                if Config.WEBHOOK_SHED_POLICY == "drop":
+                    return {"status": "dropped"}
+                return JSONResponse(
+                    {"status": "busy"}, status_code=503,
+                    headers={"Retry-After": str(Config.WEBHOOK_RETRY_AFTER)}
+                )
+
+            WEBHOOK_UPDATES.inc(outcome="enqueued")
+            WEBHOOK_ENQUEUE_LATENCY.observe(time.perf_counter() - started)
             return {"status": "ok"}
         except Exception as e:
+            WEBHOOK_UPDATES.inc(outcome="error")
             logger.error(f"Webhook error: {e}", exc_info=True)
             return {"status": "error", "message": str(e)}
+
+    @app.get('/metrics')
+    async def metrics():
+        """Prometheus metrics."""
+        return PlainTextResponse(
+            REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
     
     return app
@@ -0,0 +1,143 @@
+"""The async data layer returns what the sync one does, on a fake driver."""
+import asyncio
+import time
+
+import pytest
+
+from src.db import async_queries, queries
+
+DOCS = [
+    {"_id": 1, "teamName": "Bravo", "member1Name": "Ann", "transactionId": "T2"},
+    {"_id": 2, "teamName": "alpha", "member1Name": "Bob", "member2Name": "Cy"},
+    {"_id": 3, "teamName": "Charlie", "member1Name": "Di", "member3Name": None, "transactionId": "T1"},
+]
+
+
+def project(doc, projection):
+    if not projection:
+        return dict(doc)
+    included = [key for key, value in projection.items() if value and key != "_id"]
+    if included:
+        result = {key: doc[key] for key in included if key in doc}
+        if projection.get("_id", 1):
+            result["_id"] = doc["_id"]
+        return result
+    return {key: value for key, value in doc.items() if projection.get(key, 1)}
+
+
+def matches(doc, query, collation=None):
+    for key, expected in query.items():
+        value = doc.get(key)
+        if collation and isinstance(value, str) and isinstance(expected, str):
+            value, expected = value.casefold(), expected.casefold()
+        if value != expected:
+            return False
+    return True
+
+
+class FakeCursor:
+    """Enough of a pymongo cursor for the query functions under test."""
+
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    def sort(self, key, direction=1):
+        keys = [(key, direction)] if isinstance(key, str) else list(key)
+        for field, order in reversed(keys):
+            self.docs.sort(key=lambda doc: doc.get(field), reverse=order < 0)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self.docs)
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        for doc in self.docs:
+            await asyncio.sleep(0)
+            yield doc
+
+    async def to_list(self, length=None):
+        return self.docs[:length] if length else list(self.docs)
+
+
+class FakeCollection:
+    def __init__(self, docs, latency=0.0):
+        self.docs = docs
+        self.latency = latency
+
+    def find(self, query=None, projection=None, batch_size=None, **kwargs):
+        return FakeCursor(project(doc, projection) for doc in self.docs if matches(doc, query or {}))
+
+    def find_one(self, query, projection=None, collation=None, **kwargs):
+        time.sleep(self.latency)
+        for doc in self.docs:
+            if matches(doc, query, collation):
+                return project(doc, projection)
+        return None
+
+
+class AsyncFakeCollection(FakeCollection):
+    async def find_one(self, query, projection=None, collation=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for doc in self.docs:
+            if matches(doc, query, collation):
+                return project(doc, projection)
+        return None
+
+
+@pytest.fixture
+def fake_driver(monkeypatch):
+    """Point both data layers at in-memory collections over DOCS."""
+    def install(latency=0.0):
+        monkeypatch.setattr(queries, "get_mongo_collection", lambda *args: FakeCollection(DOCS, latency))
+        monkeypatch.setattr(async_queries, "get_mongo_collection", lambda *args: AsyncFakeCollection(DOCS, latency))
+    install()
+    return install
+
+
+DB = ("mongodb://fake", "db", "registrations")
+
+
+def test_stream_collection_to_csv_matches_sync(fake_driver):
+    with queries.stream_collection_to_csv(*DB, batch_size=2) as sync_file:
+        expected = sync_file.read()
+    async_file = asyncio.run(async_queries.stream_collection_to_csv(*DB, batch_size=2))
+    with async_file:
+        assert async_file.read() == expected
+
+    lines = expected.decode().splitlines()
+    assert lines[0] == "teamName,member1Name,transactionId,member2Name,member3Name"
+    assert len(lines) == len(DOCS) + 1
+
+
+@pytest.mark.parametrize("name", ["ALPHA", " bravo ", "missing"])
+def test_find_team_by_name_matches_sync(fake_driver, name):
+    expected = queries.find_team_by_name(*DB, name)
+    assert asyncio.run(async_queries.find_team_by_name(*DB, name)) == expected
+
+
+def test_team_listings_match_sync(fake_driver):
+    assert (asyncio.run(async_queries.get_teams_with_transaction_numbers(*DB))
+            == queries.get_teams_with_transaction_numbers(*DB))
+    assert asyncio.run(async_queries.get_team_names(*DB)) == queries.get_team_names(*DB)
+    assert asyncio.run(async_queries.get_member_counts(*DB)) == queries.get_member_counts(*DB)
+
+
+def test_concurrent_finds_are_not_bounded_by_threads(fake_driver):
+    # 400 lookups of 50 ms each: 32 executor threads need at least 0.6 s
+    fake_driver(latency=0.05)
+
+    async def burst():
+        names = [doc["teamName"].upper() for doc in DOCS] * 134
+        return await asyncio.gather(*(async_queries.find_team_by_name(*DB, name) for name in names))
+
+    started = time.perf_counter()
+    results = asyncio.run(burst())
+    assert all(result is not None for result in results)
+    assert time.perf_counter() - started < 0.5
@@ -0,0 +1,106 @@
+"""SQLite backend claims and cross-worker single flight, with two backends on one file."""
+import asyncio
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from src.backend import SqliteBackend
+from src.bot.handlers import _recall_transactions_page, _remember_transactions_page
+from src.db.cache import SharedSingleFlight
+
+
+def with_workers(path, scenario, workers=2):
+    async def run():
+        backends = [SqliteBackend(str(path)) for _ in range(workers)]
+        try:
+            return await scenario(*backends)
+        finally:
+            for backend in backends:
+                await backend.close()
+    return asyncio.run(run())
+
+
+def test_add_claims_a_key_once_until_it_expires(tmp_path):
+    async def scenario(first, second):
+        claims = [await first.add("webhook", "1", ttl=0.2), await second.add("webhook", "2", ttl=0.2)]
+        holder = await second.get("webhook")
+        await asyncio.sleep(0.25)
+        claims.append(await second.add("webhook", "2", ttl=0.2))
+        return claims, holder, await first.get("webhook")
+
+    claims, holder, after_expiry = with_workers(tmp_path / "state.db", scenario)
+    assert claims == [True, False, True]
+    assert holder == "1" and after_expiry == "2"
+
+
+def test_set_get_delete_across_workers(tmp_path):
+    async def scenario(first, second):
+        await first.set("stats", "{}", ttl=60)
+        seen = await second.get("stats")
+        await second.delete("stats")
+        await first.set("short", "x", ttl=0.05)
+        await asyncio.sleep(0.1)
+        return seen, await first.get("stats"), await second.get("short")
+
+    assert with_workers(tmp_path / "state.db", scenario) == ("{}", None, None)
+
+
+def test_token_bucket_is_shared(tmp_path):
+    async def scenario(first, second):
+        waits = [await backend.take("bucket", 1.0, 2) for backend in (first, second, first)]
+        await second.block("bucket", 5)
+        return waits, await first.take("bucket", 100.0, 2)
+
+    waits, blocked = with_workers(tmp_path / "state.db", scenario)
+    assert waits[:2] == [0.0, 0.0] and waits[2] > 0.5
+    assert blocked > 4
+
+
+def test_single_flight_runs_once_across_workers(tmp_path):
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"teams": 3}
+
+    async def scenario(first, second):
+        flights = [SharedSingleFlight(backend, ttl=60, poll_interval=0.01) for backend in (first, second)]
+        results = await asyncio.gather(*(flight.do("stats", load) for flight in flights for _ in range(3)))
+        return results, await first.get("stats:lock")
+
+    results, lock = with_workers(tmp_path / "state.db", scenario)
+    assert calls == [1]
+    assert results == [{"teams": 3}] * 6
+    assert lock is None
+
+
+def test_single_flight_takes_over_after_a_dead_lock_holder(tmp_path):
+    async def load():
+        return {"teams": 1}
+
+    async def scenario(first, second):
+        # A worker that died holding the lock
+        await first.add("stats:lock", "dead", ttl=0.2)
+        flight = SharedSingleFlight(second, ttl=60, lock_ttl=0.2, poll_interval=0.01)
+        return await flight.do("stats", load), await first.get("stats")
+
+    assert with_workers(tmp_path / "state.db", scenario) == ({"teams": 1}, '{"teams": 1}')
+
+
+def test_transactions_page_state_is_shared(tmp_path):
+    items = [{"teamName": "Alpha", "_id": ObjectId()}, {"teamName": "Omega", "_id": ObjectId()}]
+
+    async def scenario(first, second):
+        worker = SimpleNamespace(bot_data={"backend": first}, chat_data={})
+        other = SimpleNamespace(bot_data={"backend": second}, chat_data={})
+        await _remember_transactions_page(worker, 42, 7, 2, items)
+        return await _recall_transactions_page(other, 42, 7), await _recall_transactions_page(other, 42, 8)
+
+    state, missing = with_workers(tmp_path / "state.db", scenario)
+    assert state == {
+        "page": 2,
+        "first": ["Alpha", items[0]["_id"]],
+        "last": ["Omega", items[-1]["_id"]],
+    }
+    assert missing is None
@@ -0,0 +1,29 @@
+"""Config.validate checks for the export default format."""
+import pytest
+
+from src.config import Config
+from src.db import export
+
+
+@pytest.fixture
+def config(monkeypatch):
+    for name, value in {"BOT_TOKEN": "1:x", "WEBHOOK_URL": "https://example.org",
+                        "CONNECTION_STRING": "mongodb://localhost", "DATABASE_NAME": "db",
+                        "COLLECTION_NAME": "teams", "STATE_BACKEND": "memory", "WORKERS": 1}.items():
+        monkeypatch.setattr(Config, name, value)
+    return monkeypatch
+
+
+def test_default_format_needs_its_library(config):
+    config.setattr(export, "format_available", lambda fmt: fmt != "parquet")
+    config.setattr(Config, "EXPORT_DEFAULT_FORMAT", "parquet")
+    with pytest.raises(ValueError, match="pyarrow"):
+        Config.validate()
+
+    config.setattr(Config, "EXPORT_DEFAULT_FORMAT", "xlsx")
+    Config.validate()
+
+
+def test_csv_default_needs_no_optional_library(config):
+    config.setattr(Config, "EXPORT_DEFAULT_FORMAT", "csv")
+    Config.validate()
@@ -0,0 +1,113 @@
+"""StatsCounter stays equal to a full recount as change events arrive."""
+import asyncio
+
+from src.db.counters import StatsCounter
+from src.db.queries import count_members
+
+
+class Collection:
+    """Documents by _id plus the change events a feed would deliver."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def insert(self, doc):
+        self.docs[doc["_id"]] = doc
+        return {"operationType": "insert", "fullDocument": doc}
+
+    def update(self, doc):
+        self.docs[doc["_id"]] = doc
+        return {"operationType": "update", "fullDocument": doc}
+
+    def delete(self, doc_id):
+        del self.docs[doc_id]
+        return {"operationType": "delete", "documentKey": {"_id": doc_id}}
+
+    async def member_counts(self):
+        return {doc_id: count_members(doc) for doc_id, doc in self.docs.items()}
+
+    def stats(self):
+        counts = [count_members(doc) for doc in self.docs.values()]
+        return {"total_teams": len(counts), "total_members": sum(counts)}
+
+
+def team(doc_id, members):
+    doc = {"_id": doc_id, "teamName": f"team {doc_id}"}
+    for number in range(1, members + 1):
+        doc[f"member{number}Name"] = f"member {number}"
+    return doc
+
+
+def test_events_keep_counter_equal_to_full_count():
+    async def scenario():
+        collection = Collection()
+        for doc_id in range(5):
+            collection.insert(team(doc_id, 2))
+        counter = StatsCounter(collection.member_counts)
+        assert counter.snapshot() is None
+        await counter.reconcile()
+
+        counter.apply(collection.insert(team(10, 4)))
+        counter.apply(collection.update(team(0, 1)))
+        counter.apply(collection.delete(3))
+        # Deleting an unknown _id changes nothing
+        counter.apply({"operationType": "delete", "documentKey": {"_id": 99}})
+        assert counter.snapshot() == collection.stats()
+
+        # A full reconcile finds nothing to correct
+        assert await counter.reconcile() == {"total_teams": 0, "total_members": 0}
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_corrects_missed_events():
+    async def scenario():
+        collection = Collection()
+        collection.insert(team(1, 3))
+        counter = StatsCounter(collection.member_counts)
+        await counter.reconcile()
+
+        collection.insert(team(2, 2))  # event lost
+        drift = await counter.reconcile()
+        assert drift == {"total_teams": 1, "total_members": 2}
+        assert counter.snapshot() == collection.stats()
+
+    asyncio.run(scenario())
+
+
+def test_unknown_changes_start_one_reconcile():
+    async def scenario():
+        collection = Collection()
+        collection.insert(team(1, 1))
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return await collection.member_counts()
+
+        counter = StatsCounter(loader)
+        counter.apply(None)
+        counter.apply(None)
+        await asyncio.sleep(0.05)
+        assert calls == 1
+        assert counter.snapshot() == collection.stats()
+
+    asyncio.run(scenario())
+
+
+def test_counter_switches_off_beyond_max_teams():
+    async def scenario():
+        collection = Collection()
+        for doc_id in range(3):
+            collection.insert(team(doc_id, 1))
+        counter = StatsCounter(collection.member_counts, max_teams=3)
+        await counter.reconcile()
+        assert counter.snapshot() == collection.stats()
+
+        counter.apply(collection.insert(team(3, 1)))
+        assert counter.overflowed
+        assert counter.snapshot() is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,68 @@
+"""CsvStreamBuilder column discovery and the upload wrapper for its buffers."""
+import csv
+import io
+
+import pandas as pd
+from telegram import InputFile
+
+from src.bot.helpers import document_file
+from src.db import queries
+from src.db.queries import CsvStreamBuilder
+
+
+def read_rows(buffer):
+    return list(csv.reader(io.TextIOWrapper(buffer, encoding="utf-8", newline="")))
+
+
+def test_empty_builder_returns_none():
+    assert CsvStreamBuilder().finish() is None
+
+
+def test_columns_are_the_union_in_first_seen_order():
+    docs = [
+        {"teamName": "Alpha", "member1Name": "Ann"},
+        {"teamName": "Beta", "transactionId": "T2", "member1Name": "Bob"},
+        {"member2Name": "Cid", "teamName": "Gamma", "member3Name": None},
+    ]
+    builder = CsvStreamBuilder()
+    builder.extend(docs)
+
+    assert read_rows(builder.finish()) == [
+        ["teamName", "member1Name", "transactionId", "member2Name", "member3Name"],
+        ["Alpha", "Ann", "", "", ""],
+        ["Beta", "Bob", "T2", "", ""],
+        ["Gamma", "", "", "Cid", ""],
+    ]
+
+
+def test_matches_pandas_export_of_the_same_documents():
+    docs = [{"a": "1", "b": "x,y"}, {"c": 'quoted "c"', "a": "2"}, {"b": "line\nbreak"}]
+    builder = CsvStreamBuilder()
+    builder.extend(docs)
+
+    expected = pd.DataFrame(docs).to_csv(index=False)
+    assert read_rows(builder.finish()) == list(csv.reader(io.StringIO(expected)))
+
+
+def test_rows_spill_to_disk_beyond_the_spool_size(monkeypatch):
+    monkeypatch.setattr(queries, "EXPORT_SPOOL_MAX_SIZE", 64)
+    builder = CsvStreamBuilder()
+    builder.extend({"n": i} for i in range(200))
+    builder.add({"n": 200, "late": "yes"})
+
+    rows = read_rows(builder.finish())
+    assert rows[0] == ["n", "late"]
+    assert rows[1] == ["0", ""] and rows[-1] == ["200", "yes"]
+    assert len(rows) == 202
+
+
+def test_document_file_wraps_in_memory_buffers():
+    builder = CsvStreamBuilder()
+    builder.add({"teamName": "Alpha"})
+    buffer = builder.finish()
+    buffer.read()
+
+    upload = document_file(buffer, "registrations.csv")
+    assert isinstance(upload, InputFile)
+    assert upload.filename == "registrations.csv"
+    assert upload.input_file_content == b"teamName\r\nAlpha\r\n"
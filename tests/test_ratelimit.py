@@ -0,0 +1,47 @@
+"""Priority between interactive calls and bulk uploads in the rate limiter."""
+import asyncio
+import time
+
+from src.bot.ratelimit import TokenBucketRateLimiter
+
+
+async def request(limiter, endpoint, chat_id, finished):
+    async def callback():
+        finished.append((endpoint, chat_id, time.monotonic()))
+
+    await limiter.process_request(callback, (), {}, endpoint, {"chat_id": chat_id}, None)
+
+
+def test_throttled_chat_does_not_delay_uploads_to_other_chats():
+    async def scenario():
+        limiter = TokenBucketRateLimiter(global_rate=30, chat_rate=5, chat_burst=1, bulk_reserve=0)
+        finished = []
+        started = time.monotonic()
+        messages = [
+            asyncio.create_task(request(limiter, "sendMessage", 1, finished)) for _ in range(6)
+        ]
+        await asyncio.sleep(0.01)
+        await request(limiter, "sendDocument", 2, finished)
+        upload_seconds = time.monotonic() - started
+        await asyncio.gather(*messages)
+        return upload_seconds, time.monotonic() - started, limiter.snapshot()
+
+    upload_seconds, total_seconds, snapshot = asyncio.run(scenario())
+    # Chat 1 needs about a second for its messages; the upload is not held back
+    assert total_seconds >= 0.9
+    assert upload_seconds < 0.2
+    assert snapshot["interactive_waiting"] == 0
+
+
+def test_interactive_calls_waiting_on_global_tokens_go_first():
+    async def scenario():
+        limiter = TokenBucketRateLimiter(global_rate=10, chat_rate=5, chat_burst=1, bulk_reserve=0)
+        limiter._global.tokens = 0.0
+        finished = []
+        await asyncio.gather(
+            request(limiter, "sendDocument", 2, finished),
+            request(limiter, "sendMessage", 1, finished),
+        )
+        return [endpoint for endpoint, _, _ in finished]
+
+    assert asyncio.run(scenario()) == ["sendMessage", "sendDocument"]
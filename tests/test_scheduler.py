@@ -0,0 +1,109 @@
+"""CommandPool limits, detached backlogs and command_class handoff."""
+import asyncio
+from types import SimpleNamespace
+
+from src.bot.scheduler import BUSY_MESSAGE, CommandPool, CommandScheduler, command_class
+from src.db.runner import current_pool
+from src.metrics import COMMAND_ERRORS, COMMAND_LATENCY, instrumented
+
+
+def test_run_caps_concurrency_and_is_reentrant():
+    async def scenario():
+        pool = CommandPool("lookup", 2)
+        running = peak = 0
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            assert current_pool.get() is pool
+            # Re-entering the pool from inside a slot must not deadlock
+            await pool.run(asyncio.sleep, 0)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await asyncio.gather(*(pool.run(work) for _ in range(6)))
+        pool.shutdown()
+        return peak, pool.completed
+
+    assert asyncio.run(scenario()) == (2, 6)
+
+
+def test_defer_rejects_beyond_limit_plus_backlog():
+    async def scenario():
+        pool = CommandPool("export", 1, backlog=2)
+        release = asyncio.Event()
+        tasks = [pool.defer(release.wait) for _ in range(4)]
+        await asyncio.sleep(0)
+        state = (pool.active, pool.waiting, pool.rejected)
+        release.set()
+        await asyncio.gather(*(task for task in tasks if task is not None))
+        # Room again once the backlog has drained
+        assert pool.defer(asyncio.sleep, 0) is not None
+        pool.shutdown()
+        return tasks, state
+
+    tasks, (active, waiting, rejected) = asyncio.run(scenario())
+    assert [task is None for task in tasks] == [False, False, False, True]
+    assert (active, waiting, rejected) == (1, 2, 1)
+
+
+class Message:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text):
+        self.replies.append(text)
+
+
+def test_detached_handler_returns_task_or_answers_busy():
+    async def scenario():
+        scheduler = CommandScheduler({"export": 1}, backlogs={"export": 0})
+        context = SimpleNamespace(bot_data={"scheduler": scheduler})
+        release = asyncio.Event()
+        done = []
+
+        @command_class("export")
+        async def export(update, context):
+            await release.wait()
+            done.append(update)
+
+        first = SimpleNamespace(effective_message=Message())
+        second = SimpleNamespace(effective_message=Message())
+        task = await export(first, context)
+        rejected = await export(second, context)
+        release.set()
+        await task
+        scheduler.shutdown()
+        return task, rejected, done, second.effective_message.replies
+
+    task, rejected, done, replies = asyncio.run(scenario())
+    assert isinstance(task, asyncio.Task) and rejected is None
+    assert len(done) == 1
+    assert replies == [BUSY_MESSAGE]
+
+
+def test_instrumented_measures_deferred_work_to_completion():
+    async def scenario():
+        scheduler = CommandScheduler({"export": 1}, backlogs={"export": 4})
+        context = SimpleNamespace(bot_data={"scheduler": scheduler})
+
+        @instrumented("test_export")
+        @command_class("export")
+        async def export(update, context, fail=False):
+            await asyncio.sleep(0.05)
+            if fail:
+                raise RuntimeError("export failed")
+
+        update = SimpleNamespace(effective_message=Message())
+        for fail in (False, True):
+            task = await export(update, context, fail=fail)
+            await asyncio.gather(task, return_exceptions=True)
+            await asyncio.sleep(0)
+        scheduler.shutdown()
+        _, seconds, count = COMMAND_LATENCY._values[("test_export",)]
+        return count, seconds, COMMAND_ERRORS._values[("test_export",)]
+
+    count, seconds, errors = asyncio.run(scenario())
+    assert count == 2 and seconds >= 0.1
+    assert errors == 1
@@ -0,0 +1,57 @@
+"""TeamNameIndex search and background rebuilds."""
+import asyncio
+import threading
+
+from src.db.team_index import TeamNameIndex
+
+NAMES = [(1, "Code Breakers"), (2, "Byte Me"), (3, "The Debuggers"), (4, "Null Pointers")]
+
+
+def test_search_exact_prefix_and_fuzzy():
+    index = TeamNameIndex(loader=None)
+    index.load(NAMES)
+    assert index.search("byte me") == [(2, "Byte Me", True)]
+    assert [doc_id for doc_id, _, _ in index.search("debug")] == [3]
+    assert index.search("Nul Pointrs")[0][0] == 4
+
+
+def test_incremental_add_matches_bulk_load():
+    loaded = TeamNameIndex(loader=None)
+    loaded.load(NAMES)
+    added = TeamNameIndex(loader=None)
+    for doc_id, name in reversed(NAMES):
+        added.add(doc_id, name)
+    assert sorted(text for text, _ in added._prefixes) == [text for text, _ in loaded._prefixes]
+    for query in ("code", "pointers", "the"):
+        assert [r[1] for r in added.search(query)] == [r[1] for r in loaded.search(query)]
+
+
+def test_rebuild_builds_off_the_loop_and_replays_events():
+    async def scenario():
+        build_threads = []
+        released = asyncio.Event()
+
+        async def loader():
+            await released.wait()
+            return NAMES
+
+        index = TeamNameIndex(loader)
+        build = index._build
+
+        def recording_build(names):
+            build_threads.append(threading.current_thread())
+            return build(names)
+
+        index._build = recording_build
+        rebuild = asyncio.create_task(index.rebuild())
+        await asyncio.sleep(0)
+        # Arrives while the rebuild is loading; replayed on top of it
+        index.apply({"operationType": "insert", "fullDocument": {"_id": 5, "teamName": "Stack Smashers"}})
+        released.set()
+        assert await rebuild
+
+        assert build_threads and build_threads[0] is not threading.main_thread()
+        assert index.ready and len(index) == 5
+        assert index.search("stack smashers")[0][0] == 5
+
+    asyncio.run(scenario())